@@ -0,0 +1,108 @@
+"""
+Embedding backend comparison (embedding_backend.py): PyTorch float vs. ONNX vs. ONNX int8.
+
+Embeds the knowledge base files in Data/ and the RAG/BOTH questions from QA.txt and
+router_cases.tsv on each backend, then reports load time, corpus throughput, single-query
+latency, peak worker memory and retrieval agreement with the float model: recall@k of each
+backend's top-k chunks against the torch top-k, and the cosine between query vectors.
+Each backend runs in its own process so memory numbers do not mix.
+
+    cd src && python ../bench/bench_embed_backend.py --backends torch,onnx,onnx-int8 --k 6
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from config import EMBED_MODEL_NAME
+from embedding_backend import BACKENDS, load_embed_model
+
+DATA_FILES = ["all_product_specs.txt", "all_warranties.txt", "delivery_koombiyo.txt"]
+
+
+def _run_backend(backend, texts, queries, threads):
+    """Child process: load one backend, embed corpus and queries, report timings and peak RSS."""
+    start = time.perf_counter()
+    model = load_embed_model(EMBED_MODEL_NAME, backend, threads=threads)
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    corpus = model.encode(texts, batch_size=64, normalize_embeddings=True, show_progress_bar=False)
+    corpus_s = time.perf_counter() - start
+
+    model.encode(queries[:1], normalize_embeddings=True)   # Warm-up
+    query_vectors, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(model.encode(query, normalize_embeddings=True))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "load_s": load_s,
+        "corpus_s": corpus_s,
+        "latencies": latencies,
+        "corpus": np.asarray(corpus, dtype=np.float32),
+        "queries": np.asarray(query_vectors, dtype=np.float32),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def top_k(corpus, queries, k):
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--k", type=int, default=6, help="chunks per query (ask_rag_ai sends 6)")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per model, 0 = runtime default")
+    parser.add_argument("--qa", default=os.path.join(ROOT, "QA.txt"))
+    parser.add_argument("--tsv", default=os.path.join(ROOT, "bench", "router_cases.tsv"))
+    args = parser.parse_args()
+
+    # Imported here so the spawned backend processes stay light
+    from ingest import iter_txt_chunks
+    from eval_router import load_qa_cases, load_tsv_cases, percentile
+
+    texts = [f"{rec['title']} {rec['content']}"
+             for name in DATA_FILES for rec in iter_txt_chunks(os.path.join(ROOT, "Data", name))]
+    cases = (load_qa_cases(args.qa) if args.qa else []) + (load_tsv_cases(args.tsv) if args.tsv else [])
+    queries = [question for label, question in cases if label in ("RAG", "BOTH")]
+    if not texts or not queries:
+        sys.exit("No knowledge base chunks or RAG questions found.")
+
+    backends = ["torch"] + [b for b in args.backends.split(",") if b and b != "torch"]
+    print(f"{len(texts)} chunks, {len(queries)} queries, recall@{args.k} against torch\n")
+
+    results = {}
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results[backend] = executor.submit(_run_backend, backend, texts, queries, args.threads or None).result()
+
+    reference = results["torch"]
+    expected = top_k(reference["corpus"], reference["queries"], args.k)
+    print(f"{'backend':<10} {'load s':>7} {'chunks/s':>9} {'query p50':>10} {'query p95':>10} {'peak MB':>8} "
+          f"{'recall@' + str(args.k):>9} {'top-1 agree':>12} {'query cos':>10}")
+    for backend in backends:
+        r = results[backend]
+        found = top_k(r["corpus"], r["queries"], args.k)
+        recall = np.mean([len(set(e) & set(f)) / args.k for e, f in zip(expected, found)])
+        top1 = np.mean(expected[:, 0] == found[:, 0])
+        cosine = float(np.mean(np.sum(r["queries"] * reference["queries"], axis=1)))
+        print(f"{backend:<10} {r['load_s']:7.2f} {len(texts) / r['corpus_s']:9.0f} "
+              f"{statistics.median(r['latencies']):8.2f}ms {percentile(r['latencies'], 95):8.2f}ms "
+              f"{r['peak_rss_mb']:8.0f} {recall:9.3f} {top1:12.3f} {cosine:10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cold-start benchmark: time to import the app's modules in a fresh interpreter.
+
+Each target is imported in --runs new processes. The report shows the median and maximum wall
+time, and which heavy libraries (torch, sentence_transformers, groq, ...) the import pulled in.
+"main.py" runs the import block at the top of src/main.py, which is what every Streamlit
+process pays before init_system(). Models and connections are now created in core.warm_up(),
+so none of these targets should load them.
+
+    cd src && python ../bench/bench_import_time.py --runs 5
+    cd src && python ../bench/bench_import_time.py --detail core   # slowest modules via -X importtime
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+
+HEAVY = ["torch", "sentence_transformers", "onnxruntime", "transformers", "groq", "redis", "psycopg2", "streamlit"]
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+exec(compile({code!r}, "<target>", "exec"))
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def main_imports():
+    """The import statements at the top of src/main.py, before any Streamlit call."""
+    with open(os.path.join(SRC, "main.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    imports = []
+    for node in tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        imports.append(ast.unparse(node))
+    return "\n".join(imports)
+
+
+def run_once(code):
+    result = subprocess.run([sys.executable, "-c", _PROBE.format(code=code, heavy=HEAVY)],
+                            cwd=SRC, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def detail(code, top):
+    """Per-module self time from python -X importtime, slowest first."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SRC, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"  import failed: {result.stderr.strip().splitlines()[-1]}")
+        return
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(self_us), int(cumulative_us), module))
+    for self_us, cumulative_us, module in sorted(rows, reverse=True)[:top]:
+        print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:9.1f} ms cumulative  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--detail", choices=["config", "utils", "core", "ingest", "main.py"])
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    targets = {
+        "config": "import config",
+        "utils": "import utils",
+        "core": "import core",
+        "ingest": "import ingest",
+        "main.py": main_imports(),
+    }
+
+    if args.detail:
+        print(f"Slowest modules for {args.detail}:")
+        detail(targets[args.detail], args.top)
+        return
+
+    print(f"{'target':<10} {'median s':>9} {'max s':>7}  heavy modules loaded")
+    for name, code in targets.items():
+        try:
+            runs = [run_once(code) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<10} failed: {e}")
+            continue
+        seconds = [run["seconds"] for run in runs]
+        print(f"{name:<10} {statistics.median(seconds):9.3f} {max(seconds):7.3f}  {', '.join(runs[0]['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
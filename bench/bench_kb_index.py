@@ -0,0 +1,79 @@
+"""
+Knowledge retrieval benchmark: the Postgres hybrid search (core.retrieve) vs. the in-process
+mirror (core.kb_index) on the live knowledge_base.
+
+Builds a fresh snapshot, then for each RAG/BOTH question in QA.txt and router_cases.tsv runs
+both searches with the same query vector and terms. It reports p50/p95 search latency and how
+far the mirror agrees with Postgres: the overlap of the candidate sets and of the chunks that
+core.rerank finally sends to the LLM.
+
+    cd src && KB_INDEX_ENABLED=true python ../bench/bench_kb_index.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from config import KB_INDEX_ENABLED
+from core.kb_index import rebuild_kb_index, search_kb_index
+from core.rerank import rerank
+from core.retrieve import _search_knowledge_base
+from utils import embed_query
+from eval_router import load_qa_cases, load_tsv_cases, percentile
+
+FILLER_WORDS = ['give', 'me', 'show', 'tell', 'what', 'is', 'the', 'of', 'specs', 'spec']   # As in ask_rag_ai
+
+
+def overlap(a, b):
+    a, b = {c.context for c in a}, {c.context for c in b}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qa", default=os.path.join(ROOT, "QA.txt"))
+    parser.add_argument("--tsv", default=os.path.join(ROOT, "bench", "router_cases.tsv"))
+    parser.add_argument("--repeat", type=int, default=5, help="timed searches per question and engine")
+    args = parser.parse_args()
+
+    if not KB_INDEX_ENABLED:
+        sys.exit("Set KB_INDEX_ENABLED=true to benchmark the in-process index.")
+    cases = (load_qa_cases(args.qa) if args.qa else []) + (load_tsv_cases(args.tsv) if args.tsv else [])
+    questions = [question for label, question in cases if label in ("RAG", "BOTH")]
+    if not questions:
+        sys.exit("No RAG questions found.")
+
+    started = time.perf_counter()
+    chunks = rebuild_kb_index()
+    if not chunks:
+        sys.exit("Snapshot build failed or knowledge_base is empty.")
+    print(f"Snapshot of {chunks} chunks built in {time.perf_counter() - started:.2f}s; {len(questions)} questions\n")
+
+    postgres_ms, memory_ms, candidate_overlap, final_overlap = [], [], [], []
+    for question in questions:
+        vector = embed_query(question).tolist()
+        terms = ' '.join(w for w in question.lower().split() if w not in FILLER_WORDS)
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            from_postgres = _search_knowledge_base(vector, terms)
+            postgres_ms.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            from_memory = search_kb_index(vector, terms)
+            memory_ms.append((time.perf_counter() - t0) * 1000)
+        candidate_overlap.append(overlap(from_postgres, from_memory))
+        final_overlap.append(overlap(rerank(question, from_postgres)[0], rerank(question, from_memory)[0]))
+
+    print(f"{'engine':<10} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'postgres':<10} {statistics.median(postgres_ms):8.3f} {percentile(postgres_ms, 95):8.3f}")
+    print(f"{'in-process':<10} {statistics.median(memory_ms):8.3f} {percentile(memory_ms, 95):8.3f}")
+    print(f"\nSpeedup p50: {statistics.median(postgres_ms) / statistics.median(memory_ms):.1f}x")
+    print(f"Candidate overlap (Jaccard) mean {statistics.mean(candidate_overlap):.3f}, "
+          f"chunks sent to the LLM mean {statistics.mean(final_overlap):.3f}")
+
+
+if __name__ == "__main__":
+    main()
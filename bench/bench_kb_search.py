@@ -0,0 +1,213 @@
+"""
+Hybrid knowledge_base search benchmark: legacy threshold/sequential-scan SQL vs. the
+indexed HNSW + stored tsvector SQL that replaced it in ask_rag_ai.
+
+Both queries are kept here as they were at the index change: same columns, same LIMIT 6, so
+the difference is the indexes alone. core.retrieve's current query also returns ranks and
+embeddings for every candidate (for core.rerank), which would skew the comparison.
+
+Builds a synthetic knowledge base in a scratch table (default 100k rows), times both
+queries, and prints p50/p95 latencies. Needs the same Postgres/pgvector as the app.
+
+    cd src && python ../bench/bench_kb_search.py --rows 100000 --queries 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from config import KB_HNSW_EF_SEARCH, KB_VECTOR_CANDIDATES, KB_KEYWORD_CANDIDATES, KB_MIN_VECTOR_SCORE
+from utils.db_connection import get_connection, create_search_indexes
+
+TABLE = "kb_bench"
+DIM = 384
+
+# The query ask_rag_ai ran before the indexes existed (threshold in WHERE, tsvector per row)
+LEGACY_SEARCH_SQL = """
+    WITH vector_matches AS (
+        SELECT kb_id, 1 - (embedding <=> %(vector)s::vector) AS v_score
+        FROM {table}
+        WHERE embedding IS NOT NULL
+          AND (1 - (embedding <=> %(vector)s::vector)) >= %(min_vector_score)s
+        ORDER BY v_score DESC
+        LIMIT %(vector_limit)s
+    ),
+    keyword_matches AS (
+        SELECT kb_id,
+               ts_rank_cd(to_tsvector('simple', title || ' ' || content),
+                          plainto_tsquery('simple', %(terms)s)) AS k_score
+        FROM {table}
+        WHERE to_tsvector('simple', title || ' ' || content) @@ plainto_tsquery('simple', %(terms)s)
+        LIMIT %(keyword_limit)s
+    )
+    SELECT '[' || document_type || '] ' || title || ': ' || content AS context,
+           COALESCE(v.v_score, 0), COALESCE(k.k_score, 0)
+    FROM {table} kb
+    LEFT JOIN vector_matches v ON kb.kb_id = v.kb_id
+    LEFT JOIN keyword_matches k ON kb.kb_id = k.kb_id
+    WHERE v.v_score >= %(min_vector_score)s OR k.k_score > 0
+    ORDER BY (COALESCE(v.v_score, 0) * 0.7 + COALESCE(k.k_score, 0) * 0.3) DESC
+    LIMIT 6;
+"""
+
+# The indexed query as introduced with the HNSW/GIN indexes (ANN LIMIT first, stored search_tsv)
+INDEXED_SEARCH_SQL = """
+    WITH vector_matches AS (
+        SELECT kb_id, 1 - (embedding <=> %(vector)s::vector) AS v_score
+        FROM {table}
+        WHERE embedding IS NOT NULL
+        ORDER BY embedding <=> %(vector)s::vector
+        LIMIT %(vector_limit)s
+    ),
+    keyword_matches AS (
+        SELECT kb_id, ts_rank_cd(search_tsv, query) AS k_score
+        FROM {table}, plainto_tsquery('simple', %(terms)s) AS query
+        WHERE search_tsv @@ query
+        ORDER BY k_score DESC
+        LIMIT %(keyword_limit)s
+    ),
+    candidates AS (
+        SELECT COALESCE(v.kb_id, k.kb_id) AS kb_id,
+               COALESCE(v.v_score, 0) AS v_score,
+               COALESCE(k.k_score, 0) AS k_score
+        FROM (SELECT * FROM vector_matches WHERE v_score >= %(min_vector_score)s) v
+        FULL OUTER JOIN keyword_matches k ON v.kb_id = k.kb_id
+    )
+    SELECT '[' || kb.document_type || '] ' || kb.title || ': ' || kb.content AS context,
+           c.v_score, c.k_score
+    FROM candidates c
+    JOIN {table} kb ON kb.kb_id = c.kb_id
+    WHERE c.v_score >= %(min_vector_score)s OR c.k_score > 0
+    ORDER BY (c.v_score * 0.7 + c.k_score * 0.3) DESC
+    LIMIT 6;
+"""
+
+BRANDS = ["Samsung", "Apple", "Xiaomi", "Google", "Anker", "Marshall", "Sony", "JBL", "Huawei", "Oppo"]
+WORDS = ["battery", "display", "camera", "chipset", "warranty", "charging", "wireless", "amoled",
+         "refresh", "storage", "courier", "delay", "return", "policy", "bluetooth", "waterproof",
+         "speaker", "powerbank", "snapdragon", "dimensity", "leica", "oled", "ultra", "pro", "max"]
+
+
+def _unit(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def build_table(conn, rows, seed):
+    """Creates the scratch table and fills it with clustered synthetic embeddings and text."""
+    rng = np.random.default_rng(seed)
+    centers = _unit(rng.standard_normal((256, DIM)).astype(np.float32))
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
+    cur.execute(f"""
+        CREATE TABLE {TABLE} (
+            kb_id SERIAL PRIMARY KEY,
+            document_type VARCHAR(50),
+            title TEXT,
+            content TEXT NOT NULL,
+            source VARCHAR(100),
+            embedding vector({DIM})
+        );
+    """)
+    batch = 5000
+    for offset in range(0, rows, batch):
+        n = min(batch, rows - offset)
+        labels = rng.integers(0, len(centers), n)
+        vecs = _unit(centers[labels] + 0.35 * rng.standard_normal((n, DIM)).astype(np.float32))
+        values = []
+        for i in range(n):
+            brand = BRANDS[labels[i] % len(BRANDS)]
+            title = f"{brand} Model {offset + i}"
+            content = " ".join(rng.choice(WORDS, 30))
+            values.append(("product_spec", title, content, "synthetic", vecs[i].tolist()))
+        execute_values(cur, f"""
+            INSERT INTO {TABLE} (document_type, title, content, source, embedding) VALUES %s
+        """, values, template="(%s, %s, %s, %s, %s::vector)")
+    conn.commit()
+    cur.execute(f"ANALYZE {TABLE};")
+    conn.commit()
+    return centers
+
+
+def make_queries(centers, count, seed):
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for _ in range(count):
+        c = centers[rng.integers(0, len(centers))]
+        vec = _unit(c + 0.2 * rng.standard_normal(DIM).astype(np.float32))
+        terms = " ".join(rng.choice(WORDS, 2))
+        queries.append({
+            "vector": vec.tolist(),
+            "terms": terms,
+            "vector_limit": KB_VECTOR_CANDIDATES,
+            "keyword_limit": KB_KEYWORD_CANDIDATES,
+            "min_vector_score": KB_MIN_VECTOR_SCORE,
+        })
+    return queries
+
+
+def time_queries(conn, sql, queries, setup_sql=None):
+    cur = conn.cursor()
+    timings = []
+    for params in queries:
+        start = time.perf_counter()
+        if setup_sql:
+            cur.execute(setup_sql)
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+        conn.rollback()
+    cur.close()
+    return timings
+
+
+def summarize(label, timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    print(f"{label:<10} p50={statistics.median(ordered):9.2f} ms   p95={p95:9.2f} ms   n={len(ordered)}")
+    return statistics.median(ordered), p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch table afterwards")
+    args = parser.parse_args()
+
+    with get_connection() as conn:
+        print(f"Building {TABLE} with {args.rows} rows...")
+        centers = build_table(conn, args.rows, args.seed)
+        queries = make_queries(centers, args.queries, args.seed)
+
+        legacy = time_queries(conn, LEGACY_SEARCH_SQL.format(table=TABLE), queries)
+
+        print("Creating HNSW + GIN indexes...")
+        cur = conn.cursor()
+        start = time.perf_counter()
+        create_search_indexes(cur, table=TABLE)
+        conn.commit()
+        print(f"Index build took {time.perf_counter() - start:.1f}s")
+
+        ef_search = f"SET LOCAL hnsw.ef_search = {max(KB_HNSW_EF_SEARCH, KB_VECTOR_CANDIDATES)};"
+        indexed = time_queries(conn, INDEXED_SEARCH_SQL.format(table=TABLE), queries, ef_search)
+
+        print()
+        legacy_p50, legacy_p95 = summarize("legacy", legacy)
+        indexed_p50, indexed_p95 = summarize("indexed", indexed)
+        print(f"{'speedup':<10} p50={legacy_p50 / indexed_p50:8.1f}x    p95={legacy_p95 / indexed_p95:8.1f}x")
+
+        if not args.keep:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
+            conn.commit()
+        cur.close()
+
+
+if __name__ == "__main__":
+    main()
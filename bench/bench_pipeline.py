@@ -0,0 +1,288 @@
+"""
+Offline end-to-end pipeline benchmark: fast path -> reformulate_question -> identify_intent ->
+validate_query -> ask_*_ai, the same flow as main.py, over a question corpus.
+
+Stand-ins for the live services:
+  Groq      bench/fake_groq.py replays recorded completions (--replay), synthesizes the rest,
+            with simulated latency
+  Redis     fakeredis, in process
+  Postgres  a local Postgres + pgvector named by the usual DB_* settings; --seed restores
+            pos_db.sql (+ pos_doc.sql) into it and ingests the Data/ knowledge base files
+
+Reports per-route count, throughput, p50/p95 latency, time to first token, LLM calls and tokens,
+plus per-stage p50/p95 from the metrics spans. --out writes the report as sorted, rounded JSON
+for diffing across commits; per-question rows carry only deterministic fields (route, calls,
+tokens), so replay runs of the same code diff clean. --compare prints deltas against an earlier report.
+
+No replay file ships with the repo and replay keys hash the full messages, so calls that were
+never recorded (or whose prompt or context changed since) are answered by fake_groq.synthesize:
+a deterministic per-stage stand-in (keyword routing, unchanged reformulate/refine, rule-based
+SQL, data-extract answers). Runs without a live key are therefore repeatable and comparable
+across commits; the report counts replayed vs synthesized calls. --record with a live
+GROQ_API_KEY stores real completions for realistic answers and token counts; --no-fallback
+turns unrecorded calls into counted misses instead.
+
+    cd src && python ../bench/bench_pipeline.py --seed                      # once per database
+    cd src && python ../bench/bench_pipeline.py --record                    # optional, live GROQ_API_KEY
+    cd src && python ../bench/bench_pipeline.py --llm-latency-ms 300 --out ../bench/results/HEAD.json
+    cd src && python ../bench/bench_pipeline.py --compare ../bench/results/HEAD.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+os.environ.setdefault("LOG_ECHO", "false")   # Keep the report readable; the audit log still gets everything
+
+import fakeredis
+
+import config
+from config import DB_CONFIG
+from core import (identify_intent, ask_sql_ai, ask_rag_ai, ask_both_ai, validate_query, reformulate_question,
+                  handle_small_talk, invalidate_answer_cache, clear_sql_cache, load_catalog, try_fast_path,
+                  warm_up, AnswerStream)
+from ingest import ingest_to_knowledge_base
+from utils import memory_manager, setup_database, save_turn, clear_embedding_cache, start_trace, flush_logs
+from eval_router import load_qa_cases, load_tsv_cases, percentile
+from fake_groq import FakeGroq
+
+DATA_FILES = [os.path.join(ROOT, "Data", name) for name in ("all_product_specs.txt", "all_warranties.txt", "delivery_koombiyo.txt")]
+SMALL_TALK = ("GREETING", "ABOUT", "CLOSURE")
+ANSWERERS = {"BOTH": ask_both_ai, "SQL": ask_sql_ai, "RAG": ask_rag_ai}
+
+
+def _pg_args():
+    args = []
+    for flag, key in (("-h", "host"), ("-p", "port"), ("-U", "user"), ("-d", "dbname")):
+        if DB_CONFIG.get(key):
+            args += [flag, str(DB_CONFIG[key])]
+    return args
+
+
+def seed_database():
+    """Restores the POS dump into the DB_* database, then builds and fills knowledge_base."""
+    env = dict(os.environ, PGPASSWORD=DB_CONFIG.get("password") or "")
+    # pg_restore exits non-zero on harmless warnings (e.g. objects that did not exist to --clean)
+    restore = subprocess.run(["pg_restore", "--no-owner", "--no-privileges", "--clean", "--if-exists",
+                              *_pg_args(), os.path.join(ROOT, "pos_db.sql")], env=env, capture_output=True, text=True)
+    print(f"pg_restore exit {restore.returncode}" + (f": {restore.stderr.strip().splitlines()[-1]}" if restore.stderr.strip() else ""))
+    extra = subprocess.run(["psql", "-q", "-1", "-v", "ON_ERROR_STOP=1", *_pg_args(), "-f", os.path.join(ROOT, "pos_doc.sql")],
+                           env=env, capture_output=True, text=True)
+    print("pos_doc.sql applied" if extra.returncode == 0 else f"pos_doc.sql skipped: {extra.stderr.strip()}")
+    setup_database()
+    stats = ingest_to_knowledge_base(DATA_FILES, force=True)
+    print(f"knowledge_base: {stats['inserted']} inserted, {stats['updated']} updated, {stats['deleted']} deleted")
+
+
+def run_question(question, session_id, groq, fast_path=True):
+    """One chat turn as main.py runs it. Returns the route, answer and what it cost."""
+    trace = start_trace()
+    calls, (prompt_tokens, completion_tokens) = groq.stats["calls"], groq.tokens()
+    started, started_wall = time.perf_counter(), time.time()
+    ttft = None
+
+    fast = try_fast_path(question) if fast_path else None
+    if fast is not None:
+        route, answer = "FAST", fast[0]
+    else:
+        standalone = reformulate_question(question, session_id)
+        intent = identify_intent(standalone)
+        if intent in SMALL_TALK:
+            route, answer = intent, handle_small_talk(intent)
+        else:
+            is_safe, error_message = validate_query(standalone)
+            if not is_safe:
+                route, answer = "BLOCKED", error_message
+            else:
+                route = intent
+                answer = ANSWERERS.get(intent, ask_rag_ai)(standalone, stream=True)
+                if isinstance(answer, AnswerStream):
+                    stream = answer
+                    answer = "".join(stream)   # Consumed like st.write_stream, so on_complete callbacks run
+                    if stream.first_token_time:
+                        ttft = stream.first_token_time - started_wall
+    save_turn(session_id, question, answer)
+    latency = time.perf_counter() - started
+
+    now_prompt, now_completion = groq.tokens()
+    return {
+        "route": route,
+        "latency": latency,
+        "ttft": ttft,
+        "llm_calls": groq.stats["calls"] - calls,
+        "prompt_tokens": now_prompt - prompt_tokens,
+        "completion_tokens": now_completion - completion_tokens,
+        "answer_sha1": hashlib.sha1(answer.encode("utf-8")).hexdigest()[:10],
+        "spans": list(trace),
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def summarize(cases, results, wall_seconds):
+    by_route, stages = defaultdict(list), defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result)
+        for stage, seconds in result["spans"]:
+            stages[stage].append(seconds)
+
+    routes = {}
+    for route, rows in sorted(by_route.items()):
+        latencies = [row["latency"] for row in rows]
+        ttfts = [row["ttft"] for row in rows if row["ttft"] is not None]
+        routes[route] = {
+            "count": len(rows),
+            "throughput_qps": round(len(rows) / sum(latencies), 2),
+            "mean_ms": _ms(statistics.mean(latencies)),
+            "p50_ms": _ms(statistics.median(latencies)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "ttft_p50_ms": _ms(statistics.median(ttfts)) if ttfts else None,
+            "llm_calls": sum(row["llm_calls"] for row in rows),
+            "prompt_tokens": sum(row["prompt_tokens"] for row in rows),
+            "completion_tokens": sum(row["completion_tokens"] for row in rows),
+        }
+
+    latencies = [row["latency"] for row in results]
+    return {
+        "overall": {
+            "questions": len(results),
+            "throughput_qps": round(len(results) / wall_seconds, 2),
+            "p50_ms": _ms(statistics.median(latencies)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "llm_calls": sum(row["llm_calls"] for row in results),
+            "prompt_tokens": sum(row["prompt_tokens"] for row in results),
+            "completion_tokens": sum(row["completion_tokens"] for row in results),
+            "route_matches_label": sum(row["route"] == label for (label, _), row in zip(cases, results)),
+        },
+        "routes": routes,
+        "stages": {stage: {"count": len(values), "p50_ms": _ms(statistics.median(values)), "p95_ms": _ms(percentile(values, 95))}
+                   for stage, values in sorted(stages.items())},
+        "questions": [{"question": question, "label": label, "route": row["route"], "llm_calls": row["llm_calls"],
+                       "prompt_tokens": row["prompt_tokens"], "completion_tokens": row["completion_tokens"],
+                       "answer_sha1": row["answer_sha1"]}
+                      for (label, question), row in zip(cases, results)],
+    }
+
+
+def print_report(report, previous=None):
+    def delta(route, key):
+        if not previous or route not in previous.get("routes", {}) or report["routes"][route][key] is None:
+            return ""
+        old = previous["routes"][route][key]
+        return f" ({report['routes'][route][key] - old:+.1f})" if old is not None else ""
+
+    overall = report["overall"]
+    print(f"{overall['questions']} questions, {overall['throughput_qps']} q/s, p50 {overall['p50_ms']} ms, "
+          f"p95 {overall['p95_ms']} ms, {overall['llm_calls']} LLM calls, "
+          f"{overall['prompt_tokens']}+{overall['completion_tokens']} tokens, "
+          f"{overall['route_matches_label']}/{overall['questions']} routed as labeled\n")
+    print(f"{'route':<9} {'n':>4} {'q/s':>6} {'p50 ms':>16} {'p95 ms':>16} {'ttft p50':>9} {'calls':>6} {'prompt tok':>16} {'compl tok':>14}")
+    for route, row in report["routes"].items():
+        ttft = f"{row['ttft_p50_ms']:.0f}" if row["ttft_p50_ms"] is not None else "-"
+        print(f"{route:<9} {row['count']:>4} {row['throughput_qps']:>6} {row['p50_ms']:>8}{delta(route, 'p50_ms'):<8} "
+              f"{row['p95_ms']:>8}{delta(route, 'p95_ms'):<8} {ttft:>9} {row['llm_calls']:>6} "
+              f"{row['prompt_tokens']:>8}{delta(route, 'prompt_tokens'):<8} {row['completion_tokens']:>6}{delta(route, 'completion_tokens'):<8}")
+    print("\nSlowest stages (p50 / p95 ms):")
+    for stage, row in sorted(report["stages"].items(), key=lambda item: -item[1]["p50_ms"])[:10]:
+        print(f"  {stage:<32} {row['p50_ms']:>8} / {row['p95_ms']:<8} x{row['count']}")
+    replay = report["replay"]
+    if replay["synthesized"]:
+        print(f"\n{replay['synthesized']} of {replay['calls']} LLM calls were synthesized (no recorded response); "
+              f"compare such runs only with runs of the same replay file.")
+    if replay["misses"]:
+        print(f"\nWARNING: {replay['misses']} of {replay['calls']} LLM calls had no recorded response; run --record to fill the replay file.")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qa", default=os.path.join(ROOT, "QA.txt"))
+    parser.add_argument("--tsv", default=os.path.join(ROOT, "bench", "router_cases.tsv"))
+    parser.add_argument("--replay", default=os.path.join(ROOT, "bench", "groq_replay.jsonl"))
+    parser.add_argument("--record", action="store_true", help="call live Groq and append its responses to --replay")
+    parser.add_argument("--no-fallback", action="store_true", help="answer unrecorded calls with a miss marker instead of synthesizing")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="simulated time to first token per LLM call")
+    parser.add_argument("--llm-ms-per-token", type=float, default=2.0, help="simulated generation time per completion token")
+    parser.add_argument("--session-turns", type=int, default=1, help="consecutive questions sharing one chat session")
+    parser.add_argument("--no-fast-path", action="store_true")
+    parser.add_argument("--seed", action="store_true", help="restore pos_db.sql and ingest Data/ into the DB_* database, then exit")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to diff against")
+    args = parser.parse_args()
+
+    memory_manager.r = fakeredis.FakeRedis(decode_responses=True)
+    if args.seed:
+        seed_database()
+        return
+
+    cases = (load_qa_cases(args.qa) if args.qa else []) + (load_tsv_cases(args.tsv) if args.tsv else [])
+    if not cases:
+        sys.exit("No questions found.")
+
+    live = None
+    if args.record:
+        from groq import Groq
+        live = Groq(api_key=config.GROQ_API_KEY)
+    groq = FakeGroq(args.replay, args.llm_latency_ms, args.llm_ms_per_token, record_from=live, fallback=not args.no_fallback)
+    config._groq_client = groq   # Every get_groq_client() caller now talks to the stand-in
+
+    # What main.init_system does, outside the timed loop; caches start empty for every run
+    load_catalog()
+    warm_up()
+    invalidate_answer_cache()
+    clear_sql_cache()
+    clear_embedding_cache()
+
+    results, session_id = [], None
+    started = time.perf_counter()
+    for i, (_, question) in enumerate(cases):
+        if i % max(1, args.session_turns) == 0:
+            session_id = f"bench_{uuid.uuid4().hex[:8]}"
+        results.append(run_question(question, session_id, groq, fast_path=not args.no_fast_path))
+    wall_seconds = time.perf_counter() - started
+    flush_logs()
+
+    report = summarize(cases, results, wall_seconds)
+    report["replay"] = {key: groq.stats[key] for key in ("calls", "misses", "synthesized", "recorded")}
+    report["settings"] = {
+        "commit": _git_commit(),
+        "corpus_sha1": hashlib.sha1("\n".join(q for _, q in cases).encode("utf-8")).hexdigest()[:10],
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_ms_per_token": args.llm_ms_per_token,
+        "session_turns": args.session_turns,
+        "fast_path": not args.no_fast_path,
+        "embed_backend": config.EMBED_BACKEND,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
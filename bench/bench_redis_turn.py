@@ -0,0 +1,97 @@
+"""
+Redis round trips per chat turn: the old memory_manager pattern (PING before every operation,
+one pipeline per saved message) vs. the circuit breaker + save_turn.
+
+A turn is what main.py does with chat memory: read the history for reformulation, save the
+question and the answer, and (only at LOG_LEVEL=DEBUG now) read the history again for the log.
+Round trips are counted client-side, one per command or pipeline sent, against a live Redis.
+
+    cd src && python ../bench/bench_redis_turn.py --turns 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from config import REDIS_HOST, REDIS_PORT, REDIS_PASSWORD, CHAT_TTL, MAX_HISTORY_MESSAGES
+from utils import memory_manager
+
+
+class CountingConnection(redis.Connection):
+    """Counts every packet sent: a single command or a whole pipeline is one round trip."""
+    round_trips = 0
+
+    def send_packed_command(self, command, check_health=True):
+        CountingConnection.round_trips += 1
+        return super().send_packed_command(command, check_health)
+
+
+def legacy_turn(client, session_id, question, answer):
+    """memory_manager before the circuit breaker: _is_redis_up() PINGed before each operation."""
+    key = f"chat:{session_id}"
+    client.ping()
+    client.lrange(key, -6, -1)                      # reformulate_question
+    for role, content in (("user", question), ("assistant", answer)):
+        client.ping()
+        pipe = client.pipeline()
+        pipe.rpush(key, json.dumps({"role": role, "content": content}))
+        pipe.ltrim(key, -MAX_HISTORY_MESSAGES, -1)
+        pipe.expire(key, CHAT_TTL)
+        pipe.execute()
+    client.ping()
+    client.lrange(key, -6, -1)                      # system_log(get_chat_history(...)), every turn
+
+
+def current_turn(session_id, question, answer, debug_history):
+    memory_manager.get_chat_history(session_id, window_size=6)
+    memory_manager.save_turn(session_id, question, answer)
+    if debug_history:
+        memory_manager.get_chat_history(session_id, window_size=6)
+
+
+def measure(label, turn, turns):
+    CountingConnection.round_trips = 0
+    latencies = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        turn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    per_turn = CountingConnection.round_trips / turns
+    print(f"  {label:<34} {per_turn:5.1f} round trips/turn   "
+          f"p50 {statistics.median(latencies):6.2f} ms   mean {statistics.mean(latencies):6.2f} ms")
+    return per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    pool = redis.ConnectionPool(connection_class=CountingConnection, host=REDIS_HOST, port=REDIS_PORT,
+                                password=REDIS_PASSWORD, decode_responses=True)
+    client = redis.Redis(connection_pool=pool)
+    client.ping()   # Open the connection now so its handshake is not counted
+    memory_manager.r = client
+
+    session_id = f"bench_{uuid.uuid4().hex[:8]}"
+    question, answer = "How many iPhone 15 units are in stock?", "We have 12 iPhone 15 units in stock."
+    print(f"{args.turns} turns against {REDIS_HOST}:{REDIS_PORT}\n")
+    try:
+        before = measure("before (PING per op, 2 saves)", lambda: legacy_turn(client, session_id, question, answer), args.turns)
+        after = measure("after  (breaker + save_turn)", lambda: current_turn(session_id, question, answer, False), args.turns)
+        debug = measure("after, LOG_LEVEL=DEBUG", lambda: current_turn(session_id, question, answer, True), args.turns)
+    finally:
+        client.delete(f"chat:{session_id}")
+
+    print(f"\nRound trips per turn: {before:.0f} -> {after:.0f} ({1 - after / before:.0%} fewer; {debug:.0f} with DEBUG history logging)")
+
+
+if __name__ == "__main__":
+    main()
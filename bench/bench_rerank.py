@@ -0,0 +1,106 @@
+"""
+RAG context selection benchmark: the former fixed 0.7/0.3 score blend (top 6) vs. core.rerank
+(RRF + optional cross-encoder + MMR + token budget), on the live knowledge_base.
+
+For each RAG/BOTH question in QA.txt and router_cases.tsv it runs the hybrid search once, then
+reports the chunks and context tokens each strategy would send to the LLM, how many near-duplicate
+pairs survive in the legacy top 6, the overlap between the two selections, and per-stage timings.
+
+    cd src && python ../bench/bench_rerank.py
+    cd src && RERANK_CROSS_ENCODER=cross-encoder/ms-marco-MiniLM-L-6-v2 python ../bench/bench_rerank.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from config import (KB_HNSW_EF_SEARCH, KB_VECTOR_CANDIDATES, KB_KEYWORD_CANDIDATES, KB_MIN_VECTOR_SCORE,
+                    RERANK_DUPLICATE_SIMILARITY, RAG_CONTEXT_TOKEN_BUDGET)
+from core.retrieve import KB_HYBRID_SEARCH_SQL
+from core.rerank import Candidate, legacy_order, rerank, count_tokens, _unit_embeddings
+from utils import get_connection, embed_query, get_metrics_summary
+from eval_router import load_qa_cases, load_tsv_cases
+
+FILLER_WORDS = ['give', 'me', 'show', 'tell', 'what', 'is', 'the', 'of', 'specs', 'spec']   # As in ask_rag_ai
+
+
+def fetch_candidates(conn, question):
+    search_terms = ' '.join(w for w in question.lower().split() if w not in FILLER_WORDS)
+    with conn.cursor() as cur:
+        cur.execute(f"SET LOCAL hnsw.ef_search = {max(KB_HNSW_EF_SEARCH, KB_VECTOR_CANDIDATES)};")
+        cur.execute(KB_HYBRID_SEARCH_SQL, {
+            "vector": embed_query(question).tolist(),
+            "terms": search_terms,
+            "vector_limit": KB_VECTOR_CANDIDATES,
+            "keyword_limit": KB_KEYWORD_CANDIDATES,
+            "min_vector_score": KB_MIN_VECTOR_SCORE,
+        })
+        rows = cur.fetchall()
+    conn.rollback()
+    return [Candidate(*row) for row in rows]
+
+
+def duplicate_pairs(chunks):
+    if len(chunks) < 2:
+        return 0
+    embeddings = _unit_embeddings(chunks)
+    similarity = embeddings @ embeddings.T
+    return int((np.triu(similarity, k=1) >= RERANK_DUPLICATE_SIMILARITY).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qa", default=os.path.join(ROOT, "QA.txt"))
+    parser.add_argument("--tsv", default=os.path.join(ROOT, "bench", "router_cases.tsv"))
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cases = (load_qa_cases(args.qa) if args.qa else []) + (load_tsv_cases(args.tsv) if args.tsv else [])
+    questions = [question for label, question in cases if label in ("RAG", "BOTH")]
+    if not questions:
+        sys.exit("No RAG questions found.")
+
+    rows = []
+    with get_connection() as conn:
+        for question in questions:
+            candidates = fetch_candidates(conn, question)
+            if not candidates:
+                continue
+            legacy = legacy_order(candidates)
+            started = time.perf_counter()
+            chosen, tokens = rerank(question, candidates)
+            rerank_ms = (time.perf_counter() - started) * 1000
+            legacy_tokens = sum(count_tokens(c.context) for c in legacy)
+            overlap = len({c.context for c in legacy} & {c.context for c in chosen})
+            rows.append((len(candidates), len(legacy), legacy_tokens, duplicate_pairs(legacy),
+                         len(chosen), tokens, duplicate_pairs(chosen), overlap, rerank_ms))
+            if args.verbose:
+                print(f"  {len(candidates):>3} cand | legacy {len(legacy)} chunks {legacy_tokens:>5} tok | "
+                      f"rerank {len(chosen)} chunks {tokens:>5} tok | overlap {overlap} | {question}")
+
+    if not rows:
+        sys.exit("The hybrid search returned no candidates; is knowledge_base ingested?")
+
+    columns = list(zip(*rows))
+    legacy_tokens, rerank_tokens = sum(columns[2]), sum(columns[5])
+    print(f"{len(rows)} questions with candidates (avg {statistics.mean(columns[0]):.1f} candidates), "
+          f"token budget {RAG_CONTEXT_TOKEN_BUDGET}\n")
+    print(f"{'':<8} {'chunks/q':>9} {'tokens/q':>9} {'dup pairs':>10}")
+    print(f"{'legacy':<8} {statistics.mean(columns[1]):9.1f} {statistics.mean(columns[2]):9.0f} {sum(columns[3]):10d}")
+    print(f"{'rerank':<8} {statistics.mean(columns[4]):9.1f} {statistics.mean(columns[5]):9.0f} {sum(columns[6]):10d}")
+    print(f"\nContext tokens: {legacy_tokens} -> {rerank_tokens} ({1 - rerank_tokens / legacy_tokens:.0%} fewer); "
+          f"avg overlap with legacy selection {statistics.mean(columns[7]):.1f} chunks")
+    print(f"Re-rank time per query: p50 {statistics.median(columns[8]):.2f} ms, max {max(columns[8]):.2f} ms")
+    for name, stage in get_metrics_summary()["histograms"].items():
+        if "stage=rerank:" in name:
+            print(f"  {name.split('stage=')[1].rstrip('}'):<24} p50 {stage['p50'] * 1000:7.2f} ms  p95 {stage['p95'] * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Schema pruning measurement for text-to-SQL prompts (core.schema_index).
+
+For every question in schema_cases.tsv it builds the SQL generation prompt twice, with the full
+SCHEMA_INFO and with the pruned schema, and reports prompt tokens and table recall (all tables
+the question needs were selected). Token counts use the embedding model's tokenizer, the same
+one validate_query uses; absolute numbers differ from Groq's, the reduction is comparable.
+
+    cd src && python ../bench/bench_schema_prompt.py              # offline: tokens + table recall
+    cd src && python ../bench/bench_schema_prompt.py --llm        # also generate and run SQL both ways (Groq + Postgres)
+"""
+import argparse
+import os
+import statistics
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from config import get_embed_model, SCHEMA_INFO, SCHEMA_TABLES, SCHEMA_TOP_K
+from core.retrieve import build_sql_prompt, generate_sql
+from core.schema_index import schema_for_question
+from core.sql_guard import execute_guarded
+from utils import get_connection
+
+
+def load_cases(path):
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            tables, question = line.rstrip("\n").split("\t", 1)
+            cases.append(([t.strip() for t in tables.split(",")], question.strip()))
+    return cases
+
+
+def count_tokens(text):
+    return len(get_embed_model().tokenizer.tokenize(text))
+
+
+def run_sql(question, schema):
+    """Generates SQL with this schema and runs it; returns (ok, result_text)."""
+    sql = generate_sql(build_sql_prompt(question, schema), attempt=1)
+    with get_connection() as conn:
+        try:
+            result = execute_guarded(conn, sql)
+            conn.commit()
+            return True, result.text
+        except Exception as e:
+            conn.rollback()
+            return False, str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", default=os.path.join(ROOT, "bench", "schema_cases.tsv"))
+    parser.add_argument("--k", type=int, default=SCHEMA_TOP_K, help="top-k tables by similarity")
+    parser.add_argument("--llm", action="store_true", help="generate + execute SQL with both schemas (live Groq, Postgres)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    full_tokens, pruned_tokens, table_counts = [], [], []
+    recalled = ok_full = ok_pruned = agree = 0
+
+    for needed, question in cases:
+        schema, tables = schema_for_question(question, args.k)
+        full_tokens.append(count_tokens(build_sql_prompt(question, SCHEMA_INFO)))
+        pruned_tokens.append(count_tokens(build_sql_prompt(question, schema)))
+        table_counts.append(len(tables))
+        hit = set(needed) <= set(tables)
+        recalled += hit
+
+        line = f"  [{'ok ' if hit else 'BAD'}] {full_tokens[-1]:>4} -> {pruned_tokens[-1]:>4} tok  {','.join(tables):<55} {question}"
+        if args.llm:
+            full_ok, full_text = run_sql(question, SCHEMA_INFO)
+            pruned_ok, pruned_text = run_sql(question, schema)
+            ok_full += full_ok
+            ok_pruned += pruned_ok
+            agree += full_ok and pruned_ok and full_text == pruned_text
+            line += f"  sql full={'ok' if full_ok else 'ERR'} pruned={'ok' if pruned_ok else 'ERR'}"
+        if args.verbose or not hit:
+            print(line)
+
+    n = len(cases)
+    full_mean, pruned_mean = statistics.mean(full_tokens), statistics.mean(pruned_tokens)
+    print()
+    print(f"Cases                          : {n}  (top-k = {args.k})")
+    print(f"Tables in prompt (mean)        : {statistics.mean(table_counts):.1f} of {len(SCHEMA_TABLES)}")
+    print(f"Prompt tokens full / pruned    : {full_mean:.0f} / {pruned_mean:.0f}  ({1 - pruned_mean / full_mean:.1%} fewer)")
+    print(f"Table recall                   : {recalled / n:6.1%}  ({recalled}/{n})")
+    if args.llm:
+        print(f"SQL executes, full schema      : {ok_full / n:6.1%}  ({ok_full}/{n})")
+        print(f"SQL executes, pruned schema    : {ok_pruned / n:6.1%}  ({ok_pruned}/{n})")
+        print(f"Same result full vs pruned     : {agree / n:6.1%}  ({agree}/{n})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Accuracy/latency evaluation for the local intent router (core.router).
+
+Cases come from QA.txt-style files (questions grouped under section headers that name the
+route, e.g. "(RAG Focus)", "(BOTH Route)") and/or TSV files of `LABEL<TAB>question`.
+Accuracy is reported per set: router_cases.tsv is the held-out set and the headline number;
+QA.txt is the end-to-end demo corpus. Cases that are near-copies of a routing example
+(prompts.routing_examples) are flagged, since they measure training data, not routing.
+
+    cd src && python ../bench/eval_router.py                      # QA.txt + router_cases.tsv
+    cd src && python ../bench/eval_router.py --llm                # also resolve escalations via Groq
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from core.intent import classify_with_llm
+from core.router import ROUTES, route_locally, train_router
+from prompts import routing_examples
+from utils import clear_embedding_cache
+
+# Section header keywords in QA.txt -> expected route
+SECTION_LABELS = [
+    ("BOTH", "BOTH"),
+    ("RAG", "RAG"),
+    ("CONTEXTUAL RETRIEVAL", "RAG"),
+    ("NEGATIVE TESTING", "RAG"),
+    ("SQL", "SQL"),
+    ("DATA FOCUS", "SQL"),
+]
+_QUESTION = re.compile(r'^\s*Q:\s*"?(.*?)"?\s*$')
+_WORD = re.compile(r"[a-z0-9]+")
+LEAK_SIMILARITY = 0.7   # Word-set Jaccard above which a case counts as a copy of a training example
+
+
+def load_qa_cases(path):
+    """Questions from a QA.txt-style file, labeled by the section header they sit under."""
+    cases, label = [], None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = _QUESTION.match(line)
+            if match:
+                if label:
+                    cases.append((label, match.group(1)))
+                continue
+            header = line.strip().upper()
+            if header and "(" in header and not header.startswith(("A:", "TESTING")):
+                label = next((route for key, route in SECTION_LABELS if key in header), None)
+    return cases
+
+
+def load_tsv_cases(path):
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            label, question = line.rstrip("\n").split("\t", 1)
+            cases.append((label.strip().upper(), question.strip()))
+    return cases
+
+
+def _words(text):
+    return set(_WORD.findall(text.lower()))
+
+
+def training_overlap(question, examples=routing_examples):
+    """Highest word-set Jaccard similarity between `question` and any routing example."""
+    words = _words(question)
+    return max((len(words & _words(e)) / len(words | _words(e)) for route in examples for e in examples[route]),
+               default=0.0)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qa", default=os.path.join(ROOT, "QA.txt"))
+    parser.add_argument("--tsv", default=os.path.join(ROOT, "bench", "router_cases.tsv"))
+    parser.add_argument("--llm", action="store_true", help="resolve escalated cases with the LLM classifier (live Groq)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    case_sets = {}
+    if args.tsv:
+        case_sets["held-out"] = load_tsv_cases(args.tsv)
+    if args.qa:
+        case_sets["QA.txt"] = load_qa_cases(args.qa)
+    if not any(case_sets.values()):
+        sys.exit("No cases found.")
+
+    start = time.perf_counter()
+    train_router()
+    print(f"Router trained in {(time.perf_counter() - start) * 1000:.0f} ms; "
+          + ", ".join(f"{len(cases)} {name} cases" for name, cases in case_sets.items()) + "\n")
+
+    cold_ms, warm_ms = [], []
+    results = {}
+    for name, cases in case_sets.items():
+        confusion = Counter()
+        correct_confident = confident_total = correct_final = escalated = leaked = 0
+        for expected, question in cases:
+            clear_embedding_cache()   # cold: includes the query encode
+            t0 = time.perf_counter()
+            route, confident, scores = route_locally(question)
+            cold_ms.append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()  # warm: embedding served from the cache
+            route_locally(question)
+            warm_ms.append((time.perf_counter() - t0) * 1000)
+
+            final = route
+            if confident:
+                confident_total += 1
+                correct_confident += route == expected
+            else:
+                escalated += 1
+                if args.llm:
+                    final = classify_with_llm(question)
+
+            overlap = training_overlap(question)
+            if overlap >= LEAK_SIMILARITY:
+                leaked += 1
+                print(f"  [LEAK] {name}: {overlap:.2f} word overlap with a routing example: {question}")
+            correct_final += final == expected
+            confusion[(expected, final)] += 1
+            if args.verbose or final != expected:
+                flag = "ok " if final == expected else "BAD"
+                print(f"  [{flag}] {name:<8} {expected:<4} -> {final:<4} {'(escalated)' if not confident else '           '} {scores}  {question}")
+        results[name] = (len(cases), correct_final, correct_confident, confident_total, escalated, leaked, confusion)
+
+    for name, (n, correct_final, correct_confident, confident_total, escalated, leaked, confusion) in results.items():
+        if not n:
+            continue
+        print(f"\n== {name} ({n} cases{f', {leaked} near-copies of training examples' if leaked else ''}) ==")
+        print(f"Accuracy (final route)        : {correct_final / n:6.1%}  ({correct_final}/{n})")
+        print(f"Accuracy (confident, local)   : {correct_confident / confident_total if confident_total else 0:6.1%}  ({correct_confident}/{confident_total})")
+        print(f"Escalated to LLM              : {escalated / n:6.1%}  ({escalated}/{n}){'' if args.llm else '  [local guess counted]'}")
+        print("Confusion (rows = expected, cols = routed):")
+        print("        " + "".join(f"{r:>6}" for r in ROUTES))
+        for expected in ROUTES:
+            print(f"  {expected:<6}" + "".join(f"{confusion[(expected, r)]:>6}" for r in ROUTES))
+
+    print(f"\nLatency cold (ms) p50/p95/p99 : {statistics.median(cold_ms):.2f} / {percentile(cold_ms, 95):.2f} / {percentile(cold_ms, 99):.2f}")
+    print(f"Latency warm (ms) p50/p95/p99 : {statistics.median(warm_ms):.2f} / {percentile(warm_ms, 95):.2f} / {percentile(warm_ms, 99):.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Offline stand-in for the Groq client used by bench/bench_pipeline.py.
+
+Replays chat completions recorded in a JSONL file, keyed by model + messages, with a
+configurable simulated latency: `latency_ms` before the response (time to first token) plus
+`ms_per_token` per completion token. Streams are replayed word by word in the same shape
+core.streaming reads (choices[0].delta.content, usage on the final chunk under x_groq).
+
+With `record_from` set to a real Groq client, every call goes to Groq and the response is
+appended to the file, so a corpus is recorded once with a live key and replayed afterwards.
+
+Prompts that were never recorded (no replay file yet, or a prompt/context change since the
+recording) are answered by `synthesize`, a deterministic stand-in per pipeline stage: the
+routing keyword rules for intent, the question itself for reformulate/refine, rule-based SQL
+over the POS schema for text-to-SQL, and an extract of the supplied data for final answers.
+The same input always gives the same text and token counts, so runs stay comparable across
+commits without a live key. They are counted in `stats["synthesized"]`. With `fallback=False`
+they get MISS_TEXT instead and are counted in `stats["misses"]`.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+MISS_TEXT = "[no recorded response]"
+_QUOTED_QUESTION = re.compile(r'USER QUESTION:\s*"?(.+?)"?\s*$', re.MULTILINE)
+_SQL_QUESTION = re.compile(r"Task: Generate a SELECT query to answer:\s*(.+)")
+_ORDER_ID = re.compile(r"\border\s*#?\s*(\d+)", re.IGNORECASE)
+_HINTED_PRODUCT = re.compile(r"= product_id (\d+)")
+_BOTH_WORDS = ("why", "reason", "explain", "cause")
+_RAG_WORDS = ("spec", "feature", "warranty", "policy", "compare", "recommend", "describe", "camera", "capacity")
+SYNTHETIC_ANSWER_WORDS = 60
+
+ORDER_SQL = """SELECT o.order_id, os.status_name, o.order_date, c.service_name AS courier, s.name AS staff
+FROM "order" o JOIN order_status os ON os.status_id = o.status_id
+LEFT JOIN courier c ON c.courier_id = o.courier_id LEFT JOIN staff s ON s.staff_id = o.staff_id
+WHERE o.order_id = {order_id}"""
+DELAYED_SQL = """SELECT o.order_id, o.order_date, c.service_name AS courier
+FROM "order" o JOIN order_status os ON os.status_id = o.status_id
+LEFT JOIN courier c ON c.courier_id = o.courier_id WHERE os.status_name ILIKE 'delayed'"""
+STOCK_SQL = "SELECT p.name, s.quantity, s.last_updated FROM product p JOIN stock s ON s.product_id = p.product_id{where}"
+PRICE_CHANGE_SQL = "SELECT p.name, l.previous_price, l.new_price, l.change_reason, l.change_date FROM price_change_log l JOIN product p ON p.product_id = l.product_id{where}"
+PRODUCT_SQL = "SELECT name, brand, current_price FROM product{where} ORDER BY name LIMIT 10"
+
+
+def _synthetic_route(question):
+    """The keyword rules of the routing prompt."""
+    q = question.lower()
+    if any(word in q for word in _BOTH_WORDS):
+        return "BOTH"
+    if any(word in q for word in _RAG_WORDS):
+        return "RAG"
+    return "SQL"
+
+
+def _synthetic_sql(prompt):
+    """Rule-based SQL for the text-to-SQL prompt, using the catalog product_id hint when present."""
+    match = _SQL_QUESTION.search(prompt)
+    question = (match.group(1) if match else "").lower()
+    order = _ORDER_ID.search(question)
+    if order:
+        return ORDER_SQL.format(order_id=order.group(1))
+    if "delay" in question:
+        return DELAYED_SQL
+    product = _HINTED_PRODUCT.search(prompt)
+    if "price change" in question or "previous price" in question:
+        return PRICE_CHANGE_SQL.format(where=f" WHERE l.product_id = {product.group(1)}" if product else "")
+    if any(word in question for word in ("stock", "how many", "left", "units")):
+        return STOCK_SQL.format(where=f" WHERE p.product_id = {product.group(1)}" if product else "")
+    return PRODUCT_SQL.format(where=f" WHERE product_id = {product.group(1)}" if product else "")
+
+
+def synthesize(messages):
+    """Deterministic stand-in completion for one pipeline stage. Returns (stage, text)."""
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = str(messages[-1].get("content", "")) if messages else ""
+    quoted = _QUOTED_QUESTION.search(user)
+    question = quoted.group(1).strip() if quoted else user.strip()
+    if "Classify query intent" in user:
+        return "intent", _synthetic_route(question)
+    if "Query Refinement Engine" in system:
+        return "reformulate", question
+    if "Search Optimizer" in user:
+        return "refine", question
+    if "Read-Only PostgreSQL generator" in user:
+        return "sql", _synthetic_sql(user)
+    words = user.split()
+    return "answer", "Based on the available data: " + " ".join(words[:SYNTHETIC_ANSWER_WORDS])
+
+
+def request_key(model, messages):
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _usage(prompt_tokens, completion_tokens):
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+class FakeGroq:
+    def __init__(self, path, latency_ms=300.0, ms_per_token=0.0, record_from=None, fallback=True):
+        self.path = path
+        self.fallback = fallback
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token
+        self.record_from = record_from
+        self.responses = {}
+        self.stats = {"calls": 0, "misses": 0, "synthesized": 0, "recorded": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def tokens(self):
+        with self._lock:
+            return self.stats["prompt_tokens"], self.stats["completion_tokens"]
+
+    def _count(self, entry, source="replay"):
+        with self._lock:
+            self.stats["calls"] += 1
+            if source != "replay":
+                self.stats[source] += 1
+            self.stats["prompt_tokens"] += entry["prompt_tokens"]
+            self.stats["completion_tokens"] += entry["completion_tokens"]
+
+    def _lookup(self, model, messages):
+        entry = self.responses.get(request_key(model, messages))
+        if entry is not None:
+            return entry, "replay"
+        prompt = " ".join(str(m.get("content", "")) for m in messages)
+        text, source = (synthesize(messages)[1], "synthesized") if self.fallback else (MISS_TEXT, "misses")
+        return {"text": text, "prompt_tokens": _estimate_tokens(prompt), "completion_tokens": _estimate_tokens(text)}, source
+
+    def _save(self, model, messages, text, usage):
+        entry = {"key": request_key(model, messages), "model": model, "text": text,
+                 "prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+        with self._lock:
+            self.responses[entry["key"]] = entry
+            self.stats["recorded"] += 1
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def create(self, model, messages, stream=False, **kwargs):
+        if self.record_from is not None:
+            return self._record(model, messages, stream, **kwargs)
+        entry, source = self._lookup(model, messages)
+        self._count(entry, source)
+        time.sleep(self.latency_ms / 1000)
+        if stream:
+            return self._stream(entry)
+        time.sleep(self.ms_per_token * entry["completion_tokens"] / 1000)
+        message = SimpleNamespace(content=entry["text"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=_usage(entry["prompt_tokens"], entry["completion_tokens"]))
+
+    def _stream(self, entry):
+        words = entry["text"].split(" ")
+        delay = self.ms_per_token * entry["completion_tokens"] / max(1, len(words)) / 1000
+        for i, word in enumerate(words):
+            if delay:
+                time.sleep(delay)
+            delta = SimpleNamespace(content=word if i == 0 else " " + word)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], x_groq=None)
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=_usage(entry["prompt_tokens"], entry["completion_tokens"])))
+
+    def _record(self, model, messages, stream, **kwargs):
+        response = self.record_from.chat.completions.create(model=model, messages=messages, stream=stream, **kwargs)
+        if not stream:
+            entry = self._save(model, messages, response.choices[0].message.content, response.usage)
+            self._count(entry)
+            return response
+
+        def passthrough():
+            parts, usage = [], None
+            for chunk in response:
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                yield chunk
+            text = "".join(parts)
+            usage = usage or _usage(_estimate_tokens(str(messages)), _estimate_tokens(text))
+            self._count(self._save(model, messages, text, usage))
+
+        return passthrough()
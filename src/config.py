@@ -1,19 +1,13 @@
 
 import os
-import psycopg2
-from sentence_transformers import SentenceTransformer
-from groq import Groq
+import sys
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if GROQ_API_KEY is not None:
-    print(f"API Key successfully loaded. Key starts with: {GROQ_API_KEY[:5]}...")
-else:
-    print("API Key not found. Please check your .env file and environment setup.")
-
 # Roles-based Model Mapping
 LARGE_MODEL = "llama-3.3-70b-versatile"  # High-reasoning (SQL, Synthesis)
 FAST_MODEL = "llama-3.1-8b-instant"     # Low-latency (Intent, Refinement)    
@@ -25,6 +19,19 @@ REDIS_PASSWORD=None
 CHAT_TTL = 86400          # 24 hours session expiry
 MAX_MESSAGE_CHARS = 1500  # Truncate long AI responses before storing
 MAX_HISTORY_MESSAGES = 20 # Hard cap on stored messages per session
+REDIS_BREAKER_THRESHOLD = 2   # Consecutive Redis failures before falling back to in-memory history
+REDIS_PROBE_INTERVAL = 5      # Seconds between background PINGs while the breaker is open
+
+# Logging (utils.logger): queued, written in batches by a background thread
+LOG_DIR = os.getenv("LOG_DIR", "../logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")                            # DEBUG also logs full RAG context / DB rows
+LOG_ECHO = os.getenv("LOG_ECHO", "true").lower() == "true"            # Mirror audit lines to stdout
+LOG_BATCH_SIZE = 200                                                  # Lines per write
+LOG_FLUSH_INTERVAL = 0.5                                              # Seconds a line may wait for its batch
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Rotate a log file past this size
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))            # Rotated files kept (.1 ... .N)
+LOG_MAX_MESSAGE_CHARS = 2000                                          # Longer audit messages are truncated
+LOG_MAX_RESPONSE_CHARS = 4000                                         # Longer answers are truncated in the JSON log
 
 # --- 1. CONFIGURATION ---
 DB_CONFIG = {
@@ -35,9 +42,126 @@ DB_CONFIG = {
     "port": "5432"
 }
 
+# Shared Postgres connection pool (utils.db_connection)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))                    # Connections kept open when idle
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))                   # Hard cap on open connections
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))         # Seconds to wait for a free connection
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))  # Close connections idle longer than this
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))  # Ping connections idle longer than this
+
+# knowledge_base ANN index (pgvector HNSW)
+KB_HNSW_M = 16                # Graph degree; pgvector default
+KB_HNSW_EF_CONSTRUCTION = 64  # Build-time candidate list; pgvector default
+KB_HNSW_EF_SEARCH = 40        # Query-time candidate list; must be >= the vector LIMIT below
+KB_VECTOR_CANDIDATES = 20     # Nearest neighbours pulled from the ANN index per query
+KB_KEYWORD_CANDIDATES = 20    # Full-text matches pulled from the GIN index per query
+KB_MIN_VECTOR_SCORE = 0.5     # Cosine similarity floor applied to the ANN candidates
+
+# In-process mirror of knowledge_base for RAG search (core.kb_index); Postgres stays the source of truth
+KB_INDEX_ENABLED = os.getenv("KB_INDEX_ENABLED", "false").lower() == "true"
+KB_INDEX_DIR = os.getenv("KB_INDEX_DIR", "../.kb_index")   # Snapshots: memory-mapped vectors.npy + rows.json
+KB_INDEX_CHECK_INTERVAL = 5   # Seconds between checks for a snapshot rebuilt by another process
+KB_BM25_K1 = 1.2              # BM25 term-frequency saturation
+KB_BM25_B = 0.75              # BM25 document-length normalization
+
+# Re-ranking of knowledge_base candidates before the RAG prompt (core.rerank)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"  # false = legacy 0.7/0.3 score blend, top 6
+RERANK_RRF_K = 60                   # Reciprocal rank fusion constant; damps the weight of the top ranks
+RERANK_MMR_LAMBDA = 0.7             # MMR trade-off: 1 = relevance only, 0 = diversity only
+RERANK_DUPLICATE_SIMILARITY = 0.95  # Chunks this close (cosine) to an already chosen one are dropped
+RERANK_CROSS_ENCODER = os.getenv("RERANK_CROSS_ENCODER", "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; empty = off
+RERANK_CROSS_ENCODER_CANDIDATES = 12  # Fused candidates re-scored by the cross-encoder
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1200"))  # Context tokens sent to the LLM
+RAG_MIN_CHUNKS = 2                  # Always sent, even past the budget
+RAG_MAX_CHUNKS = 6                  # Never more than this
+
+# Query-embedding cache (utils.embedding_cache)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))          # In-process LRU entries
+EMBED_CACHE_TTL = int(os.getenv("EMBED_CACHE_TTL", "3600"))            # In-process entry lifetime (seconds)
+EMBED_CACHE_REDIS = os.getenv("EMBED_CACHE_REDIS", "true").lower() == "true"  # Share vectors across workers via Redis
+EMBED_CACHE_REDIS_TTL = int(os.getenv("EMBED_CACHE_REDIS_TTL", "604800"))    # 7 days; vectors only change with the model
+
+# Semantic answer cache (core.answer_cache), per route
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = {"SQL": 0.95, "RAG": 0.92, "BOTH": 0.95}  # Min cosine similarity to reuse an answer
+ANSWER_CACHE_TTL = {"SQL": 60, "RAG": 21600, "BOTH": 120}           # Stock/order status go stale fast, specs do not
+ANSWER_CACHE_MAX_ENTRIES = 500                                       # Per route; oldest entries evicted first
+
+# BOTH route: SQL and RAG branches run concurrently (core.retrieve.ask_both_ai)
+BOTH_PARALLEL = os.getenv("BOTH_PARALLEL", "true").lower() == "true"
+BOTH_SQL_TIMEOUT = float(os.getenv("BOTH_SQL_TIMEOUT", "25"))  # Seconds before the answer goes out without DB data
+BOTH_RAG_TIMEOUT = float(os.getenv("BOTH_RAG_TIMEOUT", "25"))  # Seconds before the answer goes out without KB context
+BOTH_MAX_WORKERS = int(os.getenv("BOTH_MAX_WORKERS", "8"))     # Branch threads shared by all sessions
+
+# Local intent router (core.router); low-confidence questions escalate to the LLM classifier
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_MIN_SIMILARITY = 0.35   # Best centroid must be at least this similar to the question
+ROUTER_MIN_MARGIN = 0.04       # ...and beat the runner-up by at least this much
+
+# Text-to-SQL plan cache (core.sql_cache): successful SQL reused as parameterized templates
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "512"))     # Question patterns kept; least recently used evicted
+SQL_CACHE_TTL = int(os.getenv("SQL_CACHE_TTL", "86400"))     # Seconds; templates only go stale with the schema
+
+# Result shaping for generated SQL (core.result_shaping)
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "50"))       # Rows passed on to the answer prompt; the rest are never fetched
+SQL_FETCH_SIZE = int(os.getenv("SQL_FETCH_SIZE", "100"))   # Server-side cursor round-trip size
+
+# Execution guard for generated SQL (core.sql_guard)
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))  # Per statement, set with SET LOCAL
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "100000"))           # EXPLAIN total cost ceiling
+SQL_MAX_PLAN_ROWS = int(os.getenv("SQL_MAX_PLAN_ROWS", "1000000"))            # Largest row estimate of any plan step
+
+# Product catalog index (core.catalog) for fuzzy product-name -> product_id resolution
+CATALOG_MIN_SIMILARITY = 0.45   # Trigram (Dice) similarity needed for a fuzzy match
+CATALOG_MIN_MARGIN = 0.1        # ...and lead over the next product, otherwise the mention is ambiguous
+CATALOG_REFRESH_INTERVAL = int(os.getenv("CATALOG_REFRESH_INTERVAL", "60"))          # Seconds between incremental refreshes
+CATALOG_FULL_RELOAD_INTERVAL = int(os.getenv("CATALOG_FULL_RELOAD_INTERVAL", "3600")) # Full reload catches renames/deletes
+
+# Knowledge base ingestion (ingest.py)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # Rows per INSERT batch / savepoint
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))     # Texts per embed_model.encode forward pass
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))           # >1 embeds in a process pool, one model per worker
+INGEST_TORCH_THREADS = int(os.getenv("INGEST_TORCH_THREADS", "1")) # Torch/ONNX threads per worker (workers x threads <= cores)
+
 # Model for local embeddings (384 dimensions)
-embed_model = SentenceTransformer('all-MiniLM-L6-v2') 
-groq_client = Groq(api_key=GROQ_API_KEY)
+EMBED_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()   # torch | onnx | onnx-int8 (see embedding_backend.py)
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE")                 # Override the ONNX file picked for the backend
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR", "../.onnx_models")  # Local int8 exports for models without published ones
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0")) or None   # CPU threads for query encoding; 0 = runtime default
+
+# The embedding model and the Groq client are created on first use, once per process, so
+# importing config (and everything that imports it) stays cheap. core.warm_up() loads them
+# up front from main.init_system().
+_embed_model = None
+_embed_lock = threading.Lock()
+_groq_client = None
+_groq_lock = threading.Lock()
+
+
+def get_embed_model():
+    global _embed_model
+    if _embed_model is None:
+        with _embed_lock:
+            if _embed_model is None:
+                from embedding_backend import load_embed_model
+                _embed_model = load_embed_model(EMBED_MODEL_NAME, EMBED_BACKEND, threads=EMBED_THREADS,
+                                                onnx_file=EMBED_ONNX_FILE, export_dir=EMBED_ONNX_DIR)
+    return _embed_model
+
+
+def get_groq_client():
+    global _groq_client
+    if _groq_client is None:
+        with _groq_lock:
+            if _groq_client is None:
+                from groq import Groq
+                if GROQ_API_KEY is None:
+                    print("API Key not found. Please check your .env file and environment setup.", file=sys.stderr)
+                _groq_client = Groq(api_key=GROQ_API_KEY)
+    return _groq_client
+
 
 MAX_TOKEN=1000
 # Complete Schema Info for SQL Insights
@@ -50,4 +174,52 @@ Key Rules:
 - Status: JOIN order_status for readable names
 - Prices in LKR
 -
-"""
\ No newline at end of file
+"""
+# Structured form of SCHEMA_INFO for schema pruning (core.schema_index): per table its columns
+# and a description that is embedded once; SCHEMA_JOINS are the foreign keys used to connect
+# the selected tables.
+SCHEMA_TABLES = {
+    "product": ("product_id, name, brand, current_price, category_id, policy_id",
+                "Products sold in the shop: phone, accessory and audio models, brand and current selling price"),
+    "stock": ("product_id, quantity, last_updated",
+              "Inventory: how many units of each product are in stock or available, and when it was last updated"),
+    '"order"': ("order_id, customer_id, status_id, total_price, order_date, courier_id, staff_id",
+                "Customer orders and sales: order date, total price, who handled and delivered the order"),
+    "order_item": ("order_id, product_id, quantity, price_at_sale",
+                   "Line items of each order: which products were sold, how many and at what price"),
+    "order_status": ("status_id, status_name",
+                     "Readable order status names such as pending, shipped, delivered, delayed or cancelled"),
+    "customer": ("customer_id, name, phone, address",
+                 "Customers who placed orders: name, phone number and delivery address"),
+    "price_change_log": ("log_id, product_id, previous_price, new_price, change_reason, change_date",
+                         "History of product price changes: old and new price, reason and date of the change"),
+    "category": ("category_id, name, description",
+                 "Product categories such as smartphones, audio, power banks and accessories"),
+    "warranty_policy": ("policy_id, policy_name, return_days",
+                        "Warranty and return policies of products: policy name and number of return days"),
+    "courier": ("courier_id, service_name",
+                "Delivery courier services that ship orders"),
+    "staff": ("staff_id, name, role",
+              "Shop staff and cashiers who handled orders, with their role"),
+}
+SCHEMA_JOINS = [
+    ("stock.product_id", "product.product_id"),
+    ("product.category_id", "category.category_id"),
+    ("product.policy_id", "warranty_policy.policy_id"),
+    ("price_change_log.product_id", "product.product_id"),
+    ("order_item.product_id", "product.product_id"),
+    ('order_item.order_id', '"order".order_id'),
+    ('"order".status_id', "order_status.status_id"),
+    ('"order".customer_id', "customer.customer_id"),
+    ('"order".courier_id', "courier.courier_id"),
+    ('"order".staff_id', "staff.staff_id"),
+]
+SCHEMA_RULES = """Key Rules:
+- Quote "order" table: SELECT * FROM "order"
+- Use ILIKE for product search: name ILIKE '%term%'
+- Status: JOIN order_status for readable names
+- Prices in LKR"""
+
+# Schema pruning for SQL prompts (core.schema_index)
+SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() == "true"
+SCHEMA_TOP_K = int(os.getenv("SCHEMA_TOP_K", "3"))   # Most relevant tables; join-path tables are added on top
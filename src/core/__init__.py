@@ -1,5 +1,15 @@
 from core.intent import identify_intent
 from core.retrieve import ask_sql_ai, ask_rag_ai, ask_both_ai, validate_query,reformulate_question, handle_small_talk
+from core.answer_cache import invalidate_answer_cache, get_answer_cache_stats
+from core.streaming import AnswerStream
+from core.sql_cache import clear_sql_cache, get_sql_cache_stats
+from core.catalog import load_catalog, refresh_catalog, resolve_product, find_products, get_catalog_stats
+from core.fast_path import try_fast_path
+from core.result_shaping import get_result_shaping_stats
+from core.sql_guard import get_sql_guard_stats
+from core.warmup import warm_up
+from core.rerank import get_rerank_stats
+from core.kb_index import load_kb_index, rebuild_kb_index, get_kb_index_stats
 
 
-__all__ = ["identify_intent", "ask_sql_ai", "ask_rag_ai", "ask_both_ai", "validate_query","reformulate_question", "handle_small_talk"]
\ No newline at end of file
+__all__ = ["identify_intent", "ask_sql_ai", "ask_rag_ai", "ask_both_ai", "validate_query","reformulate_question", "handle_small_talk", "invalidate_answer_cache", "get_answer_cache_stats", "AnswerStream", "clear_sql_cache", "get_sql_cache_stats", "load_catalog", "refresh_catalog", "resolve_product", "find_products", "get_catalog_stats", "try_fast_path", "get_result_shaping_stats", "get_sql_guard_stats", "warm_up", "get_rerank_stats", "load_kb_index", "rebuild_kb_index", "get_kb_index_stats"]
\ No newline at end of file
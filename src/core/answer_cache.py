@@ -0,0 +1,141 @@
+import contextvars
+import functools
+import re
+import threading
+import time
+
+import numpy as np
+from config import ANSWER_CACHE_ENABLED, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+from utils import system_log, embed_query, record_cache
+from core.streaming import AnswerStream
+
+# Answers are cached per route and looked up by embedding similarity of the standalone query.
+# Similar-looking questions about different orders/products ("order 118" vs "order 119") embed
+# almost identically, so a hit also requires the same numeric literals in both questions.
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_UNCACHEABLE_PREFIXES = ("retrieval error", "i couldn't", "i'm unable", "⚠️")
+
+_lock = threading.Lock()
+_entries = {}   # route -> list of {"question", "vector", "numbers", "answer", "expires_at"}
+_stats = {}     # route -> {"hits", "misses", "stores", "evictions", "invalidations"}
+_skip_store = contextvars.ContextVar("answer_cache_skip_store", default=False)
+
+
+def _route_stats(route):
+    # Caller holds _lock
+    return _stats.setdefault(route, {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0})
+
+
+def _numbers(question):
+    return frozenset(_NUMBER.findall(question))
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _is_cacheable(answer):
+    if not isinstance(answer, str) or not answer.strip():
+        return False
+    return not answer.strip().lower().startswith(_UNCACHEABLE_PREFIXES)
+
+
+def lookup_answer(route, question):
+    """Returns a cached answer for a semantically equivalent question on this route, or None."""
+    vector = _unit(embed_query(question))
+    numbers = _numbers(question)
+    now = time.monotonic()
+
+    with _lock:
+        stats = _route_stats(route)
+        entries = [e for e in _entries.get(route, []) if e["expires_at"] > now]
+        _entries[route] = entries
+        if not entries:
+            stats["misses"] += 1
+            record_cache(f"answer:{route}", False)
+            return None
+
+        scores = np.stack([e["vector"] for e in entries]) @ vector
+        threshold = ANSWER_CACHE_THRESHOLD.get(route, 1.0)
+        for idx in np.argsort(-scores):
+            if scores[idx] < threshold:
+                break
+            if entries[idx]["numbers"] == numbers:
+                stats["hits"] += 1
+                record_cache(f"answer:{route}", True)
+                system_log(f" Answer cache hit [{route}] ({scores[idx]:.3f}): '{question}' ~ '{entries[idx]['question']}'")
+                return entries[idx]["answer"]
+        stats["misses"] += 1
+        record_cache(f"answer:{route}", False)
+        return None
+
+
+def store_answer(route, question, answer):
+    if not _is_cacheable(answer):
+        return
+    entry = {
+        "question": question,
+        "vector": _unit(embed_query(question)),
+        "numbers": _numbers(question),
+        "answer": answer,
+        "expires_at": time.monotonic() + ANSWER_CACHE_TTL.get(route, 0),
+    }
+    with _lock:
+        stats = _route_stats(route)
+        entries = _entries.setdefault(route, [])
+        entries.append(entry)
+        stats["stores"] += 1
+        if len(entries) > ANSWER_CACHE_MAX_ENTRIES:
+            overflow = len(entries) - ANSWER_CACHE_MAX_ENTRIES
+            del entries[:overflow]
+            stats["evictions"] += overflow
+
+
+def invalidate_answer_cache(routes=None):
+    """Drops cached answers for the given routes (all routes when None)."""
+    with _lock:
+        for route in list(_entries) if routes is None else routes:
+            dropped = len(_entries.pop(route, []))
+            _route_stats(route)["invalidations"] += dropped
+    system_log(f" Answer cache invalidated for {'all routes' if routes is None else ', '.join(routes)}.")
+
+
+def get_answer_cache_stats():
+    with _lock:
+        return {route: dict(stats, size=len(_entries.get(route, []))) for route, stats in _stats.items()}
+
+
+def skip_answer_cache():
+    """Called inside a @semantic_cache function: the answer it is about to return must not be stored."""
+    _skip_store.set(True)
+
+
+def semantic_cache(route):
+    """Decorator: serve `fn(question)` from the answer cache for `route` when possible."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(question, *args, stream=False, **kwargs):
+            if not ANSWER_CACHE_ENABLED:
+                return fn(question, *args, stream=stream, **kwargs)
+            cached = lookup_answer(route, question)
+            if cached is not None:
+                return AnswerStream.from_text(cached, f"{route} cached") if stream else cached
+            token = _skip_store.set(False)
+            try:
+                answer = fn(question, *args, stream=stream, **kwargs)
+                skip = _skip_store.get()
+            finally:
+                _skip_store.reset(token)
+            if skip:
+                system_log(f" Answer cache [{route}]: degraded answer not stored.")
+            elif isinstance(answer, AnswerStream):
+                # Streamed answers are cached once the UI has consumed the full text
+                answer.on_complete(lambda text: store_answer(route, question, text))
+            else:
+                store_answer(route, question, answer)
+            return answer
+        return wrapper
+    return decorator
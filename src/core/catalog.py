@@ -0,0 +1,228 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from config import CATALOG_MIN_SIMILARITY, CATALOG_MIN_MARGIN, CATALOG_REFRESH_INTERVAL, CATALOG_FULL_RELOAD_INTERVAL
+from utils import get_connection, system_log
+
+# In-memory index over product.name/brand/category, used to turn a product mention in a question
+# into a product_id without an ILIKE scan or an LLM call.
+#
+# Exact token matches are tried first; misspellings and spacing variants ("S24 ultra",
+# "iphone15", "samsng galaxy") fall back to trigram similarity over the name with spaces removed.
+# The index refreshes incrementally from stock.last_updated / price_change_log.change_date and
+# new product_ids, with a periodic full reload to pick up renames and deletions.
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_MAX_WINDOW = 5        # Longest run of question words compared against a product name
+
+CATALOG_SQL = """
+    SELECT p.product_id, p.name, p.brand, c.name
+    FROM product p LEFT JOIN category c ON c.category_id = p.category_id
+"""
+CATALOG_CHANGES_SQL = CATALOG_SQL + """
+    WHERE p.product_id > %(max_id)s
+       OR p.product_id IN (SELECT product_id FROM stock WHERE last_updated >= %(stock_since)s)
+       OR p.product_id IN (SELECT product_id FROM price_change_log WHERE change_date >= %(price_since)s)
+"""
+WATERMARK_SQL = """
+    SELECT (SELECT MAX(last_updated) FROM stock), (SELECT MAX(change_date) FROM price_change_log)
+"""
+
+_lock = threading.Lock()
+_products = {}                   # product_id -> {"name", "brand", "category", "tokens", "trigrams"}
+_trigram_index = {}              # trigram -> set(product_id)
+_state = {"max_id": 0, "stock_since": None, "price_since": None, "loaded_at": 0.0, "checked_at": 0.0}
+_stats = {"full_loads": 0, "refreshes": 0, "refreshed_rows": 0, "exact": 0, "fuzzy": 0, "unresolved": 0}
+
+
+def _tokens(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+def _trigrams(compact):
+    padded = f"  {compact} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _entry(name, brand, category):
+    tokens = _tokens(name)
+    return {
+        "name": name,
+        "brand": brand,
+        "category": category,
+        "tokens": frozenset(tokens),
+        "trigrams": _trigrams("".join(tokens)),
+    }
+
+
+def _index(product_id, entry):
+    # Caller holds _lock
+    old = _products.get(product_id)
+    if old is not None:
+        for gram in old["trigrams"]:
+            _trigram_index.get(gram, set()).discard(product_id)
+    _products[product_id] = entry
+    for gram in entry["trigrams"]:
+        _trigram_index.setdefault(gram, set()).add(product_id)
+
+
+def _query(sql, params=None):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            conn.commit()
+            return rows
+        finally:
+            cur.close()
+
+
+def _set_watermarks(watermarks, now):
+    # Caller holds _lock
+    stock_since, price_since = watermarks
+    _state["stock_since"] = stock_since or _state["stock_since"]
+    _state["price_since"] = price_since or _state["price_since"]
+    _state["checked_at"] = now
+
+
+def load_catalog():
+    """(Re)loads every product into the index. Returns the number of products."""
+    watermarks = _query(WATERMARK_SQL)[0]
+    rows = _query(CATALOG_SQL)
+    now = time.monotonic()
+    with _lock:
+        _products.clear()
+        _trigram_index.clear()
+        for product_id, name, brand, category in rows:
+            _index(product_id, _entry(name, brand, category))
+        _state["max_id"] = max(_products, default=0)
+        _state["loaded_at"] = now
+        _stats["full_loads"] += 1
+        _set_watermarks(watermarks, now)
+    system_log(f" Product catalog loaded: {len(rows)} products.")
+    return len(rows)
+
+
+def refresh_catalog():
+    """Re-reads only products that are new or had a stock/price change since the last check."""
+    # Watermarks are read first so a change landing mid-refresh is picked up next time
+    watermarks = _query(WATERMARK_SQL)[0]
+    params = {
+        "max_id": _state["max_id"],
+        # Dates have day granularity, so the boundary day is re-read; that is a handful of rows
+        "stock_since": _state["stock_since"] or "-infinity",
+        "price_since": _state["price_since"] or "-infinity",
+    }
+    rows = _query(CATALOG_CHANGES_SQL, params)
+    now = time.monotonic()
+    with _lock:
+        for product_id, name, brand, category in rows:
+            _index(product_id, _entry(name, brand, category))
+        _state["max_id"] = max(_products, default=0)
+        _stats["refreshes"] += 1
+        _stats["refreshed_rows"] += len(rows)
+        _set_watermarks(watermarks, now)
+    if rows:
+        system_log(f" Product catalog refreshed: {len(rows)} products re-indexed.")
+    return len(rows)
+
+
+def _ensure_fresh():
+    now = time.monotonic()
+    try:
+        if not _products or now - _state["loaded_at"] > CATALOG_FULL_RELOAD_INTERVAL:
+            load_catalog()
+        elif now - _state["checked_at"] > CATALOG_REFRESH_INTERVAL:
+            refresh_catalog()
+    except Exception as e:
+        # A stale index still resolves names; only an empty one is useless
+        system_log(f" Product catalog refresh failed: {e}")
+        if not _products:
+            raise
+
+
+def _fuzzy_scores(words):
+    """Best trigram (Dice) similarity per product over every run of up to _MAX_WINDOW words."""
+    best = {}
+    for size in range(1, min(_MAX_WINDOW, len(words)) + 1):
+        for start in range(len(words) - size + 1):
+            window = _trigrams("".join(words[start:start + size]))
+            total = sum(window.values())
+            shared = Counter()
+            for gram, count in window.items():
+                for product_id in _trigram_index.get(gram, ()):
+                    shared[product_id] += min(count, _products[product_id]["trigrams"][gram])
+            for product_id, overlap in shared.items():
+                score = 2 * overlap / (total + sum(_products[product_id]["trigrams"].values()))
+                if score > best.get(product_id, 0.0):
+                    best[product_id] = score
+    return best
+
+
+def find_products(text, limit=3, min_similarity=CATALOG_MIN_SIMILARITY):
+    """Products mentioned in free text, best first: [(product_id, name, score)]."""
+    words = _tokens(text)
+    if not words:
+        return []
+    _ensure_fresh()
+    with _lock:
+        scores = _fuzzy_scores(words)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return [(pid, _products[pid]["name"], round(score, 3))
+                for pid, score in ranked[:limit] if score >= min_similarity]
+
+
+def resolve_product(mention):
+    """
+    Maps a product mention ("iphone 15 pro", "apple iPhone 15", "S24 ultra") to (product_id, name).
+    1. Exact: all of a product's name tokens appear in the mention; the longest name wins
+       ("iPhone 15 Pro" over "iPhone 15").
+    2. Partial: the mention's words fit exactly one product name (+ brand).
+    3. Fuzzy: the best trigram match, if it clears CATALOG_MIN_SIMILARITY and beats the
+       runner-up by CATALOG_MIN_MARGIN ("pixel" alone must not pick between Pixel 7a and Pixel 8).
+    Returns None when nothing fits or the mention is ambiguous.
+    """
+    words = _tokens(mention)
+    if not words:
+        return None
+    _ensure_fresh()
+
+    word_set = frozenset(words)
+    with _lock:
+        contained = sorted(((len(p["tokens"]), pid, p["name"]) for pid, p in _products.items()
+                            if p["tokens"] and p["tokens"] <= word_set), reverse=True)
+        if contained:
+            if len(contained) > 1 and contained[0][0] == contained[1][0]:
+                _stats["unresolved"] += 1
+                return None
+            _stats["exact"] += 1
+            return contained[0][1], contained[0][2]
+
+        partial = [(pid, p["name"]) for pid, p in _products.items()
+                   if word_set <= p["tokens"] | frozenset(_tokens(p["brand"]))]
+        if len(partial) == 1:
+            _stats["exact"] += 1
+            return partial[0]
+
+        ranked = sorted(_fuzzy_scores(words).items(), key=lambda item: -item[1])
+        if not ranked or ranked[0][1] < CATALOG_MIN_SIMILARITY:
+            _stats["unresolved"] += 1
+            return None
+        close = [pid for pid, score in ranked if ranked[0][1] - score < CATALOG_MIN_MARGIN]
+        # "iphone15 pro" scores 1.0 for both iPhone 15 and iPhone 15 Pro: the longer name wins
+        # when it contains every other close candidate
+        longest = max(close, key=lambda pid: len(_products[pid]["tokens"]))
+        if all(_products[pid]["tokens"] <= _products[longest]["tokens"] for pid in close):
+            _stats["fuzzy"] += 1
+            return longest, _products[longest]["name"]
+        _stats["unresolved"] += 1
+        return None
+
+
+def get_catalog_stats():
+    with _lock:
+        return dict(_stats, products=len(_products), trigrams=len(_trigram_index),
+                    stock_since=str(_state["stock_since"]), price_since=str(_state["price_since"]))
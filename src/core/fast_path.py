@@ -0,0 +1,120 @@
+import re
+import time
+
+from utils import get_connection, system_log, span
+from core.catalog import resolve_product
+from prompts import fast_path_templates
+
+# Deterministic handlers for the highest-volume POS lookups: stock level, price and order status.
+# A question must match one of the patterns end to end (compound questions fall through) and its
+# product must resolve in the catalog; otherwise the normal LLM pipeline answers it.
+
+STOCK_SQL = """
+    SELECT p.name, s.quantity, s.last_updated
+    FROM product p LEFT JOIN stock s ON s.product_id = p.product_id
+    WHERE p.product_id = %s
+"""
+PRICE_SQL = "SELECT name, current_price FROM product WHERE product_id = %s"
+ORDER_STATUS_SQL = """
+    SELECT o.order_id, os.status_name, o.order_date
+    FROM "order" o JOIN order_status os ON os.status_id = o.status_id
+    WHERE o.order_id = %s
+"""
+
+_STOCK_PATTERNS = [
+    r"how many (?P<product>.+?) (?:are |do we have |do you have |have we got )?(?:left |available |remaining )?in stock",
+    r"how many (?P<product>.+?) (?:are )?(?:left|available|remaining)",
+    r"(?:what is |what's )?(?:the )?(?:current )?(?:stock|stock level|quantity|inventory) (?:of|for) (?P<product>.+)",
+    r"(?:is|are) (?:the )?(?P<product>.+?) (?:in stock|available)",
+    r"(?P<product>.+?) stock(?: level)?",
+]
+_PRICE_PATTERNS = [
+    r"(?:what is |what's )?(?:the )?(?:current )?price (?:of|for) (?:the )?(?P<product>.+)",
+    r"how much (?:is|does|for) (?:the |a |an )?(?P<product>.+?)(?: cost)?",
+    r"(?P<product>.+?) price",
+]
+_ORDER_STATUS_PATTERNS = [
+    r"(?:what is |what's )?(?:the )?(?:current )?status (?:of|for) (?:my )?order (?:#|no\.? ?|number )?(?P<order_id>\d+)",
+    r"(?:where is|track) (?:my )?order (?:#|no\.? ?|number )?(?P<order_id>\d+)",
+    r"order (?:#|no\.? ?|number )?(?P<order_id>\d+) status",
+]
+
+# Questions the templates cannot answer faithfully (explanations, comparisons) go to the LLM
+_NEEDS_REASONING = re.compile(r"\b(?:why|reason|explain|compare|vs|versus|and|or|delay(?:ed)?)\b", re.IGNORECASE)
+_TRAILING = re.compile(r"[\s?!.]+$")
+
+
+def _fetch_one(sql, params):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            conn.commit()
+            return row
+        finally:
+            cur.close()
+
+
+def _stock_answer(match):
+    product = resolve_product(match.group("product"))
+    if product is None:
+        return None
+    name, quantity, last_updated = _fetch_one(STOCK_SQL, (product[0],))
+    if quantity is None:
+        return fast_path_templates["no_stock_record"].format(name=name)
+    key = "stock" if quantity > 0 else "out_of_stock"
+    return fast_path_templates[key].format(name=name, quantity=quantity, last_updated=last_updated)
+
+
+def _price_answer(match):
+    product = resolve_product(match.group("product"))
+    if product is None:
+        return None
+    name, price = _fetch_one(PRICE_SQL, (product[0],))
+    return fast_path_templates["price"].format(name=name, price=price)
+
+
+def _order_status_answer(match):
+    order_id = int(match.group("order_id"))
+    row = _fetch_one(ORDER_STATUS_SQL, (order_id,))
+    if row is None:
+        return fast_path_templates["order_not_found"].format(order_id=order_id)
+    _, status, order_date = row
+    return fast_path_templates["order_status"].format(order_id=order_id, status=status, order_date=order_date)
+
+
+HANDLERS = [
+    ("order_status", [re.compile(p, re.IGNORECASE) for p in _ORDER_STATUS_PATTERNS], _order_status_answer),
+    ("stock", [re.compile(p, re.IGNORECASE) for p in _STOCK_PATTERNS], _stock_answer),
+    ("price", [re.compile(p, re.IGNORECASE) for p in _PRICE_PATTERNS], _price_answer),
+]
+
+
+def try_fast_path(question):
+    """
+    Answers stock / price / order-status lookups with one parameterized query and a template.
+    Returns (answer, handler_name) or None when the question needs the full pipeline.
+    """
+    text = _TRAILING.sub("", question.strip())
+    if not text or _NEEDS_REASONING.search(text):
+        return None
+
+    for name, patterns, handler in HANDLERS:
+        for pattern in patterns:
+            match = pattern.fullmatch(text)
+            if not match:
+                continue
+            started = time.time()
+            try:
+                with span(f"fast_path:{name}"):
+                    answer = handler(match)
+            except Exception as e:
+                system_log(f" Fast path {name} failed, falling back to LLM pipeline: {e}")
+                return None
+            if answer is None:
+                system_log(f" Fast path {name} matched but could not resolve '{text}'.")
+                return None
+            system_log(f" Fast path {name} answered in {(time.time() - started) * 1000:.1f} ms.")
+            return answer, name
+    return None
@@ -1,7 +1,11 @@
-from config import groq_client, FAST_MODEL
-from utils import system_log
+import time
+from config import FAST_MODEL, ROUTER_ENABLED
+from utils import system_log, timed, inc
 from prompts import routing_prompt
+from core.router import route_locally
+from core.llm import llm_chat
 
+@timed("intent")
 def identify_intent(question):
     # 1. Manual keyword check for extreme speed
     q = question.lower().strip()
@@ -12,20 +16,31 @@ def identify_intent(question):
     if any(word in q for word in ["bye", "thank you", "thanks", "exit"]):
         return "CLOSURE"
     
-    # 2. Use LLM-based classification for more complex queries
+    # 2. Local embedding router; only low-confidence questions pay for an LLM round trip
+    if ROUTER_ENABLED:
+        start = time.perf_counter()
+        route, confident, scores = route_locally(question)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if confident:
+            system_log(f" Identified Intent (local, {elapsed_ms:.1f} ms): {route} {scores}")
+            inc("intent_decisions_total", source="local", route=route)
+            return route
+        system_log(f" Local router unsure ({route} {scores}), escalating to LLM.")
+
+    # 3. Use LLM-based classification for more complex queries
+    route = classify_with_llm(question)
+    inc("intent_decisions_total", source="llm", route=route)
+    return route
+
+
+def classify_with_llm(question):
+    """Routes a question with the FAST_MODEL routing prompt (one Groq round trip)."""
     filled_prompt = routing_prompt.format(question=question)
-    response = groq_client.chat.completions.create(
+    response = llm_chat("intent",
         model=FAST_MODEL,
         messages=[{"role": "user", "content": filled_prompt}],
         temperature=0.1  
     )
-    usage = response.usage
-    token_metadata = {
-        "prompt_tokens": usage.prompt_tokens,
-        "completion_tokens": usage.completion_tokens,
-        "total_tokens": usage.total_tokens
-    }
-    system_log(f" Tokens Used intent - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
     
     intent = response.choices[0].message.content.strip().upper()
     
@@ -36,6 +51,7 @@ def identify_intent(question):
             if word in valid_intents:
                 return word
         # Default fallback
+        system_log(f" Unparseable intent '{intent}', defaulting to SQL.")
         return 'SQL'
     system_log(f" Identified Intent: {intent}")
     return intent
\ No newline at end of file
@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from config import (KB_INDEX_ENABLED, KB_INDEX_DIR, KB_INDEX_CHECK_INTERVAL, KB_BM25_K1, KB_BM25_B,
+                    KB_VECTOR_CANDIDATES, KB_KEYWORD_CANDIDATES, KB_MIN_VECTOR_SCORE)
+from utils import get_connection, system_log, span
+from core.rerank import Candidate
+
+# In-process mirror of knowledge_base for ask_rag_ai. The knowledge base is small and changes
+# only at sync time, so its embeddings live in one contiguous float32 matrix (memory-mapped from
+# a snapshot file, shared by every process through the page cache) with an in-memory BM25
+# index beside it. It runs the same search as KB_HYBRID_SEARCH_SQL without a Postgres round trip.
+# Snapshots are immutable directories; CURRENT names the live one and is swapped atomically
+# after each ingest, and other processes pick up the new one on their next check.
+# Postgres stays the source of truth: when the mirror is disabled, missing or fails, callers
+# get None and fall back to the SQL search.
+
+CURRENT = "CURRENT"
+_TOKEN = re.compile(r"\w+")   # Close to the 'simple' text search config: lowercased word runs
+
+KB_SNAPSHOT_SQL = """
+    SELECT '[' || document_type || '] ' || title || ': ' || content AS context,
+           coalesce(title, '') || ' ' || content AS search_text,
+           embedding::real[]
+    FROM knowledge_base
+    ORDER BY kb_id
+"""
+
+_lock = threading.Lock()
+_snapshot = None
+_last_check = 0.0
+_stats = {"searches": 0, "fallbacks": 0, "rebuilds": 0, "reloads": 0, "search_seconds": 0.0}
+
+
+def _tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class _Snapshot:
+    """One immutable index generation: memory-mapped vectors, chunk texts and BM25 postings."""
+
+    def __init__(self, path):
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "rows.json"), encoding="utf-8") as f:
+            rows = json.load(f)
+        self.contexts = rows["contexts"]
+        self.built_at = rows["built_at"]
+        self._build_bm25(rows["search_texts"])
+
+    def _build_bm25(self, texts):
+        postings = {}
+        self.doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = _tokenize(text)
+            self.doc_lengths[doc] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc, tf))
+        self.postings = {term: (np.array([d for d, _ in docs], dtype=np.int32), np.array([tf for _, tf in docs], dtype=np.float32))
+                         for term, docs in postings.items()}
+        n = len(texts)
+        self.idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, (docs, _) in self.postings.items()}
+        self.avg_length = float(self.doc_lengths.mean()) if n else 1.0
+
+    def __len__(self):
+        return len(self.contexts)
+
+    def vector_top(self, query, k):
+        """Top-k rows by dot product (cosine: rows and query are unit vectors)."""
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return np.array([], dtype=np.int64), scores[:0]
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def keyword_top(self, terms, k):
+        """Top-k BM25 matches; like plainto_tsquery, a row must contain every query term."""
+        terms = list(dict.fromkeys(_tokenize(terms)))
+        if not terms or any(term not in self.postings for term in terms):
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        scores = np.zeros(len(self), dtype=np.float32)
+        matched = np.zeros(len(self), dtype=np.int32)
+        for term in terms:
+            docs, tfs = self.postings[term]
+            norm = KB_BM25_K1 * (1 - KB_BM25_B + KB_BM25_B * self.doc_lengths[docs] / self.avg_length)
+            scores[docs] += self.idf[term] * tfs * (KB_BM25_K1 + 1) / (tfs + norm)
+            matched[docs] += 1
+        hits = np.flatnonzero(matched == len(terms))
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return top, scores[top]
+
+
+def _current_path():
+    try:
+        with open(os.path.join(KB_INDEX_DIR, CURRENT), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(KB_INDEX_DIR, name) if name else None
+
+
+def _install(snapshot, reason):
+    global _snapshot, _last_check
+    with _lock:
+        _snapshot = snapshot
+        _last_check = time.monotonic()
+    system_log(f" KB index {reason}: {len(snapshot)} chunks from {os.path.basename(snapshot.path)}.")
+
+
+def rebuild_kb_index():
+    """
+    Builds a new snapshot from knowledge_base, switches CURRENT to it atomically and swaps it in.
+    Called after ingest_to_knowledge_base; returns the number of chunks indexed (None on failure).
+    """
+    started = time.perf_counter()
+    contexts, search_texts, vectors = [], [], []
+    try:
+        with get_connection() as conn:
+            with conn.cursor(name="kb_index_snapshot") as cur:
+                cur.itersize = 1000
+                cur.execute(KB_SNAPSHOT_SQL)
+                for context, search_text, embedding in cur:
+                    contexts.append(context)
+                    search_texts.append(search_text)
+                    vectors.append(embedding)
+    except Exception as e:
+        system_log(f" KB index rebuild failed, Postgres search stays in use: {e}", level="WARNING")
+        return None
+
+    dim = next((len(v) for v in vectors if v is not None), 384)
+    matrix = np.array([v if v is not None else np.zeros(dim) for v in vectors], dtype=np.float32).reshape(len(vectors), dim)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    # Written under a fresh name, so processes reading the previous snapshot are never disturbed
+    name = f"snapshot-{int(time.time() * 1000)}-{os.getpid()}"
+    path = os.path.join(KB_INDEX_DIR, name)
+    try:
+        os.makedirs(path)
+        np.save(os.path.join(path, "vectors.npy"), np.ascontiguousarray(matrix))
+        with open(os.path.join(path, "rows.json"), "w", encoding="utf-8") as f:
+            json.dump({"built_at": time.time(), "contexts": contexts, "search_texts": search_texts}, f, ensure_ascii=False)
+        pointer = os.path.join(KB_INDEX_DIR, f"{CURRENT}.{os.getpid()}.tmp")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(pointer, os.path.join(KB_INDEX_DIR, CURRENT))
+        snapshot = _Snapshot(path)
+    except OSError as e:
+        system_log(f" KB index snapshot could not be written to {KB_INDEX_DIR}: {e}", level="WARNING")
+        return None
+
+    _install(snapshot, f"rebuilt in {time.perf_counter() - started:.2f}s")
+    with _lock:
+        _stats["rebuilds"] += 1
+    _remove_old_snapshots(keep=name)
+    return len(contexts)
+
+
+def _remove_old_snapshots(keep):
+    # Memory maps of a deleted file stay valid on POSIX; elsewhere a busy snapshot is left for next time
+    for entry in os.listdir(KB_INDEX_DIR):
+        if entry.startswith("snapshot-") and entry != keep:
+            shutil.rmtree(os.path.join(KB_INDEX_DIR, entry), ignore_errors=True)
+
+
+def load_kb_index():
+    """Loads the current snapshot (building one from Postgres if none exists). No-op when disabled."""
+    if not KB_INDEX_ENABLED:
+        return None
+    path = _current_path()
+    if path is None:
+        return rebuild_kb_index()
+    try:
+        _install(_Snapshot(path), "loaded")
+    except Exception as e:
+        system_log(f" KB index snapshot {path} unreadable ({e}); rebuilding.", level="WARNING")
+        return rebuild_kb_index()
+    return len(_snapshot)
+
+
+def _get_snapshot():
+    """The live snapshot, reloading it when another process has switched CURRENT."""
+    global _last_check
+    snapshot = _snapshot
+    if time.monotonic() - _last_check < KB_INDEX_CHECK_INTERVAL and snapshot is not None:
+        return snapshot
+    with _lock:
+        _last_check = time.monotonic()
+    path = _current_path()
+    if path is None or (snapshot is not None and path == snapshot.path):
+        return snapshot
+    try:
+        _install(_Snapshot(path), "reloaded")
+        with _lock:
+            _stats["reloads"] += 1
+    except Exception as e:
+        system_log(f" KB index reload of {path} failed: {e}", level="WARNING")
+    return _snapshot
+
+
+def search_kb_index(question_vector, search_terms):
+    """
+    The hybrid search of KB_HYBRID_SEARCH_SQL in process: vector top-k above the similarity floor
+    plus BM25 keyword top-k, with each candidate's rank in both lists. Keyword scores are BM25,
+    not ts_rank_cd; the re-ranker only uses the ranks. Returns None to fall back to Postgres.
+    """
+    if not KB_INDEX_ENABLED:
+        return None
+    snapshot = _get_snapshot()
+    if snapshot is None or not len(snapshot):
+        return None
+
+    started = time.perf_counter()
+    try:
+        with span("kb_index_search"):
+            query = np.asarray(question_vector, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            v_rows, v_scores = snapshot.vector_top(query, KB_VECTOR_CANDIDATES)
+            keep = v_scores >= KB_MIN_VECTOR_SCORE
+            v_rows, v_scores = v_rows[keep], v_scores[keep]
+            k_rows, k_scores = snapshot.keyword_top(search_terms, KB_KEYWORD_CANDIDATES)
+
+            found = {}
+            for rank, (row, score) in enumerate(zip(v_rows.tolist(), v_scores.tolist()), start=1):
+                found[row] = [score, 0.0, rank, None]
+            for rank, (row, score) in enumerate(zip(k_rows.tolist(), k_scores.tolist()), start=1):
+                entry = found.setdefault(row, [0.0, 0.0, None, None])
+                entry[1], entry[3] = score, rank
+            candidates = [Candidate(snapshot.contexts[row], v, k, v_rank, k_rank, np.asarray(snapshot.vectors[row]))
+                          for row, (v, k, v_rank, k_rank) in found.items()]
+            candidates.sort(key=lambda c: c.v_score * 0.7 + c.k_score * 0.3, reverse=True)
+    except Exception as e:
+        with _lock:
+            _stats["fallbacks"] += 1
+        system_log(f" KB index search failed, falling back to Postgres: {e}", level="WARNING")
+        return None
+
+    with _lock:
+        _stats["searches"] += 1
+        _stats["search_seconds"] += time.perf_counter() - started
+    system_log(f" KB index returned {len(candidates)} candidates")
+    return candidates
+
+
+def get_kb_index_stats():
+    snapshot = _snapshot
+    with _lock:
+        stats = dict(_stats)
+    searches = stats.pop("search_seconds")
+    stats["avg_search_ms"] = round(searches / stats["searches"] * 1000, 3) if stats["searches"] else 0.0
+    stats["enabled"] = KB_INDEX_ENABLED
+    stats["chunks"] = len(snapshot) if snapshot is not None else 0
+    stats["snapshot"] = os.path.basename(snapshot.path) if snapshot is not None else None
+    stats["memory_mapped_mb"] = round(snapshot.vectors.nbytes / 1e6, 2) if snapshot is not None else 0
+    return stats
@@ -0,0 +1,16 @@
+from config import get_groq_client
+from utils import system_log, span, record_tokens
+
+
+def llm_chat(stage, **kwargs):
+    """
+    Non-streaming Groq chat completion for one pipeline stage.
+    Times the call as stage `llm:<stage>` and records/logs its token usage.
+    """
+    with span(f"llm:{stage}"):
+        response = get_groq_client().chat.completions.create(**kwargs)
+    usage = response.usage
+    if usage:
+        record_tokens(stage, usage)
+        system_log(f" Tokens Used {stage} - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
+    return response
@@ -0,0 +1,180 @@
+import functools
+import threading
+from collections import namedtuple
+
+import numpy as np
+from config import (get_embed_model, RERANK_ENABLED, RERANK_RRF_K, RERANK_MMR_LAMBDA, RERANK_DUPLICATE_SIMILARITY,
+                    RERANK_CROSS_ENCODER, RERANK_CROSS_ENCODER_CANDIDATES, RAG_CONTEXT_TOKEN_BUDGET,
+                    RAG_MIN_CHUNKS, RAG_MAX_CHUNKS)
+from utils import system_log, span, observe
+
+# Re-ranking for ask_rag_ai. The hybrid search returns every vector and keyword candidate with
+# its rank in each list; reciprocal rank fusion combines the two rankings (cosine similarity and
+# ts_rank_cd are on different scales, so their raw scores are never added), an optional local
+# cross-encoder re-scores the head, MMR picks a diverse set using the stored embeddings, and the
+# chunk count is cut to RAG_CONTEXT_TOKEN_BUDGET.
+
+Candidate = namedtuple("Candidate", "context v_score k_score v_rank k_rank embedding")
+
+TOKEN_BUCKETS = (100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000)
+
+_lock = threading.Lock()
+_model_lock = threading.Lock()
+_stats = {"queries": 0, "candidates": 0, "chunks_sent": 0, "context_tokens": 0,
+          "duplicates_dropped": 0, "budget_trimmed": 0, "cross_encoder_queries": 0}
+_cross_encoder = None
+_cross_encoder_failed = False
+
+
+def legacy_order(candidates, limit=RAG_MAX_CHUNKS):
+    """The former fixed blend (0.7 cosine + 0.3 ts_rank_cd), used when RERANK_ENABLED is false."""
+    return sorted(candidates, key=lambda c: c.v_score * 0.7 + c.k_score * 0.3, reverse=True)[:limit]
+
+
+def rrf_scores(candidates, k=RERANK_RRF_K):
+    """Sum of 1 / (k + rank) over the lists (vector, keyword) a candidate appears in."""
+    return np.array([sum(1.0 / (k + rank) for rank in (c.v_rank, c.k_rank) if rank) for c in candidates],
+                    dtype=np.float32)
+
+
+def _get_cross_encoder():
+    global _cross_encoder, _cross_encoder_failed
+    if not RERANK_CROSS_ENCODER or _cross_encoder_failed:
+        return None
+    with _model_lock:
+        if _cross_encoder is None and not _cross_encoder_failed:
+            try:
+                from sentence_transformers import CrossEncoder
+                _cross_encoder = CrossEncoder(RERANK_CROSS_ENCODER)
+                system_log(f" Cross-encoder {RERANK_CROSS_ENCODER} loaded for re-ranking.")
+            except Exception as e:
+                _cross_encoder_failed = True
+                system_log(f" Cross-encoder {RERANK_CROSS_ENCODER} unavailable, re-ranking without it: {e}", level="WARNING")
+        return _cross_encoder
+
+
+def cross_encoder_scores(question, candidates):
+    """Relevance of each candidate to the question from the cross-encoder, or None when disabled."""
+    model = _get_cross_encoder()
+    if model is None:
+        return None
+    scores = model.predict([(question, c.context) for c in candidates], show_progress_bar=False)
+    return np.asarray(scores, dtype=np.float32)
+
+
+def _normalize(scores):
+    low, high = float(scores.min()), float(scores.max())
+    if high - low < 1e-9:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def _unit_embeddings(candidates):
+    """Stored embeddings as unit rows; keyword-only hits without an embedding get a zero row."""
+    dim = next((len(c.embedding) for c in candidates if c.embedding is not None), 1)
+    matrix = np.array([c.embedding if c.embedding is not None else np.zeros(dim) for c in candidates], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr(relevance, embeddings, limit, lambda_=RERANK_MMR_LAMBDA, duplicate_similarity=RERANK_DUPLICATE_SIMILARITY):
+    """
+    Greedy maximal marginal relevance over candidates sorted by relevance.
+    Returns (chosen indices in pick order, number of near-duplicates dropped).
+    """
+    similarity = embeddings @ embeddings.T
+    remaining = list(range(len(relevance)))
+    chosen, dropped = [], 0
+    while remaining and len(chosen) < limit:
+        if chosen:
+            redundancy = similarity[np.ix_(remaining, chosen)].max(axis=1)
+            duplicates = redundancy >= duplicate_similarity
+            if duplicates.any():
+                dropped += int(duplicates.sum())
+                remaining = [i for i, dup in zip(remaining, duplicates) if not dup]
+                redundancy = redundancy[~duplicates]
+                if not remaining:
+                    break
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy
+        chosen.append(remaining.pop(int(np.argmax(scores))))
+    return chosen, dropped
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Approximate prompt tokens of a chunk (knowledge_base rows repeat across queries, hence the cache)."""
+    return len(get_embed_model().tokenizer.tokenize(text))
+
+
+def fit_token_budget(chunks, budget=RAG_CONTEXT_TOKEN_BUDGET, min_chunks=RAG_MIN_CHUNKS):
+    """Keeps chunks in order while they fit the budget (the first `min_chunks` always). Returns (chunks, tokens)."""
+    kept, used = [], 0
+    for chunk in chunks:
+        tokens = count_tokens(chunk.context)
+        if len(kept) >= min_chunks and used + tokens > budget:
+            break
+        kept.append(chunk)
+        used += tokens
+    return kept, used
+
+
+def rerank(question, candidates):
+    """
+    Orders the hybrid-search candidates for the RAG prompt and cuts them to the token budget.
+    Returns (chunks, context_tokens).
+    """
+    if not candidates:
+        return [], 0
+    if not RERANK_ENABLED:
+        chunks = legacy_order(candidates)
+        return chunks, sum(count_tokens(c.context) for c in chunks)
+    fan_in = len(candidates)   # Search fan-in; the cross-encoder step cuts `candidates` to its head
+
+    with span("rerank:rrf"):
+        relevance = rrf_scores(candidates)
+        order = np.argsort(-relevance, kind="stable")
+        candidates, relevance = [candidates[i] for i in order], relevance[order]
+
+    used_cross_encoder = False
+    if RERANK_CROSS_ENCODER:
+        head = candidates[:RERANK_CROSS_ENCODER_CANDIDATES]
+        with span("rerank:cross_encoder"):
+            scores = cross_encoder_scores(question, head)
+        if scores is not None:
+            order = np.argsort(-scores, kind="stable")
+            candidates, relevance = [head[i] for i in order], scores[order]
+            used_cross_encoder = True
+
+    with span("rerank:mmr"):
+        chosen, duplicates = mmr(_normalize(relevance), _unit_embeddings(candidates), RAG_MAX_CHUNKS)
+        chunks = [candidates[i] for i in chosen]
+
+    with span("rerank:budget"):
+        kept, tokens = fit_token_budget(chunks)
+
+    with _lock:
+        _stats["queries"] += 1
+        _stats["candidates"] += fan_in
+        _stats["chunks_sent"] += len(kept)
+        _stats["context_tokens"] += tokens
+        _stats["duplicates_dropped"] += duplicates
+        _stats["budget_trimmed"] += len(chunks) - len(kept)
+        _stats["cross_encoder_queries"] += used_cross_encoder
+    observe("rag_context_tokens", tokens, buckets=TOKEN_BUCKETS)
+    system_log(f" Re-ranked {fan_in} candidates -> {len(kept)} chunks, {tokens} context tokens "
+               f"({duplicates} near-duplicates dropped, {len(chunks) - len(kept)} over budget).")
+    return kept, tokens
+
+
+def get_rerank_stats():
+    with _lock:
+        stats = dict(_stats)
+    queries = stats["queries"] or 1
+    stats["avg_candidates"] = round(stats["candidates"] / queries, 1)
+    stats["avg_chunks_sent"] = round(stats["chunks_sent"] / queries, 1)
+    stats["avg_context_tokens"] = round(stats["context_tokens"] / queries, 1)
+    stats["enabled"] = RERANK_ENABLED
+    stats["cross_encoder"] = RERANK_CROSS_ENCODER or None
+    return stats
@@ -0,0 +1,97 @@
+import csv
+import io
+import itertools
+import re
+import threading
+
+from config import SQL_MAX_ROWS, SQL_FETCH_SIZE
+from utils import system_log, span
+
+# Result shaping for LLM-generated SQL: rows are pulled through a server-side cursor, capped at
+# SQL_MAX_ROWS (the outer query gets a LIMIT when it has none), and serialized for prompts as a
+# header plus CSV rows instead of the repr of a list of tuples/dicts.
+
+_TRAILING_LIMIT = re.compile(r"\b(?:limit\s+(?:\d+|all)(?:\s+offset\s+\d+)?|fetch\s+(?:first|next)\s+.+)\s*$", re.IGNORECASE)
+NO_ROWS = "(no rows)"
+
+_cursor_ids = itertools.count(1)
+_lock = threading.Lock()
+_stats = {"queries": 0, "rows": 0, "truncated": 0, "repr_bytes": 0, "compact_bytes": 0}
+
+
+class QueryResult:
+    """Rows of one bounded query plus their compact prompt text."""
+
+    def __init__(self, columns, rows, truncated):
+        self.columns = columns
+        self.rows = rows
+        self.truncated = truncated
+        self.text = format_rows(columns, rows, truncated)
+        # Baseline is what the prompt used to get: the repr of the fetched rows
+        self.repr_bytes = len(str(rows).encode("utf-8"))
+        self.compact_bytes = len(self.text.encode("utf-8"))
+
+    def metadata(self):
+        return {
+            "rows": len(self.rows),
+            "truncated": self.truncated,
+            "bytes": self.compact_bytes,
+            "bytes_saved": self.repr_bytes - self.compact_bytes,
+        }
+
+
+def limit_sql(sql, max_rows=SQL_MAX_ROWS):
+    """Caps the outer query at max_rows + 1 rows (the extra row only flags truncation)."""
+    sql = sql.strip().rstrip(";")
+    if _TRAILING_LIMIT.search(sql):
+        return sql   # The model's own LIMIT stands; the fetch below still stops at the cap
+    # On its own line so a trailing "-- comment" cannot swallow it
+    return f"{sql}\nLIMIT {max_rows + 1}"
+
+
+def format_rows(columns, rows, truncated=False):
+    if not rows:
+        return NO_ROWS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(["" if value is None else value for value in row] for row in rows)
+    text = buffer.getvalue().rstrip("\n")
+    if truncated:
+        text += f"\n(first {len(rows)} rows shown; the query matched more)"
+    return text
+
+
+def execute_bounded(conn, sql, params=None, max_rows=SQL_MAX_ROWS):
+    """
+    Runs a SELECT through a server-side (named) cursor and fetches at most max_rows rows,
+    so an unbounded query never materializes the whole table on the client.
+    """
+    cur = conn.cursor(name=f"bounded_{next(_cursor_ids)}")
+    cur.itersize = SQL_FETCH_SIZE
+    try:
+        with span("sql_execute"):
+            cur.execute(limit_sql(sql, max_rows), params)
+            rows = cur.fetchmany(max_rows + 1)
+        columns = [column[0] for column in cur.description] if cur.description else []
+    finally:
+        cur.close()
+
+    truncated = len(rows) > max_rows
+    result = QueryResult(columns, rows[:max_rows], truncated)
+    with _lock:
+        _stats["queries"] += 1
+        _stats["rows"] += len(result.rows)
+        _stats["truncated"] += int(truncated)
+        _stats["repr_bytes"] += result.repr_bytes
+        _stats["compact_bytes"] += result.compact_bytes
+    system_log(f" SQL result: {len(result.rows)} rows{' (capped)' if truncated else ''}, "
+               f"{result.compact_bytes} bytes ({result.repr_bytes - result.compact_bytes} saved vs repr).")
+    return result
+
+
+def get_result_shaping_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats["bytes_saved"] = stats["repr_bytes"] - stats["compact_bytes"]
+    return stats
@@ -1,14 +1,28 @@
-from config import embed_model, groq_client, SCHEMA_INFO, DB_CONFIG, MAX_TOKEN, FAST_MODEL, LARGE_MODEL
+from config import get_embed_model, SCHEMA_INFO, MAX_TOKEN, FAST_MODEL, LARGE_MODEL
+from config import KB_HNSW_EF_SEARCH, KB_VECTOR_CANDIDATES, KB_KEYWORD_CANDIDATES, KB_MIN_VECTOR_SCORE
+from config import BOTH_PARALLEL, BOTH_SQL_TIMEOUT, BOTH_RAG_TIMEOUT, BOTH_MAX_WORKERS
+from config import SQL_CACHE_ENABLED, SCHEMA_PRUNING_ENABLED
 from utils import get_connection
-import psycopg2
-from sentence_transformers import SentenceTransformer
 from utils import system_log
 from utils import get_chat_history
-from psycopg2.extras import RealDictCursor
-import re
+from utils import embed_query
+from core.answer_cache import semantic_cache, skip_answer_cache
+from core.streaming import AnswerStream, stream_completion
+from core.llm import llm_chat
+from utils import span, timed
+from core.sql_cache import lookup_sql, store_sql, invalidate_sql
+from core.catalog import find_products
+from core.sql_guard import execute_guarded
+from core.schema_index import schema_for_question
+from core.rerank import Candidate, rerank
+from core.kb_index import search_kb_index
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from prompts import standalone_Prompt,refine_prompt,rag_system_prompt,sql_insight_system_prompt,both_final_answer_system_prompt
 
 
+@timed("validate")
 def validate_query(question, max_tokens=MAX_TOKEN):
    
     # 1. Clean the input
@@ -17,7 +31,7 @@ def validate_query(question, max_tokens=MAX_TOKEN):
         return False, "Query rejected: The input is empty or too short to process."
 
     # 2. Tokenize and check length (Cost & Performance Guardrail)
-    tokens = embed_model.tokenizer.tokenize(clean_question)
+    tokens = get_embed_model().tokenizer.tokenize(clean_question)
     token_count = len(tokens)
     
     if token_count > max_tokens:
@@ -34,6 +48,7 @@ def validate_query(question, max_tokens=MAX_TOKEN):
     return True, None
 
 
+@timed("reformulate")
 def reformulate_question(current_question, session_id):
     """Hybrid Reformulator: Uses Keyword Detection + Semantic Context Injection."""
     history = get_chat_history(session_id, window_size=6)
@@ -53,7 +68,7 @@ def reformulate_question(current_question, session_id):
     
     recent_context = "\n".join([f"{m['role']}: {m['content']}" for m in history])
     try:
-        response = groq_client.chat.completions.create(
+        response = llm_chat("reformulate_question",
             model=LARGE_MODEL,
             messages=[ 
     {
@@ -72,16 +87,6 @@ def reformulate_question(current_question, session_id):
         ],
             temperature=0
         )
-        usage = response.usage
-        token_metadata = {
-            "prompt_tokens": usage.prompt_tokens,
-            "completion_tokens": usage.completion_tokens,
-            "total_tokens": usage.total_tokens
-        }
-
-        # 3. Log it for your System Audit
-        system_log(f" Tokens Used reformulate_question - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
-        
         refined_query = response.choices[0].message.content.strip()
         
         # Validation: Check if output is valid
@@ -113,324 +118,393 @@ def reformulate_question(current_question, session_id):
 
 
 
+def _as_answer(text, stream):
+    """Fixed answers (fallbacks, errors) in whichever form the caller asked for."""
+    return AnswerStream.from_text(text) if stream else text
+
+
+# Branch outcomes ask_both_ai cannot build on: the answer goes out without that branch and is not cached
+BRANCH_UNAVAILABLE = "Unavailable (the lookup failed or timed out)"
+RAG_NOT_FOUND = "I couldn't find relevant information..."
+RETRIEVAL_ERROR = " Retrieval Error"
+
+
 # --- 4. RAG SEARCH (Vector Search) ---
-def ask_rag_ai(question):
-    system_log(" Generating embedding for RAG search...")
-   
-    filler_words = ['give', 'me', 'show', 'tell', 'what', 'is', 'the', 'of', 'specs', 'spec']
-    search_terms = ' '.join([w for w in question.lower().split() if w not in filler_words])
-    
-    question_vector = embed_model.encode(question).tolist()
-    
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    search_query = """
+# Both CTEs are shaped for their indexes: the vector side is ORDER BY distance + LIMIT (HNSW),
+# the keyword side matches the stored search_tsv column (GIN). The similarity floor is applied
+# to the ANN candidates afterwards, because a threshold in the WHERE clause forces a full scan.
+# Every candidate comes back with its rank in each list and its stored embedding; core.rerank
+# picks the chunks that go into the prompt.
+KB_HYBRID_SEARCH_SQL = """
     WITH vector_matches AS (
         SELECT 
             kb_id, 
-            1 - (embedding <=> %s::vector) AS v_score
+            1 - (embedding <=> %(vector)s::vector) AS v_score
         FROM knowledge_base
-        WHERE embedding IS NOT NULL 
-          AND (1 - (embedding <=> %s::vector)) >= 0.5  -- Only consider high-similarity vectors
-        ORDER BY v_score DESC
-        LIMIT 20
+        WHERE embedding IS NOT NULL
+        ORDER BY embedding <=> %(vector)s::vector
+        LIMIT %(vector_limit)s
     ),
     keyword_matches AS (
         SELECT 
             kb_id, 
-            ts_rank_cd(to_tsvector('simple', title || ' ' || content), 
-                      plainto_tsquery('simple', %s)) AS k_score
-        FROM knowledge_base
-        WHERE to_tsvector('simple', title || ' ' || content) @@ plainto_tsquery('simple', %s)
-        LIMIT 20
+            ts_rank_cd(search_tsv, query) AS k_score
+        FROM knowledge_base, plainto_tsquery('simple', %(terms)s) AS query
+        WHERE search_tsv @@ query
+        ORDER BY k_score DESC
+        LIMIT %(keyword_limit)s
+    ),
+    candidates AS (
+        SELECT 
+            COALESCE(v.kb_id, k.kb_id) AS kb_id,
+            COALESCE(v.v_score, 0) AS v_score,
+            COALESCE(k.k_score, 0) AS k_score,
+            v.v_rank,
+            k.k_rank
+        FROM (SELECT kb_id, v_score, ROW_NUMBER() OVER (ORDER BY v_score DESC) AS v_rank
+              FROM vector_matches WHERE v_score >= %(min_vector_score)s) v
+        FULL OUTER JOIN (SELECT kb_id, k_score, ROW_NUMBER() OVER (ORDER BY k_score DESC) AS k_rank
+                         FROM keyword_matches) k ON v.kb_id = k.kb_id
     )
     SELECT 
-        '[' || document_type || '] ' || title || ': ' || content AS context,
-        COALESCE(v.v_score, 0) AS vector_score,
-        COALESCE(k.k_score, 0) AS keyword_score
-    FROM knowledge_base kb
-    LEFT JOIN vector_matches v ON kb.kb_id = v.kb_id
-    LEFT JOIN keyword_matches k ON kb.kb_id = k.kb_id
-    WHERE v.v_score >= 0.5 OR k.k_score > 0  -- Ensure we only take high-quality hits
-    ORDER BY (COALESCE(v.v_score, 0) * 0.7 + COALESCE(k.k_score, 0) * 0.3) DESC
-    LIMIT 6;
-    """
+        '[' || kb.document_type || '] ' || kb.title || ': ' || kb.content AS context,
+        c.v_score AS vector_score,
+        c.k_score AS keyword_score,
+        c.v_rank,
+        c.k_rank,
+        kb.embedding::real[] AS embedding
+    FROM candidates c
+    JOIN knowledge_base kb ON kb.kb_id = c.kb_id
+    WHERE c.v_score >= %(min_vector_score)s OR c.k_score > 0  -- Ensure we only take high-quality hits
+    ORDER BY (c.v_score * 0.7 + c.k_score * 0.3) DESC;
+"""
+
+
+def _search_knowledge_base(question_vector, search_terms):
+    """Hybrid search in Postgres; returns the rerank candidates."""
+    # Hold the pooled connection only for the search, not for the LLM call
+    with span("kb_search"), get_connection() as conn:
+        with conn.cursor() as cur:
+            # ef_search must cover the vector LIMIT or the HNSW scan returns fewer candidates
+            cur.execute(f"SET LOCAL hnsw.ef_search = {max(KB_HNSW_EF_SEARCH, KB_VECTOR_CANDIDATES)};")
+            cur.execute(KB_HYBRID_SEARCH_SQL, {
+                "vector": question_vector,
+                "terms": search_terms,
+                "vector_limit": KB_VECTOR_CANDIDATES,
+                "keyword_limit": KB_KEYWORD_CANDIDATES,
+                "min_vector_score": KB_MIN_VECTOR_SCORE,
+            })
+            results = cur.fetchall()
+    system_log(f" Database returned {len(results)} candidates")
+    return [Candidate(*row) for row in results]
+
+
+@semantic_cache("RAG")
+def ask_rag_ai(question, stream=False):
+    system_log(" Generating embedding for RAG search...")
+   
+    filler_words = ['give', 'me', 'show', 'tell', 'what', 'is', 'the', 'of', 'specs', 'spec']
+    search_terms = ' '.join([w for w in question.lower().split() if w not in filler_words])
     
-    try:
-        cur.execute(search_query, (question_vector, question_vector, search_terms, search_terms))
-        results = cur.fetchall()
-        system_log(f" Database returned {len(results)} results")
+    question_vector = embed_query(question).tolist()
     
-        if not results:
+    try:
+        # The in-process mirror answers when enabled and loaded; Postgres is the source of truth and fallback
+        candidates = search_kb_index(question_vector, search_terms)
+        if candidates is None:
+            candidates = _search_knowledge_base(question_vector, search_terms)
+
+        if not candidates:
             system_log(" NO RESULTS from vector+keyword search!")
-            cur.execute("""
-                SELECT '[' || document_type || '] ' || title || E'\n' || content AS context, 0 AS v, 0 AS k
-                FROM knowledge_base
-                WHERE to_tsvector('simple', title || ' ' || content) @@ plainto_tsquery('simple', %s)
-                LIMIT 4;
-            """, (search_terms,))
             system_log(f"   Search terms: '{search_terms}'")
-            system_log(f"   Enhanced query: '{question_vector[:50]}'")
-            return "I couldn't find relevant information..."
+            return _as_answer(RAG_NOT_FOUND, stream)
 
-        
-        for r in results:
-            system_log(f" Match: {r[0][:30]}... | Vector: {r[1]:.2f} | Keyword: {r[2]:.2f}")
+        chunks, _ = rerank(question, candidates)
+        for c in chunks:
+            system_log(f" Match: {c.context[:30]}... | Vector: {c.v_score:.2f} | Keyword: {c.k_score:.2f}")
 
-        context = "\n\n".join([r[0] for r in results])
-        system_log(f"context {context}")
-        response = groq_client.chat.completions.create(
+        context = "\n\n".join(c.context for c in chunks)
+        system_log(f"context {context}", level="DEBUG")
+        messages = [
+            {
+                "role": "system", 
+                "content": rag_system_prompt.format(context=context)
+            },
+            {"role": "user", "content": f"User is asking about: {question}. Provide only relevant details dont halusinate answers  if not in context say i dont have information."}
+        ]
+        if stream:
+            return stream_completion("ask_rag_ai", model=LARGE_MODEL, messages=messages)
+
+        response = llm_chat("ask_rag_ai",
             model=LARGE_MODEL,
-            messages=[
-                {
-                    "role": "system", 
-                    "content": rag_system_prompt.format(context=context)
-                },
-                {"role": "user", "content": f"User is asking about: {question}. Provide only relevant details dont halusinate answers  if not in context say i dont have information."}
-            ]
+            messages=messages
         )
-
-        usage = response.usage
-        token_metadata = {
-            "prompt_tokens": usage.prompt_tokens,
-            "completion_tokens": usage.completion_tokens,
-            "total_tokens": usage.total_tokens
-        }
-
-        system_log(f" Tokens Used ask_rag_ai - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
         system_log(f"Model dimension: {len(question_vector)}")
         return response.choices[0].message.content
 
     except Exception as e:
-        return f" Retrieval Error: {e}"
-    finally:
-        cur.close()
-        conn.close()
+        return _as_answer(f"{RETRIEVAL_ERROR}: {e}", stream)
 
 # --- 5. SQL INSIGHTS (Text-to-SQL) ---
-def ask_sql_ai(question):
-    system_log(" Generating SQL query...")
-    
-    attempt = 0
-    max_attempts = 3
-    error_feedback = ""
+SQL_MAX_ATTEMPTS = 3
+
+# Extra rule for get_raw_ai: the BOTH route needs the people behind an order, not just its status
+RAW_SQL_RULES = """
+                5. if ask delay reson retrieve staff name, curier name and order status from db and give answer
+                    User: "Why is order 118 delayed?"
+                """
 
-    conn = get_connection()
-    cur = conn.cursor()
 
+def _product_hint(question):
+    """
+    Catalog matches for the products in the question, so the SQL can bind product_id (PK lookup)
+    instead of ILIKE. Returns (prompt_text, product_ids).
+    """
     try:
-        while attempt < max_attempts:
-            attempt += 1
-
-            sql_prompt = f"""
-            System: You are a Read-Only PostgreSQL generator. 
-            Task: Generate a SELECT query to answer: {question}
-            SCHEMA: {SCHEMA_INFO}
-            {f"PREVIOUS ERROR: {error_feedback}. Please fix this SQL." if error_feedback else ""}
-            
-            STRICT RULES:
-            1. Respond with ONLY the raw SQL string.
-            2. Use ILIKE with %.
-            3. Double quote the "order" table.
-            4.Date format in 'YYYY-MM-DD' and use single quotes for dates and strings.
-                EXAMPLES:
-                User: "Show me all orders from January 3rd 2026"
-                SQL: SELECT * FROM "order" WHERE order_date::date = '2026-01-03'; """
+        matches = find_products(question)
+    except Exception as e:
+        system_log(f" Product catalog lookup failed: {e}")
+        return "", ()
+    if not matches:
+        return "", ()
+    listed = ", ".join(f"'{name}' = product_id {product_id}" for product_id, name, _ in matches)
+    return f"""
+                CATALOG MATCHES (fuzzy, may include near-misses): {listed}
+                If the question clearly refers to one of these products, filter on product_id instead of name ILIKE.""", [product_id for product_id, _, _ in matches]
+
+
+def build_sql_prompt(question, schema=SCHEMA_INFO, extra_rules="", error_feedback="", failed_sql="", product_hint=""):
+    sql_prompt = f"""
+                System: You are a Read-Only PostgreSQL generator. 
+                Task: Generate a SELECT query to answer: {question}
+                SCHEMA: {schema}{product_hint}
+                {f"PREVIOUS ERROR: {error_feedback}. Please fix this SQL." if error_feedback else ""}
             
-            if error_feedback:
-                sql_prompt += f"""
-                 PREVIOUS ATTEMPT FAILED:
-                - FAILED SQL: {generated_sql}
-                - ERROR RECEIVED: {error_feedback}
-                INSTRUCTIONS: Analyze the error and generate a different, corrected SQL query. 
-                Check your JOIN logic and table names carefully.
-                """
+                STRICT RULES:
+                1. Respond with ONLY the raw SQL string.
+                2. Use ILIKE with %.
+                3. Double quote the "order" table.
+                4.Date format in 'YYYY-MM-DD' and use single quotes for dates and strings.
+                    EXAMPLES:
+                    User: "Show me all orders from January 3rd 2026"
+                    SQL: SELECT * FROM "order" WHERE order_date::date = '2026-01-03'; {extra_rules}"""
+
+    if error_feedback:
+        sql_prompt += f"""
+                     PREVIOUS ATTEMPT FAILED:
+                    - FAILED SQL: {failed_sql}
+                    - ERROR RECEIVED: {error_feedback}
+                    INSTRUCTIONS: Analyze the error and generate a different, corrected SQL query. 
+                    Check your JOIN logic and table names carefully.
+                    """
+
+    return sql_prompt
+
+
+def _schema_for(question):
+    """Pruned schema (top-k tables + join keys) for the prompt; the full SCHEMA_INFO if pruning is off or fails."""
+    if not SCHEMA_PRUNING_ENABLED:
+        return SCHEMA_INFO
+    try:
+        schema, tables = schema_for_question(question)
+        system_log(f" Schema pruned to {len(tables)} tables: {', '.join(tables)}")
+        return schema
+    except Exception as e:
+        system_log(f" Schema pruning failed, using full schema: {e}")
+        return SCHEMA_INFO
 
-            sql_response = groq_client.chat.completions.create(
-                model=LARGE_MODEL,
-                messages=[{"role": "user", "content": sql_prompt}]
-            )
-            usage = sql_response.usage
-            token_metadata = {
-                "prompt_tokens": usage.prompt_tokens,
-                "completion_tokens": usage.completion_tokens,
-                "total_tokens": usage.total_tokens
-            }
 
-            system_log(f" Tokens Used sql_response - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
-            system_log(f" SQL Generation Attempt {attempt}: {sql_response.choices[0].message.content.strip()}")
-            generated_sql = sql_response.choices[0].message.content.strip()
-            generated_sql = (generated_sql
-                .replace("```sql", "")
-                .replace("```", "")
-                .replace(";--", "")  
-                .strip()
-                .split(';')[0])
-
-            try:
-                cur.execute(generated_sql)
-                db_results = cur.fetchall()
-                system_log(f" generated SQL executed successfully: {generated_sql}")
-                system_log(f" db_results: {db_results}")
-
-                final_answer = groq_client.chat.completions.create(
-                    model=LARGE_MODEL,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": sql_insight_system_prompt},
-                        {"role": "user", "content": f"User asked: {question}\nDB results: {db_results}. ."}
-                    ]
-                )
-                usage = final_answer.usage
-                token_metadata = {
-                    "prompt_tokens": usage.prompt_tokens,
-                    "completion_tokens": usage.completion_tokens,
-                    "total_tokens": usage.total_tokens
-                }
-
-           
-                system_log(f" Tokens Used sql final_answer - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
-
-                return final_answer.choices[0].message.content
-
-            except Exception as e:
-                error_feedback = str(e)
-                system_log(f" Attempt {attempt} failed: {error_feedback}")
-
-        return "I couldn't process that . Try Again or Please rephrase your question or contact support."
-
-    finally:
-        cur.close()
-        conn.close()
+def generate_sql(sql_prompt, attempt):
+    sql_response = llm_chat("sql_response",
+        model=LARGE_MODEL,
+        messages=[{"role": "user", "content": sql_prompt}]
+    )
+    system_log(f" SQL Generation Attempt {attempt}: {sql_response.choices[0].message.content.strip()}")
+    generated_sql = sql_response.choices[0].message.content.strip()
+    return (generated_sql
+        .replace("```sql", "")
+        .replace("```", "")
+        .replace(";--", "")  
+        .strip()
+        .split(';')[0])
+
+
+def _execute_sql(sql, params=None):
+    """Runs one guarded query on a pooled connection held only for that query (not for LLM calls)."""
+    with get_connection() as conn:
+        try:
+            result = execute_guarded(conn, sql, params)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def run_text_to_sql(question, variant="SQL", extra_rules=""):
+    """
+    Answers `question` from Postgres and returns a QueryResult (None if every attempt failed).
+    A cached template for the same question shape is tried first; otherwise the LLM writes SQL,
+    with errors fed back for up to SQL_MAX_ATTEMPTS attempts, and the working SQL is cached.
+    """
+    # 1. Plan cache: same question shape, new literals, no LLM call
+    cached = lookup_sql(variant, question) if SQL_CACHE_ENABLED else None
+    if cached:
+        template, params = cached
+        try:
+            result = _execute_sql(template, params or None)
+            system_log(f" SQL template cache hit: {template} {params}")
+            system_log(f" db_results: {result.text}", level="DEBUG")
+            return result
+        except Exception as e:
+            invalidate_sql(variant, question)
+            system_log(f" Cached SQL template failed, regenerating: {e}")
+
+    # 2. Generate -> execute -> feed the error back on failure
+    # The catalog lookup takes its own pooled connection, so it runs before any query connection is held
+    error_feedback = ""
+    generated_sql = ""
+    product_hint, hinted_ids = _product_hint(question)
+    schema = _schema_for(question)
+    for attempt in range(1, SQL_MAX_ATTEMPTS + 1):
+        if "does not exist" in error_feedback:
+            schema = SCHEMA_INFO   # The pruned schema may have left out the table/column the query needs
+        sql_prompt = build_sql_prompt(question, schema, extra_rules, error_feedback, generated_sql, product_hint)
+        generated_sql = generate_sql(sql_prompt, attempt)
+        try:
+            result = _execute_sql(generated_sql)
+            system_log(f" generated SQL executed successfully: {generated_sql}")
+            system_log(f" db_results: {result.text}", level="DEBUG")
+            if SQL_CACHE_ENABLED:
+                # A question number equal to a hinted product_id ("iPhone 15" -> id 15) must not become a parameter
+                store_sql(variant, question, generated_sql, reserved=hinted_ids)
+            return result
+
+        except Exception as e:
+            error_feedback = str(e)
+            system_log(f" Attempt {attempt} failed: {error_feedback}")
+
+    return None
+
+
+@semantic_cache("SQL")
+def ask_sql_ai(question, stream=False):
+    system_log(" Generating SQL query...")
+    fallback = "I couldn't process that . Try Again or Please rephrase your question or contact support."
+
+    result = run_text_to_sql(question, "SQL")
+    if result is None:
+        return _as_answer(fallback, stream)
+
+    messages = [
+        {
+            "role": "system",
+            "content": sql_insight_system_prompt},
+        {"role": "user", "content": f"User asked: {question}\nDB results:\n{result.text}"}
+    ]
+    try:
+        if stream:
+            return stream_completion("sql final_answer", model=LARGE_MODEL, messages=messages)
+
+        final_answer = llm_chat("sql final_answer",
+            model=LARGE_MODEL,
+            messages=messages
+        )
+        return final_answer.choices[0].message.content
+
+    except Exception as e:
+        system_log(f" SQL final answer failed: {e}")
+        return _as_answer(fallback, stream)
 
 def get_raw_ai(question):
     system_log(" Generating Raw query...")
-    
-    attempt = 0
-    max_attempts = 3
-    error_feedback = ""
 
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    result = run_text_to_sql(question, "RAW", RAW_SQL_RULES)
+    if result is None:
+        return BRANCH_UNAVAILABLE
+    return result.text
 
-    try:
-        while attempt < max_attempts:
-            attempt += 1
-
-            sql_prompt = f"""
-            System: You are a Read-Only PostgreSQL generator. 
-            Task: Generate a SELECT query to answer: {question}
-            SCHEMA: {SCHEMA_INFO}
-            {f"PREVIOUS ERROR: {error_feedback}. Please fix this SQL." if error_feedback else ""}
-            
-            STRICT RULES:
-            1. Respond with ONLY the raw SQL string.
-            2. Use ILIKE with %.
-            3. Double quote the "order" table.
-            4.Date format in 'YYYY-MM-DD' and use single quotes for dates and strings.
-                EXAMPLES:
-                User: "Show me all orders from January 3rd 2026"
-                SQL: SELECT * FROM "order" WHERE order_date::date = '2026-01-03';
-
-            5. if ask delay reson retrieve staff name, curier name and order status from db and give answer
-                User: "Why is order 118 delayed?"
-            """
-            if error_feedback:
-                sql_prompt += f"""
-                 PREVIOUS ATTEMPT FAILED:
-                - FAILED SQL: {generated_sql}
-                - ERROR RECEIVED: {error_feedback}
-                INSTRUCTIONS: Analyze the error and generate a different, corrected SQL query. 
-                Check your JOIN logic and table names carefully.
-                """
 
-            sql_response = groq_client.chat.completions.create(
-                model=LARGE_MODEL,
-                messages=[{"role": "user", "content": sql_prompt}]
-            )
-            usage = sql_response.usage
-            token_metadata = {
-                "prompt_tokens": usage.prompt_tokens,
-                "completion_tokens": usage.completion_tokens,
-                "total_tokens": usage.total_tokens
-            }
+# Shared by every BOTH request; both branches are I/O bound (Groq + Postgres), so threads suffice
+_both_executor = ThreadPoolExecutor(max_workers=BOTH_MAX_WORKERS, thread_name_prefix="both-branch")
 
-            system_log(f" Tokens Used sql_response - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
-            system_log(f" SQL Generation Attempt {attempt}: {sql_response.choices[0].message.content.strip()}")
-            generated_sql = sql_response.choices[0].message.content.strip()
-            generated_sql = (generated_sql
-                .replace("```sql", "")
-                .replace("```", "")
-                .replace(";--", "")  
-                .strip()
-                .split(';')[0])
-
-            try:
-                cur.execute(generated_sql)
-                db_results = cur.fetchall()
-                system_log(f" generated SQL executed successfully: {generated_sql}")
-                system_log(f" db_results: {db_results}")
-                conn.commit()
-                return db_results
-
-            except Exception as e:
-                conn.rollback()
-                error_feedback = str(e)
-                system_log(f" Attempt {attempt} failed: {error_feedback}")
-
-        return "I couldn't process that database request."
-
-    finally:
-        cur.close()
-        conn.close()
-
-
-def ask_both_ai(question):
-    system_log(" Processing BOTH SQL and RAG...")
-    db_results = get_raw_ai(question) 
-    refine_response = groq_client.chat.completions.create(
+def _refine_and_retrieve(question, db_results="Not available yet"):
+    """RAG branch of BOTH: rewrite the question as a knowledge-base query, then answer it."""
+    refine_response = llm_chat("refine",
         model=FAST_MODEL,
-        messages=[{"role": "user", "content": refine_prompt}],
+        messages=[{"role": "user", "content": refine_prompt.format(question=question, db_results=db_results)}],
         temperature=0
     )
     optimized_query = refine_response.choices[0].message.content.strip()
     system_log(f" Optimized RAG Query: {optimized_query}")
-
     kb_context = ask_rag_ai(optimized_query)
+    if kb_context == RAG_NOT_FOUND or kb_context.startswith(RETRIEVAL_ERROR):
+        system_log(" BOTH RAG branch found no usable context, answering without it.")
+        return BRANCH_UNAVAILABLE
+    return kb_context
+
+
+def _branch_result(future, label, deadline):
+    """Waits for one BOTH branch until `deadline`; failures degrade to a partial answer."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FuturesTimeoutError:
+        # The thread keeps running in the background; its result is simply not waited for
+        system_log(f" BOTH {label} branch timed out, answering without it.")
+    except Exception as e:
+        system_log(f" BOTH {label} branch failed: {e}, answering without it.")
+    return BRANCH_UNAVAILABLE
+
+
+@semantic_cache("BOTH")
+def ask_both_ai(question, stream=False):
+    system_log(" Processing BOTH SQL and RAG...")
+    if BOTH_PARALLEL:
+        # The SQL and refine+RAG branches are independent: latency ~ max(branch) instead of the sum
+        start = time.monotonic()
+        # Each branch runs in a copy of this context so its spans land on the request trace
+        sql_future = _both_executor.submit(contextvars.copy_context().run, get_raw_ai, question)
+        rag_future = _both_executor.submit(contextvars.copy_context().run, _refine_and_retrieve, question)
+        db_results = _branch_result(sql_future, "SQL", start + BOTH_SQL_TIMEOUT)
+        kb_context = _branch_result(rag_future, "RAG", start + BOTH_RAG_TIMEOUT)
+        system_log(f" BOTH branches finished in {time.monotonic() - start:.2f}s")
+    else:
+        db_results = get_raw_ai(question)
+        kb_context = _refine_and_retrieve(question, db_results)
+
+    if db_results == BRANCH_UNAVAILABLE and kb_context == BRANCH_UNAVAILABLE:
+        return _as_answer("I'm unable to access that right now. Please try again in a moment.", stream)
+    if BRANCH_UNAVAILABLE in (db_results, kb_context):
+        # A partial answer is fine once, but must not be replayed to similar questions for the TTL
+        skip_answer_cache()
    
     system_log(f" RAG Context Retrieved: {kb_context[:200]}...")  
     
-    final_response = groq_client.chat.completions.create(
-    model=LARGE_MODEL,
-    messages=[
+    messages = [
         {
             "role": "system",
             "content": both_final_answer_system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""Question: {question}
+        },
+        {
+            "role": "user",
+            "content": f"""Question: {question}
 
             Data: {db_results}
 
             Context: {kb_context}
 
             Answer:"""
-                }
-        ],
+        }
+    ]
+    if stream:
+        return stream_completion("both answer", model=LARGE_MODEL, messages=messages, temperature=0.1, max_tokens=500)
+
+    final_response = llm_chat("both answer",
+        model=LARGE_MODEL,
+        messages=messages,
         temperature=0.1,  
         max_tokens=500
     )
-    usage = final_response.usage
-    token_metadata = {
-        "prompt_tokens": usage.prompt_tokens,
-        "completion_tokens": usage.completion_tokens,
-        "total_tokens": usage.total_tokens
-    }
-
-    system_log(f" Tokens Used both answer - Prompt: {usage.prompt_tokens} | Completion: {usage.completion_tokens} | Total: {usage.total_tokens}")
     
     return final_response.choices[0].message.content
 
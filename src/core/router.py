@@ -0,0 +1,64 @@
+import re
+import threading
+
+import numpy as np
+from config import get_embed_model, ROUTER_MIN_SIMILARITY, ROUTER_MIN_MARGIN
+from utils import system_log, embed_query
+from prompts import routing_examples
+
+# Nearest-centroid intent router: each route's labeled examples are embedded once and averaged
+# into a unit centroid; a question goes to the most similar centroid. Confidence is the best
+# similarity plus its margin over the runner-up; callers escalate to the LLM when it is low.
+
+ROUTES = ("SQL", "RAG", "BOTH")
+
+# Hard cue from the routing prompt ("Contains why ... -> BOTH"). 'reason'/'explain' are left to the
+# centroids: "price change reason for X" is a plain SQL lookup.
+_BOTH_CUES = re.compile(r"\bwhy\b", re.IGNORECASE)
+
+_lock = threading.Lock()
+_centroids = None   # (len(ROUTES), dim) float32 matrix
+
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def train_router(examples=None):
+    """(Re)builds the route centroids from labeled examples ({route: [questions]})."""
+    global _centroids
+    examples = examples or routing_examples
+    rows = []
+    for route in ROUTES:
+        vectors = get_embed_model().encode(examples[route], show_progress_bar=False)
+        rows.append(_unit_rows(np.asarray(vectors, dtype=np.float32)).mean(axis=0))
+    centroids = _unit_rows(np.stack(rows))
+    with _lock:
+        _centroids = centroids
+    system_log(f" Intent router trained on {sum(len(examples[r]) for r in ROUTES)} examples.")
+    return centroids
+
+
+def _get_centroids():
+    centroids = _centroids
+    return centroids if centroids is not None else train_router()
+
+
+def route_locally(question):
+    """
+    Classifies a question as SQL/RAG/BOTH without a network call.
+    Returns (route, confident, scores) where scores maps route -> cosine similarity.
+    """
+    if _BOTH_CUES.search(question):
+        return "BOTH", True, {}
+
+    vector = np.asarray(embed_query(question), dtype=np.float32)
+    vector = vector / (np.linalg.norm(vector) or 1.0)
+    sims = _get_centroids() @ vector
+
+    order = np.argsort(-sims)
+    best, runner_up = sims[order[0]], sims[order[1]]
+    confident = best >= ROUTER_MIN_SIMILARITY and (best - runner_up) >= ROUTER_MIN_MARGIN
+    scores = {route: round(float(sim), 4) for route, sim in zip(ROUTES, sims)}
+    return ROUTES[order[0]], bool(confident), scores
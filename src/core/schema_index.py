@@ -0,0 +1,114 @@
+import re
+import threading
+from collections import deque
+
+import numpy as np
+from config import get_embed_model, SCHEMA_TABLES, SCHEMA_JOINS, SCHEMA_RULES, SCHEMA_TOP_K
+from utils import system_log, embed_query
+
+# Schema pruning for text-to-SQL prompts: each table's description is embedded once, a question
+# gets only its top-k tables (plus tables named outright), and the join graph from SCHEMA_JOINS
+# adds whatever tables are needed to connect them, together with their join keys.
+
+TABLE_NAMES = list(SCHEMA_TABLES)
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Tables that are almost never useful alone: stock/line items/price history are filtered by
+# product name, and the rules require order_status for readable order states.
+_COMPANIONS = {
+    "stock": ["product"],
+    "order_item": ["product"],
+    "price_change_log": ["product"],
+    '"order"': ["order_status"],
+}
+
+_lock = threading.Lock()
+_table_vectors = None   # (len(TABLE_NAMES), dim), unit rows
+
+
+def _bare(table):
+    return table.strip('"')
+
+
+def _build_join_graph():
+    graph = {table: {} for table in TABLE_NAMES}
+    for left, right in SCHEMA_JOINS:
+        left_table, right_table = left.rsplit(".", 1)[0], right.rsplit(".", 1)[0]
+        graph[left_table][right_table] = f"{left} = {right}"
+        graph[right_table][left_table] = f"{left} = {right}"
+    return graph
+
+
+_JOIN_GRAPH = _build_join_graph()
+
+
+def _get_table_vectors():
+    global _table_vectors
+    with _lock:
+        if _table_vectors is None:
+            texts = [f"{_bare(t)}: {SCHEMA_TABLES[t][1]}. Columns: {SCHEMA_TABLES[t][0]}" for t in TABLE_NAMES]
+            vectors = np.asarray(get_embed_model().encode(texts, show_progress_bar=False), dtype=np.float32)
+            _table_vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            system_log(f" Schema index built for {len(TABLE_NAMES)} tables.")
+        return _table_vectors
+
+
+def load_schema_index():
+    """Embeds the table descriptions now rather than on the first SQL question. Returns the table count."""
+    return len(_get_table_vectors())
+
+
+def _mentioned(question):
+    """Tables whose name words all appear in the question ("status of order 5" -> order_status)."""
+    words = set(_WORD.findall(question.lower()))
+    words |= {word[:-1] for word in words if word.endswith("s")}
+    return [table for table in TABLE_NAMES if set(_bare(table).split("_")) <= words]
+
+
+def _connect(tables):
+    """Adds the tables on the shortest join path from the first table to every other one."""
+    connected = list(tables[:1])
+    for target in tables[1:]:
+        if target in connected:
+            continue
+        previous = {table: None for table in connected}
+        queue = deque(connected)
+        while queue and target not in previous:
+            table = queue.popleft()
+            for neighbor in _JOIN_GRAPH[table]:
+                if neighbor not in previous:
+                    previous[neighbor] = table
+                    queue.append(neighbor)
+        node = target
+        while node is not None and node not in connected:
+            connected.append(node)
+            node = previous.get(node)
+    return connected
+
+
+def select_tables(question, k=SCHEMA_TOP_K):
+    """Tables needed for `question`: named ones, the top-k by similarity, companions, join path."""
+    vector = np.asarray(embed_query(question), dtype=np.float32)
+    vector = vector / (np.linalg.norm(vector) or 1.0)
+    sims = _get_table_vectors() @ vector
+    ranked = [TABLE_NAMES[i] for i in np.argsort(-sims)[:k]]
+
+    selected = list(dict.fromkeys(_mentioned(question) + ranked))
+    for table in list(selected):
+        selected.extend(c for c in _COMPANIONS.get(table, []) if c not in selected)
+    return _connect(selected)
+
+
+def build_schema_prompt(tables):
+    """SCHEMA_INFO-style text for just these tables, with the join keys between them."""
+    listed = ", ".join(f"{table}({SCHEMA_TABLES[table][0]})" for table in tables)
+    joins = [f"{left} = {right}" for left, right in SCHEMA_JOINS
+             if left.rsplit(".", 1)[0] in tables and right.rsplit(".", 1)[0] in tables]
+    join_line = f"\nJoin keys: {', '.join(joins)}" if joins else ""
+    return f"\nTables: {listed}{join_line}\n\n{SCHEMA_RULES}\n"
+
+
+def schema_for_question(question, k=SCHEMA_TOP_K):
+    """Returns (schema_text, tables) for the SQL prompt."""
+    tables = select_tables(question, k)
+    return build_schema_prompt(tables), tables
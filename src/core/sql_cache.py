@@ -0,0 +1,161 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from config import SQL_CACHE_SIZE, SQL_CACHE_TTL
+from utils import system_log, record_cache
+
+# Text-to-SQL plan cache. A question is reduced to a pattern by pulling out its literals
+# (dates, quoted strings, numbers): "status of order 118" -> "status of order <num>".
+# SQL that ran successfully is stored as a template with those literals turned into bound
+# parameters, so "status of order 121" reuses it without an LLM call.
+#
+# A template is only stored when every literal maps cleanly onto the SQL: numbers onto bare
+# numeric tokens, dates/strings onto whole string literals. Literals buried inside other text
+# (e.g. 15 in ILIKE '%iPhone 15%') cannot be re-bound safely, so such SQL is not templated.
+# Neither is SQL where a literal matches several tokens or a LIMIT/OFFSET count: for "orders with
+# quantity 1", "... quantity = 1 LIMIT 1" would otherwise bind the row limit to the quantity too.
+
+_QUESTION_LITERAL = re.compile(
+    r"(?P<date>\b\d{4}-\d{2}-\d{2}\b)"
+    r"|'(?P<squote>[^']+)'|\"(?P<dquote>[^\"]+)\""
+    r"|(?P<num>\b\d+(?:\.\d+)?\b)"
+)
+_SQL_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\b\d+(?:\.\d+)?\b|%")
+_WHITESPACE = re.compile(r"\s+")
+_ROW_COUNT = re.compile(r"\b(?:LIMIT|OFFSET|FETCH\s+(?:FIRST|NEXT))\s*$", re.IGNORECASE)
+
+_lock = threading.Lock()
+_templates: "OrderedDict[tuple, dict]" = OrderedDict()
+_stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "rejected": 0,
+          "evictions": 0, "expired": 0, "failures": 0}
+
+
+def extract_pattern(question):
+    """Returns (pattern, literals) where literals are (kind, value) in question order."""
+    literals = []
+
+    def _replace(match):
+        kind = match.lastgroup
+        value = match.group(kind)
+        kind = "str" if kind in ("squote", "dquote") else kind
+        literals.append((kind, value))
+        return f"<{kind}>"
+
+    # Literals keep their case ('iPhone' must bind as written); the rest of the pattern does not
+    pattern = _QUESTION_LITERAL.sub(_replace, question.strip())
+    pattern = _WHITESPACE.sub(" ", pattern.lower()).rstrip("?!. ")
+    return pattern, literals
+
+
+def _literal_value(kind, text):
+    if kind == "num":
+        return float(text) if "." in text else int(text)
+    return text
+
+
+def build_template(sql, literals, reserved=()):
+    """
+    Turns executed SQL into (template, slots): template has %s placeholders (other % escaped)
+    and slots lists, per placeholder, the index of the question literal it binds.
+    `reserved` are values the SQL may contain for other reasons (catalog product_ids).
+    Returns None when the literals cannot be mapped unambiguously.
+    """
+    if not literals:
+        return sql, []
+    values = [value for _, value in literals]
+    if len(set(values)) != len(values) or set(values) & {str(value) for value in reserved}:
+        return None   # Same value twice: no way to tell which literal a token came from
+
+    slots, parts, bound, pos = [], [], set(), 0
+    for token in _SQL_TOKEN.finditer(sql):
+        parts.append(sql[pos:token.start()])
+        text = token.group(0)
+        slot = None
+        for idx, (kind, value) in enumerate(literals):
+            if kind == "num" and text == value:
+                slot = idx
+            elif kind != "num" and text[0] == "'" and text[1:-1].replace("''", "'") == value:
+                slot = idx
+        if slot is not None:
+            if slot in bound or _ROW_COUNT.search(sql, 0, token.start()):
+                return None   # One literal, two SQL meanings; or a row count, not a filter value
+            parts.append("%s")
+            slots.append(slot)
+            bound.add(slot)
+        else:
+            parts.append(text.replace("%", "%%"))
+        pos = token.end()
+    parts.append(sql[pos:])
+
+    if len(bound) != len(literals):
+        return None   # A literal is hidden inside other text; the template would not generalize
+    return "".join(parts), slots
+
+
+def lookup_sql(variant, question):
+    """Returns (template, params) for a cached plan matching this question, or None."""
+    pattern, literals = extract_pattern(question)
+    key = (variant, pattern)
+    with _lock:
+        _stats["lookups"] += 1
+        entry = _templates.get(key)
+        if entry is not None and entry["expires_at"] < time.monotonic():
+            del _templates[key]
+            _stats["expired"] += 1
+            entry = None
+        if entry is None or entry["literal_kinds"] != [kind for kind, _ in literals]:
+            _stats["misses"] += 1
+            record_cache("sql_template", False)
+            return None
+        _templates.move_to_end(key)
+        entry["hits"] += 1
+        _stats["hits"] += 1
+        record_cache("sql_template", True)
+        params = [_literal_value(*literals[slot]) for slot in entry["slots"]]
+        return entry["template"], params
+
+
+def store_sql(variant, question, sql, reserved=()):
+    pattern, literals = extract_pattern(question)
+    built = build_template(sql, literals, reserved)
+    with _lock:
+        if built is None:
+            _stats["rejected"] += 1
+            return False
+        template, slots = built
+        _templates[(variant, pattern)] = {
+            "template": template,
+            "slots": slots,
+            "literal_kinds": [kind for kind, _ in literals],
+            "hits": 0,
+            "expires_at": time.monotonic() + SQL_CACHE_TTL,
+        }
+        _templates.move_to_end((variant, pattern))
+        _stats["stores"] += 1
+        while len(_templates) > SQL_CACHE_SIZE:
+            _templates.popitem(last=False)
+            _stats["evictions"] += 1
+    system_log(f" SQL template cached for '{pattern}': {template} {slots}")
+    return True
+
+
+def invalidate_sql(variant, question):
+    """Drops the plan for this question's pattern (called when a cached template fails)."""
+    pattern, _ = extract_pattern(question)
+    with _lock:
+        if _templates.pop((variant, pattern), None) is not None:
+            _stats["failures"] += 1
+
+
+def clear_sql_cache():
+    with _lock:
+        _templates.clear()
+
+
+def get_sql_cache_stats():
+    with _lock:
+        stats = dict(_stats, size=len(_templates))
+    stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+    return stats
@@ -0,0 +1,80 @@
+import json
+import threading
+
+from config import SQL_STATEMENT_TIMEOUT_MS, SQL_MAX_PLAN_COST, SQL_MAX_PLAN_ROWS
+from utils import system_log, span
+from core.result_shaping import execute_bounded, limit_sql
+
+# Execution guard for LLM-generated SQL against the shared POS database:
+# every statement runs in a READ ONLY transaction with a statement_timeout, and its plan is
+# checked with EXPLAIN (no ANALYZE, so nothing runs) before execution. A rejection is raised
+# as QueryRejected, whose message goes back to the model as error_feedback.
+
+_lock = threading.Lock()
+_stats = {"checked": 0, "rejected_cost": 0, "rejected_rows": 0}
+
+
+class QueryRejected(Exception):
+    """The planner estimate for a generated query exceeded the configured limits."""
+
+
+def begin_guarded_transaction(cur, timeout_ms=SQL_STATEMENT_TIMEOUT_MS):
+    # Must be the first statements of the transaction; SET LOCAL ends with it
+    cur.execute("SET TRANSACTION READ ONLY")
+    cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+
+
+def _max_plan_rows(node):
+    return max([node.get("Plan Rows", 0)] + [_max_plan_rows(child) for child in node.get("Plans", [])])
+
+
+def check_plan(cur, sql, params=None, max_cost=SQL_MAX_PLAN_COST, max_rows=SQL_MAX_PLAN_ROWS):
+    """Returns (total_cost, max_plan_rows) from EXPLAIN, or raises QueryRejected."""
+    cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    top = plan[0]["Plan"]
+    # Row cap: the largest intermediate estimate, so a cartesian join under the LIMIT still shows
+    cost, rows = top["Total Cost"], _max_plan_rows(top)
+
+    with _lock:
+        _stats["checked"] += 1
+        if cost > max_cost:
+            _stats["rejected_cost"] += 1
+        elif rows > max_rows:
+            _stats["rejected_rows"] += 1
+
+    if cost > max_cost:
+        raise QueryRejected(
+            f"Query rejected by cost guard: estimated cost {cost:,.0f} exceeds {max_cost:,.0f}. "
+            "Check for missing JOIN conditions (cartesian product) and add selective WHERE filters or aggregate instead."
+        )
+    if rows > max_rows:
+        raise QueryRejected(
+            f"Query rejected by cost guard: a plan step is estimated at {rows:,} rows (limit {max_rows:,}). "
+            "Check JOIN conditions and filter or aggregate (COUNT/SUM/GROUP BY) earlier."
+        )
+    return cost, rows
+
+
+def execute_guarded(conn, sql, params=None):
+    """
+    Runs one generated SELECT read-only, under statement_timeout, after a plan check.
+    Returns a QueryResult; raises QueryRejected or the database error (caller rolls back).
+    """
+    cur = conn.cursor()
+    try:
+        with span("sql_guard"):
+            begin_guarded_transaction(cur)
+            # The plan of the statement that actually runs, i.e. with the row cap applied
+            cost, rows = check_plan(cur, limit_sql(sql), params)
+    finally:
+        cur.close()
+    system_log(f" SQL guard passed: estimated cost {cost:,.0f}, rows {rows:,}.")
+    return execute_bounded(conn, sql, params)
+
+
+def get_sql_guard_stats():
+    with _lock:
+        return dict(_stats)
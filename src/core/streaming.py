@@ -0,0 +1,110 @@
+import time
+
+from config import get_groq_client
+from utils import system_log, span, observe, record_tokens
+
+STREAM_ERROR_MESSAGE = "\n\nI'm unable to access that right now."
+
+
+class AnswerStream:
+    """
+    Iterable of answer text chunks, renderable with `st.write_stream`.
+    Once fully consumed it holds the complete text, token usage and time-to-first-token,
+    and runs any `on_complete` callbacks (e.g. the answer cache) with the full text.
+    """
+
+    def __init__(self, chunks, label="answer", started=None):
+        self._chunks = chunks
+        self.label = label
+        self.started = started if started is not None else time.time()
+        self.first_token_time = None
+        self.finished_time = None
+        self.usage = None
+        self.text = ""
+        self.done = False
+        self.error = None
+        self._callbacks = []
+
+    @classmethod
+    def from_text(cls, text, label="answer"):
+        """Wraps an already-known answer (cache hit, fallback message) in the streaming interface."""
+        return cls(iter([text]), label)
+
+    def on_complete(self, callback):
+        self._callbacks.append(callback)
+        return self
+
+    def __iter__(self):
+        parts = []
+        try:
+            for piece in self._chunks:
+                if not piece:
+                    continue
+                if self.first_token_time is None:
+                    self.first_token_time = time.time()
+                parts.append(piece)
+                yield piece
+        except Exception as e:
+            # A dropped stream must not crash the chat UI; the partial answer is kept but not cached
+            system_log(f" Stream {self.label} failed: {e}")
+            self.error = str(e)
+            parts.append(STREAM_ERROR_MESSAGE)
+            yield STREAM_ERROR_MESSAGE
+
+        self.text = "".join(parts)
+        self.finished_time = time.time()
+        self.done = True
+        if self.error:
+            return
+        observe("llm_ttft_seconds", self.ttft, stage=self.label)
+        observe("llm_stream_seconds", self.finished_time - self.started, stage=self.label)
+        if self.usage:
+            record_tokens(self.label, self.usage)
+            system_log(f" Tokens Used {self.label} (stream) - Prompt: {self.usage['prompt_tokens']} | Completion: {self.usage['completion_tokens']} | Total: {self.usage['total_tokens']} | TTFT: {self.ttft:.2f}s")
+        for callback in self._callbacks:
+            try:
+                callback(self.text)
+            except Exception as e:
+                system_log(f" Stream completion callback failed: {e}")
+
+    @property
+    def ttft(self):
+        """Seconds from the LLM request to the first text chunk (0 for pre-built answers)."""
+        if self.first_token_time is None:
+            return 0.0
+        return self.first_token_time - self.started
+
+    def metadata(self):
+        data = {"ttft_seconds": round(self.ttft, 3), "streamed": True}
+        if self.error:
+            data["error"] = self.error
+        if self.usage:
+            data.update(self.usage)
+        return data
+
+
+def stream_completion(label, **kwargs):
+    """
+    Starts a streaming Groq chat completion and returns it as an AnswerStream.
+    The request is sent immediately; text arrives as the caller iterates.
+    """
+    started = time.time()
+    with span(f"llm:{label}:open"):
+        response = get_groq_client().chat.completions.create(stream=True, **kwargs)
+    stream = None
+
+    def chunks():
+        for chunk in response:
+            # Groq reports usage on the final chunk under x_groq
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+            if usage:
+                stream.usage = {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens
+                }
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    stream = AnswerStream(chunks(), label, started)
+    return stream
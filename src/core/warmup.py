@@ -0,0 +1,33 @@
+import time
+
+from config import get_embed_model, get_groq_client
+from utils import system_log, connect_redis
+from core.router import train_router
+from core.schema_index import load_schema_index
+from core.kb_index import load_kb_index
+
+# Nothing is loaded or connected at import time, so the first request would otherwise pay for
+# the embedding model, Groq client, Redis connection, router centroids, schema index and KB index.
+# warm_up() does all of that once per process, before the UI takes questions.
+
+
+def warm_up():
+    """Loads the process-wide models and opens the first connections. Returns {step: seconds}."""
+    steps = [
+        ("embed_model", lambda: get_embed_model().encode("warm up", show_progress_bar=False)),
+        ("groq_client", get_groq_client),
+        ("redis", connect_redis),
+        ("router", train_router),
+        ("schema_index", load_schema_index),
+        ("kb_index", load_kb_index),
+    ]
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            system_log(f" Warm-up step {name} failed: {e}", level="WARNING")
+        timings[name] = round(time.perf_counter() - started, 3)
+    system_log(f" Warm-up finished in {sum(timings.values()):.2f}s: {timings}")
+    return timings
@@ -0,0 +1,93 @@
+"""
+Embedding model loader with selectable inference backends (EMBED_BACKEND in config.py).
+
+    torch      - the full-precision PyTorch SentenceTransformer (default)
+    onnx       - the same weights exported to ONNX Runtime
+    onnx-int8  - ONNX with int8 dynamically quantized weights (smallest, fastest on CPU)
+
+Every backend returns a SentenceTransformer, so callers keep using `.encode()` and
+`.tokenizer`. Kept free of config/utils imports like ingest_workers, which loads the
+same backend in each spawned ingest worker, so it reports through the standard logging module.
+"""
+import logging
+import os
+import platform
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Quantized exports published with the sentence-transformers models, per CPU instruction set
+_INT8_FILES = {
+    "arm64": "onnx/model_qint8_arm64.onnx",
+    "avx512_vnni": "onnx/model_qint8_avx512_vnni.onnx",
+    "avx2": "onnx/model_quint8_avx2.onnx",
+}
+
+
+def _cpu_flavor():
+    """Best int8 kernel family for this CPU: arm64, avx512_vnni or avx2."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            if "avx512_vnni" in f.read():
+                return "avx512_vnni"
+    except OSError:
+        pass
+    return "avx2"
+
+
+def _onnx_kwargs(file_name, threads):
+    kwargs = {"file_name": file_name}
+    if threads:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        kwargs["session_options"] = options
+    return kwargs
+
+
+def _load_int8(model_name, threads, export_dir):
+    from sentence_transformers import SentenceTransformer
+
+    flavor = _cpu_flavor()
+    try:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs(_INT8_FILES[flavor], threads))
+    except Exception as e:
+        # Models without a published int8 file: quantize our own ONNX export once and reuse it
+        logger.warning("No published %s int8 export for %s (%s); quantizing locally.", flavor, model_name, e)
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    local_dir = os.path.join(export_dir, model_name.replace("/", "__"))
+    file_name = _INT8_FILES[flavor]
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save_pretrained(local_dir)
+        export_dynamic_quantized_onnx_model(model, flavor, local_dir)
+    return SentenceTransformer(local_dir, backend="onnx", model_kwargs=_onnx_kwargs(file_name, threads))
+
+
+def load_embed_model(model_name, backend="torch", threads=None, onnx_file=None, export_dir=".onnx_models"):
+    """
+    Loads `model_name` on `backend` (one of BACKENDS). `threads` caps the CPU threads the model
+    may use (None leaves the runtime default); `onnx_file` overrides the ONNX file to load.
+    """
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+    if onnx_file:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs(onnx_file, threads))
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs("onnx/model.onnx", threads))
+    return _load_int8(model_name, threads, export_dir)
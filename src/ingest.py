@@ -1,92 +1,326 @@
+import hashlib
+import multiprocessing
 import os
 import re
-import psycopg2
-from sentence_transformers import SentenceTransformer
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from psycopg2.extras import execute_values
 from utils import get_connection
-from config import DB_CONFIG, embed_model
+from config import get_embed_model, EMBED_MODEL_NAME, INGEST_BATCH_SIZE, EMBED_BATCH_SIZE
+from config import INGEST_WORKERS, INGEST_TORCH_THREADS, EMBED_BACKEND, EMBED_ONNX_FILE, EMBED_ONNX_DIR, KB_INDEX_ENABLED
+import ingest_workers
 from utils import system_log
+from core import invalidate_answer_cache, rebuild_kb_index
 
-def parse_txt_to_chunks(file_path):
+# Precompiled once: the record delimiter and every field tag, matched in a single pass per record
+_DELIMITER = re.compile(r'_{10,}')
+_FIELD_TAG = re.compile(r'\b(TYPE|TITLE|CONTENT|SOURCE)\s*:\s*', re.IGNORECASE)
+
+
+def _parse_record(chunk):
     """
-    Parses a text file using '________________________________________' as a delimiter
-    and extracts metadata based on TYPE, TITLE, CONTENT, and SOURCE tags.
+    Extracts TYPE/TITLE/CONTENT/SOURCE from one record in a single scan over its field tags.
+    TYPE and TITLE run to the next tag or end of line, CONTENT runs until SOURCE (so words like
+    'Type:' inside specs stay in the content), and SOURCE runs to the end of its line.
+    """
+    fields = {}
+    current, value_start = None, 0
+    for match in _FIELD_TAG.finditer(chunk):
+        tag = match.group(1).upper()
+        if tag in fields or (current == "CONTENT" and tag != "SOURCE") or current == "SOURCE":
+            continue
+        if current:
+            fields[current] = chunk[value_start:match.start()]
+        current, value_start = tag, match.end()
+    if current:
+        fields[current] = chunk[value_start:]
+
+    def single_line(value):
+        return value.strip().split('\n', 1)[0].strip()
+
+    return {
+        # 1. TYPE (Defaults to 'product_spec' if not found)
+        "document_type": single_line(fields["TYPE"]) if fields.get("TYPE", "").strip() else "product_spec",
+        # 2. TITLE
+        "title": single_line(fields["TITLE"]) if fields.get("TITLE", "").strip() else "Untitled Document",
+        # 3. CONTENT (falls back to the whole record)
+        "content": fields["CONTENT"].strip() if "CONTENT" in fields else chunk,
+        # 4. SOURCE
+        "source": single_line(fields["SOURCE"]) if fields.get("SOURCE", "").strip() else "Unknown",
+    }
+
+
+def iter_txt_chunks(file_path):
+    """
+    Streams records from a '________________________________________' delimited text file.
+    Reads line by line and holds at most one record in memory, so file size does not matter.
     """
     if not os.path.exists(file_path):
         system_log(f" Error: {file_path} not found.")
-        return []
+        return
 
+    buffer = []
     with open(file_path, 'r', encoding='utf-8') as f:
-        raw_text = f.read()
+        for line in f:
+            pieces = _DELIMITER.split(line)
+            buffer.append(pieces[0])
+            # Each delimiter on the line closes the current record
+            for piece in pieces[1:]:
+                chunk = "".join(buffer).strip()
+                if chunk:
+                    yield _parse_record(chunk)
+                buffer = [piece]
+
+    chunk = "".join(buffer).strip()
+    if chunk:
+        yield _parse_record(chunk)
+
+
+def parse_txt_to_chunks(file_path):
+    """
+    Parses a text file using '________________________________________' as a delimiter
+    and extracts metadata based on TYPE, TITLE, CONTENT, and SOURCE tags.
+    Materializes every record; ingestion uses iter_txt_chunks instead.
+    """
+    return list(iter_txt_chunks(file_path))
+
+
+def _batched(records, size):
+    """Yields lists of at most `size` records."""
+    batch = []
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _source_key(file_path):
+    """Sync key for a file: its name, so the same file synced from another cwd still matches."""
+    return os.path.basename(file_path)
+
+
+def _file_hash(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-    # Split records by the underscore line
-    raw_chunks = re.split(r'_{10,}', raw_text)
-    parsed_records = []
 
-    for chunk in raw_chunks:
-        chunk = chunk.strip()
-        if not chunk:
+def _chunk_hash(rec):
+    payload = "\x1f".join([rec['document_type'], rec['title'], rec['content'], rec['source']])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _unique_titles(records, file_path):
+    """(source_file, title) is the chunk key, so repeated titles in one file get a ' #n' suffix."""
+    seen = {}
+    for rec in records:
+        count = seen.get(rec['title'], 0) + 1
+        seen[rec['title']] = count
+        if count > 1:
+            system_log(f" Duplicate title '{rec['title']}' in {file_path}; storing as '{rec['title']} #{count}'")
+            rec = dict(rec, title=f"{rec['title']} #{count}")
+        yield rec
+
+
+def _upsert_batch(cur, source_file, batch, embeddings, batch_size):
+    rows = [
+        (rec['document_type'], rec['title'], rec['content'], rec['source'], emb.tolist(),
+         source_file, rec['content_hash'])
+        for rec, emb in zip(batch, embeddings)
+    ]
+    execute_values(cur, """
+        INSERT INTO knowledge_base (document_type, title, content, source, embedding, source_file, content_hash)
+        VALUES %s
+        ON CONFLICT (source_file, title) DO UPDATE SET
+            document_type = EXCLUDED.document_type,
+            content = EXCLUDED.content,
+            source = EXCLUDED.source,
+            embedding = EXCLUDED.embedding,
+            content_hash = EXCLUDED.content_hash
+    """, rows, template="(%s, %s, %s, %s, %s::vector, %s, %s)", page_size=batch_size)
+
+
+def _write_batch(cur, source_file, batch, embedding_future, stats, batch_size):
+    """Waits for one batch's embeddings and upserts it inside its own savepoint."""
+    stats["batches"] += 1
+    cur.execute("SAVEPOINT ingest_batch;")
+    try:
+        embeddings = embedding_future.result()
+        _upsert_batch(cur, source_file, batch, embeddings, batch_size)
+        cur.execute("RELEASE SAVEPOINT ingest_batch;")
+        stats["rows"] += len(batch)
+        return True
+
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT ingest_batch;")
+        stats["failed_batches"] += 1
+        stats["failed_rows"] += len(batch)
+        system_log(f" Error upserting batch '{batch[0]['title']}' .. '{batch[-1]['title']}': {e}")
+        return False
+
+
+def _serial_embed(texts):
+    """In-process embedding, wrapped in a completed Future to match the process-pool path."""
+    future = Future()
+    try:
+        future.set_result(get_embed_model().encode(texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _sync_file(cur, file_path, stats, batch_size, force, embed=_serial_embed, max_pending=0):
+    """
+    Brings one file's chunks in knowledge_base up to date: unchanged files are skipped on
+    mtime/size (then hash), unchanged chunks are skipped on content hash, changed or new chunks
+    are embedded and upserted, and chunks no longer in the file are deleted.
+    Returns False if any batch failed (the file fingerprint is then not recorded, so the next
+    sync retries it).
+    """
+    source_file = _source_key(file_path)
+    file_stat = os.stat(file_path)
+
+    cur.execute("SELECT mtime, size, file_hash FROM kb_source_file WHERE source_file = %s;", (source_file,))
+    previous = cur.fetchone()
+    if not force and previous and previous[0] == file_stat.st_mtime and previous[1] == file_stat.st_size:
+        system_log(f" Unchanged (mtime/size): {file_path}")
+        stats["files_skipped"] += 1
+        return True
+
+    file_hash = _file_hash(file_path)
+    if not force and previous and previous[2] == file_hash:
+        system_log(f" Unchanged (hash): {file_path}")
+        cur.execute("UPDATE kb_source_file SET mtime = %s, size = %s WHERE source_file = %s;",
+                    (file_stat.st_mtime, file_stat.st_size, source_file))
+        stats["files_skipped"] += 1
+        return True
+
+    # Titles seen in this pass are staged server-side, so memory stays bounded by one batch
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS kb_sync_seen (title TEXT PRIMARY KEY) ON COMMIT DELETE ROWS;
+    """)
+    cur.execute("TRUNCATE kb_sync_seen;")
+
+    ok = True
+    pending = deque()   # (records, embedding future) awaiting the single writer
+    # Pipeline: stream records -> batch -> diff against stored hashes -> embed -> upsert
+    for batch in _batched(_unique_titles(iter_txt_chunks(file_path), file_path), batch_size):
+        titles = [rec['title'] for rec in batch]
+        execute_values(cur, "INSERT INTO kb_sync_seen (title) VALUES %s ON CONFLICT DO NOTHING",
+                       [(t,) for t in titles], page_size=batch_size)
+        cur.execute("SELECT title, content_hash FROM knowledge_base WHERE source_file = %s AND title = ANY(%s);",
+                    (source_file, titles))
+        existing = dict(cur.fetchall())
+
+        changed = []
+        for rec in batch:
+            rec['content_hash'] = _chunk_hash(rec)
+            if existing.get(rec['title']) == rec['content_hash']:
+                stats["unchanged"] += 1
+            else:
+                stats["updated" if rec['title'] in existing else "inserted"] += 1
+                changed.append(rec)
+        if not changed:
             continue
 
-        # Extraction Logic using Regex
-        # 1. TYPE (Defaults to 'product_spec' if not found)
-        doc_type_match = re.search(r'TYPE:\s*(.*?)(?=\s*TITLE:|\s*CONTENT:|$)', chunk, re.IGNORECASE)
-        doc_type = doc_type_match.group(1).strip() if doc_type_match else "product_spec"
+        # Generate vectors for TITLE + CONTENT; in parallel mode this returns immediately
+        texts = [f"{rec['title']} {rec['content']}" for rec in changed]
+        pending.append((changed, embed(texts)))
+        while len(pending) > max_pending:
+            ok = _write_batch(cur, source_file, *pending.popleft(), stats, batch_size) and ok
 
-        # 2. TITLE (Stops before 'CONTENT:')
-        title_match = re.search(r'TITLE:\s*(.*?)(?=\s*CONTENT:|$)', chunk, re.IGNORECASE)
-        title = title_match.group(1).strip() if title_match else "Untitled Document"
+    # Results are written strictly in submission order, so the outcome never depends on worker timing
+    while pending:
+        ok = _write_batch(cur, source_file, *pending.popleft(), stats, batch_size) and ok
 
-        # 3. CONTENT (Starts after 'CONTENT:' and stops before 'SOURCE:')
-        content_match = re.search(r'CONTENT\s*:\s*(.*?)(?=\s*SOURCE:|$)', chunk, re.IGNORECASE | re.DOTALL)
-        content = content_match.group(1).strip() if content_match else chunk
+    # Chunks that disappeared from the file, plus rows from pre-incremental syncs (no source_file)
+    # that this file now owns
+    cur.execute("""
+        DELETE FROM knowledge_base kb
+        WHERE kb.source_file = %s
+          AND NOT EXISTS (SELECT 1 FROM kb_sync_seen s WHERE s.title = kb.title);
+    """, (source_file,))
+    stats["deleted"] += cur.rowcount
+    cur.execute("""
+        DELETE FROM knowledge_base kb USING kb_sync_seen s
+        WHERE kb.source_file IS NULL AND kb.title = s.title;
+    """)
+    stats["deleted"] += cur.rowcount
 
-        # 4. SOURCE
-        source_match = re.search(r'SOURCE:\s*(.*)', chunk, re.IGNORECASE)
-        source = source_match.group(1).strip() if source_match else "Unknown"
-
-        parsed_records.append({
-            "document_type": doc_type,
-            "title": title,
-            "content": content,
-            "source": source
-        })
-    
-    return parsed_records
-
-def ingest_to_knowledge_base(file_list):
+    if ok:
+        cur.execute("""
+            INSERT INTO kb_source_file (source_file, mtime, size, file_hash, synced_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (source_file) DO UPDATE SET
+                mtime = EXCLUDED.mtime, size = EXCLUDED.size,
+                file_hash = EXCLUDED.file_hash, synced_at = EXCLUDED.synced_at
+        """, (source_file, file_stat.st_mtime, file_stat.st_size, file_hash))
+    return ok
+
+
+def ingest_to_knowledge_base(file_list, batch_size=INGEST_BATCH_SIZE, force=False, workers=INGEST_WORKERS):
     """
-    Processes a list of files, generates embeddings, and inserts into Postgres.
+    Incrementally syncs a list of files into knowledge_base: only new or changed chunks are
+    embedded (in batches) and upserted, removed chunks are deleted, unchanged files are skipped.
+    Each batch runs inside a savepoint and each file is committed on its own.
+    Pass force=True to re-check every chunk even when the file fingerprint is unchanged.
+    With workers > 1, embedding runs in a process pool (one model per worker) while this
+    process parses, diffs and remains the single Postgres writer.
+    Returns the sync stats (inserted/updated/deleted counts, failures, rows/sec).
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    for file_path in file_list:
-        system_log(f" Processing: {file_path}...")
-        records = parse_txt_to_chunks(file_path)
-
-        for rec in records:
-            # Generate vector for the CONTENT
-            try:
-                text_to_embed = f"{rec['title']} {rec['content']}"
-                embedding = embed_model.encode(text_to_embed).tolist()
-                
-                cur.execute("""
-                    INSERT INTO knowledge_base (document_type, title, content, source, embedding)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (rec['document_type'], rec['title'], rec['content'], rec['source'], embedding))
-                
-                system_log(f"Ingested: {rec['title']}")
-                
-            except Exception as e:
-                system_log(f" Error inserting '{rec['title']}': {e}")
-                conn.rollback()
-
-    conn.commit()
-    cur.close()
-    conn.close()
-    system_log("All knowledge base files have been synchronized.")
+    stats = {"files": 0, "files_skipped": 0, "rows": 0, "inserted": 0, "updated": 0, "unchanged": 0,
+             "deleted": 0, "failed_rows": 0, "batches": 0, "failed_batches": 0, "workers": max(1, workers)}
+    start = time.perf_counter()
+
+    executor = None
+    embed, max_pending = _serial_embed, 0
+    if workers > 1:
+        # spawn, not fork: forking a process that already initialised torch threads can deadlock
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=ingest_workers.init_worker,
+            initargs=(EMBED_MODEL_NAME, EMBED_BACKEND, INGEST_TORCH_THREADS, EMBED_ONNX_FILE, EMBED_ONNX_DIR),
+        )
+        embed = lambda texts: executor.submit(ingest_workers.embed_texts, texts, EMBED_BATCH_SIZE)
+        max_pending = workers * 2   # Keeps every worker busy without buffering the whole file
+        system_log(f" Parallel ingest: {workers} embedding workers ({EMBED_BACKEND})")
 
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
 
-    
+            for file_path in file_list:
+                if not os.path.exists(file_path):
+                    system_log(f" Error: {file_path} not found.")
+                    continue
+                system_log(f" Processing: {file_path}...")
+                _sync_file(cur, file_path, stats, batch_size, force, embed, max_pending)
 
+                # Commit per file so a later failure never discards files already synced
+                conn.commit()
+                stats["files"] += 1
 
+            cur.close()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+
+    # SQL answers do not read the knowledge base; RAG and BOTH answers may now be stale
+    if stats["rows"] or stats["deleted"]:
+        invalidate_answer_cache(["RAG", "BOTH"])
+        if KB_INDEX_ENABLED:
+            rebuild_kb_index()   # New snapshot from the committed rows; readers switch over atomically
+    system_log(f" Ingestion stats: {stats}")
+    system_log("All knowledge base files have been synchronized.")
+    return stats
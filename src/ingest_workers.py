@@ -0,0 +1,22 @@
+"""
+Embedding workers for parallel ingestion (see ingest.ingest_to_knowledge_base).
+
+Kept free of config/utils imports: every worker is a spawned process that loads only its
+own embedding model (on the app's EMBED_BACKEND), not the Groq client, Redis or the app's model.
+"""
+import numpy as np
+
+from embedding_backend import load_embed_model
+
+_model = None
+
+
+def init_worker(model_name, backend, threads, onnx_file=None, export_dir=".onnx_models"):
+    """ProcessPoolExecutor initializer: one model per worker, pinned to a few threads."""
+    global _model
+    # N workers x all cores each would oversubscribe the CPU
+    _model = load_embed_model(model_name, backend, threads=threads, onnx_file=onnx_file, export_dir=export_dir)
+
+
+def embed_texts(texts, batch_size):
+    return np.asarray(_model.encode(texts, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
@@ -4,18 +4,25 @@ import time
 from utils import setup_database
 from core import identify_intent
 from core import ask_sql_ai, ask_rag_ai, ask_both_ai, validate_query,reformulate_question, handle_small_talk
+from core import invalidate_answer_cache, get_answer_cache_stats, AnswerStream, get_sql_cache_stats
+from core import load_catalog, try_fast_path, get_catalog_stats, get_result_shaping_stats, get_sql_guard_stats, warm_up
+from core import get_rerank_stats, get_kb_index_stats
 from ingest import ingest_to_knowledge_base
 from utils import log_transaction
-from utils import system_log
-from utils import save_message,clear_history,get_chat_history
+from utils import system_log, log_enabled
+from utils import get_pool_stats, get_embedding_cache_stats, get_logger_stats
+from utils import start_trace, observe, get_metrics_summary, export_prometheus
+from utils import save_turn,clear_history,get_chat_history,get_redis_stats
 
 # Page Configuration
 st.set_page_config(page_title="POS RAG Intelligence", page_icon="🤖", layout="wide")
 
-# Initialize DB once
+# Initialize DB, models and connections once per process
 @st.cache_resource
 def init_system():
     setup_database()
+    load_catalog()
+    warm_up()
     return True
 
 init_system()
@@ -45,9 +52,13 @@ with st.sidebar:
             valid_files = [f for f in files_to_process if os.path.exists(f)]
             
             if valid_files:
-                ingest_to_knowledge_base(valid_files)
+                stats = ingest_to_knowledge_base(valid_files)
                 status.update(label="Sync Complete!", state="complete", expanded=False)
-                st.success(f"Synced {len(valid_files)} files to Pos_dbc.")
+                st.success(f"Synced {len(valid_files)} files to Pos_dbc: "
+                           f"{stats['inserted']} new, {stats['updated']} changed, {stats['deleted']} removed, "
+                           f"{stats['files_skipped']} files unchanged ({stats['rows_per_sec']} rows/sec).")
+                if stats["failed_rows"]:
+                    st.warning(f"{stats['failed_rows']} chunks failed to ingest; see system_audit.log.")
             else:
                 status.update(label="Sync Failed!", state="error")
                 st.error("No source files found in /data folder.")
@@ -58,12 +69,38 @@ with st.sidebar:
     if st.button("🗑️ Clear Chat & Cache"):
         st.session_state.messages = []
         clear_history(session_id)
+        invalidate_answer_cache()
         st.cache_resource.clear()
         st.rerun()
 
     st.header("📊 System Monitor")
     st.status("Database Connected", state="complete")
     st.info("Knowledge Base: Ready")
+    with st.expander("Logger"):
+        st.json(get_logger_stats())
+    with st.expander("Redis"):
+        st.json(get_redis_stats())
+    with st.expander("DB Pool"):
+        st.json(get_pool_stats())
+    with st.expander("Embedding Cache"):
+        st.json(get_embedding_cache_stats())
+    with st.expander("Answer Cache"):
+        st.json(get_answer_cache_stats())
+    with st.expander("KB Index"):
+        st.json(get_kb_index_stats())
+    with st.expander("Re-ranking"):
+        st.json(get_rerank_stats())
+    with st.expander("SQL Template Cache"):
+        st.json(get_sql_cache_stats())
+    with st.expander("SQL Results"):
+        st.json(get_result_shaping_stats())
+    with st.expander("SQL Guard"):
+        st.json(get_sql_guard_stats())
+    with st.expander("Product Catalog"):
+        st.json(get_catalog_stats())
+    with st.expander("Pipeline Metrics"):
+        st.json(get_metrics_summary())
+        st.download_button("Prometheus export", export_prometheus(), file_name="metrics.prom")
 
 
 # Main Chat UI
@@ -81,11 +118,26 @@ for message in st.session_state.messages:
 # User Input Box
 if query := st.chat_input("Ask about stock, prices, orders, specs or policies..."):
     start_time = time.time()
+    trace = start_trace()
     st.session_state.messages.append({"role": "user", "content": query})
     with st.chat_message("user"):
         st.markdown(query)
     
     with st.chat_message("assistant"):
+        # 1. Fast path: stock / price / order status straight from Postgres, no LLM calls
+        fast_result = try_fast_path(query)
+        if fast_result is not None:
+            answer, handler = fast_result
+            st.caption("⚡ Path: FAST")
+            st.markdown(answer)
+            save_turn(session_id, query, answer)
+            latency = time.time() - start_time
+            observe("request_seconds", latency, route="FAST")
+            log_transaction(query, "FAST", latency, answer, metadata={"handler": handler, "llm_calls": 0, "spans": trace})
+            st.session_state.messages.append({"role": "assistant", "content": answer})
+            system_log(f" Response delivered in {latency:.2f} seconds via FAST route ({handler}).")
+            st.stop()
+
         standalone_query = reformulate_question(query, session_id)
 
 # 2. Identify Intent
@@ -98,11 +150,12 @@ if query := st.chat_input("Ask about stock, prices, orders, specs or policies...
             system_log(f" Original: {query} -> Standalone: {standalone_query}")
             with st.spinner("Analyzing Pos_dbc & Knowledge Base..."):
                 is_safe, error_message = validate_query(standalone_query)
-                save_message(session_id, "user", query)
-                save_message(session_id, "assistant", answer)
-                system_log(get_chat_history(session_id, window_size=6))
+                save_turn(session_id, query, answer)
+                if log_enabled("DEBUG"):   # Skip the Redis read unless it will be logged
+                    system_log(get_chat_history(session_id, window_size=6), level="DEBUG")
                 latency = time.time() - start_time
-                log_transaction(query, intent, latency, answer) 
+                observe("request_seconds", latency, route=intent)
+                log_transaction(query, intent, latency, answer, metadata={"spans": trace}) 
                 st.markdown(answer)
                 st.session_state.messages.append({"role": "assistant", "content": answer})
                 system_log(f" Response delivered in {latency:.2f} seconds via {intent} route.")
@@ -118,19 +171,31 @@ if query := st.chat_input("Ask about stock, prices, orders, specs or policies...
                     route = intent
                     if "BOTH" in route:
                         st.caption("🔀 Path: BOTH (SQL + RAG)")
-                        answer = ask_both_ai(standalone_query)
+                        answer = ask_both_ai(standalone_query, stream=True)
                     elif "SQL" in route:
                         st.caption("🔍 Path: SQL")
-                        answer = ask_sql_ai(standalone_query)
+                        answer = ask_sql_ai(standalone_query, stream=True)
                     else:
                         st.caption("📚 Path: RAG")
-                        answer = ask_rag_ai(standalone_query)
-
-                save_message(session_id, "user", query)
-                save_message(session_id, "assistant", answer)
-                system_log(get_chat_history(session_id, window_size=6))
-                latency = time.time() - start_time
-                log_transaction(query, route, latency, answer) 
+                        answer = ask_rag_ai(standalone_query, stream=True)
+
+            # Render the final answer token by token, outside the spinner
+            answer_metadata = None
+            if isinstance(answer, AnswerStream):
+                st.write_stream(answer)
+                answer_metadata = answer.metadata()
+                if answer.first_token_time:
+                    answer_metadata["ttft_e2e_seconds"] = round(answer.first_token_time - start_time, 3)
+                answer = answer.text
+            else:
                 st.markdown(answer)
-                st.session_state.messages.append({"role": "assistant", "content": answer})
-                system_log(f" Response delivered in {latency:.2f} seconds via {route} route.")
\ No newline at end of file
+
+            save_turn(session_id, query, answer)
+            if log_enabled("DEBUG"):   # Skip the Redis read unless it will be logged
+                system_log(get_chat_history(session_id, window_size=6), level="DEBUG")
+            latency = time.time() - start_time
+            observe("request_seconds", latency, route=route)
+            answer_metadata = dict(answer_metadata or {}, spans=trace)
+            log_transaction(query, route, latency, answer, metadata=answer_metadata) 
+            st.session_state.messages.append({"role": "assistant", "content": answer})
+            system_log(f" Response delivered in {latency:.2f} seconds via {route} route.")
@@ -11,6 +11,8 @@ from .rag_templates import (
     refine_prompt,
     sql_insight_system_prompt,
     both_final_answer_system_prompt,
+    routing_examples,
+    fast_path_templates,
     
 )
 
@@ -21,5 +23,7 @@ __all__ = [
     "refine_prompt",
     "sql_insight_system_prompt",
     "both_final_answer_system_prompt",
+    "routing_examples",
+    "fast_path_templates",
     
 ]
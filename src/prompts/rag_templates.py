@@ -79,7 +79,7 @@ refine_prompt = """
     3. If 'status' is Delayed/Failed, focus the query on the COURIER or PRODUCT reason.
     4. IGNORE staff/cashier names (e.g., Cher, Arosha) as they do not cause logistical delays.
     5. Output ONLY a plain English sentence.
-    6. NEVER output code, logic (if/else), or curly braces {}
+    6. NEVER output code, logic (if/else), or curly braces {{}}
 
     EXAMPLES:
     - Data: [RealDictRow({{'staff_name': 'Cher', 'courier_name': 'Koombiyo', 'order_status': 'Delayed'}})]
@@ -134,4 +134,66 @@ both_final_answer_system_prompt = """You are a POS system assistant. Answer ques
             7. For database errors, say: "I'm unable to access that right now"
             8. all prices should be in LKR 
 
-            Answer as if you are the company speaking directly to staff."""
\ No newline at end of file
+            Answer as if you are the company speaking directly to staff."""
+
+# Labeled examples for the local embedding router (core.router). Keep them short and
+# representative; the router averages each list into one centroid per route. Never copy
+# questions from QA.txt or bench/router_cases.tsv: bench/eval_router.py scores the router on those.
+routing_examples = {
+    "SQL": [
+        "Price of Xiaomi 14?",
+        "What is the price of iPhone 15",
+        "How many JBL Flip 6 speakers do we have?",
+        "S24 Ultra stock",
+        "How many orders are delayed?",
+        "Has order 110 been shipped yet?",
+        "iPhones sold on Jan 5",
+        "Total sales on 2026-01-10",
+        "List all smartphone models and their quantities",
+        "Show me all orders from January 3rd 2026",
+        "When did the price of the Galaxy A55 last change?",
+        "Which customer placed order 121?",
+        "Show orders handled by Koombiyo courier",
+        "Which products are out of stock?",
+        "How many units of Pixel 7a did we sell this month?",
+    ],
+    "RAG": [
+        "Xiaomi 14 specs?",
+        "What is the main camera resolution of the Pixel 8?",
+        "Return policy?",
+        "What is the warranty for smartphones?",
+        "Compare iPhone 15 and Pixel 7a battery capacity",
+        "How many watts does the Samsung travel adapter deliver?",
+        "Is the JBL Flip 6 dustproof?",
+        "Does the Sony WH-1000XM5 have noise cancelling?",
+        "Describe the display of the Samsung Galaxy S24 Ultra",
+        "What chipset does the Google Pixel 8 use?",
+        "Recommend a phone with a good camera",
+        "What features does the Galaxy A55 have?",
+        "How long is the warranty on accessories?",
+        "What does Koombiyo say about delivery times?",
+    ],
+    "BOTH": [
+        "Why is order 107 running late?",
+        "Is order 109 on time, and if not, what went wrong?",
+        "Order 55 status and why delayed?",
+        "Explain why order 120 has not arrived",
+        "What is the reason for the delay of order 119?",
+        "Why can't I order the iPhone 15?",
+        "Why was the price of the S24 Ultra changed and what is it now?",
+        "Is order 124 delayed, and if so why?",
+        "What caused the Koombiyo delays for my orders?",
+        "Why is this product out of stock?",
+        "Which cashier handled order 122 and which courier shipped it?",
+    ],
+}
+
+# Answer templates for the deterministic fast path (core.fast_path); no LLM involved
+fast_path_templates = {
+    "stock": "**{name}**: {quantity} units in stock (last updated {last_updated}).",
+    "out_of_stock": "**{name}** is currently out of stock (last updated {last_updated}).",
+    "no_stock_record": "There is no stock record for **{name}** yet.",
+    "price": "The current price of **{name}** is LKR {price:,.2f}.",
+    "order_status": "Order **#{order_id}** (placed {order_date}) is currently **{status}**.",
+    "order_not_found": "I couldn't find order **#{order_id}**. Please check the order number.",
+}
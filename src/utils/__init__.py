@@ -1,6 +1,8 @@
-from utils.db_connection import get_connection, setup_database
-from utils.memory_manager import save_message,clear_history,get_chat_history
-from utils.logger import system_log, log_transaction
+from utils.db_connection import get_connection, get_pool_stats, close_pool, setup_database
+from utils.memory_manager import save_message,save_turn,clear_history,get_chat_history,get_redis_stats,connect_redis
+from utils.logger import system_log, log_enabled, log_transaction, flush_logs, get_logger_stats
+from utils.metrics import span, timed, inc, observe, record_cache, record_tokens, start_trace, current_trace, get_metrics_summary, export_prometheus
+from utils.embedding_cache import embed_query, get_embedding_cache_stats, clear_embedding_cache
 
 
-__all__ = ["get_connection", "save_message", "clear_history", "get_chat_history", "system_log", "log_transaction", "setup_database"]
\ No newline at end of file
+__all__ = ["get_connection", "get_pool_stats", "close_pool", "save_message", "save_turn", "clear_history", "get_chat_history", "get_redis_stats", "connect_redis", "system_log", "log_enabled", "log_transaction", "flush_logs", "get_logger_stats", "setup_database", "embed_query", "get_embedding_cache_stats", "clear_embedding_cache", "span", "timed", "inc", "observe", "record_cache", "record_tokens", "start_trace", "current_trace", "get_metrics_summary", "export_prometheus"]
\ No newline at end of file
@@ -1,23 +1,306 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import psycopg2
-from config import DB_CONFIG
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from config import (DB_CONFIG, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT,
+                    DB_POOL_IDLE_TIMEOUT, DB_POOL_HEALTH_CHECK_INTERVAL,
+                    KB_HNSW_M, KB_HNSW_EF_CONSTRUCTION)
 from utils.logger import system_log
 
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
 
-def setup_database():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS knowledge_base (
-            kb_id SERIAL PRIMARY KEY,
-            content TEXT NOT NULL,
-            embedding vector(384)
-        );
+class ConnectionPool:
+    """Thread-safe Postgres pool with health checks, idle reaping and usage statistics."""
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 idle_timeout=DB_POOL_IDLE_TIMEOUT, health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                 **conn_kwargs):
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.conn_kwargs = conn_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = deque()   # (connection, last_used) pairs, most recently used on the right
+        self._in_use = set()
+        self._opening = 0      # Connections being opened outside the lock
+        self._closed = False
+        self._reaper = None
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "reaped": 0,
+            "health_check_failures": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    # --- Checkout / return ---
+    def getconn(self, timeout=None):
+        """Checks out a healthy connection, waiting up to `timeout` seconds for one to free up."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            conn, last_used = None, None
+            with self._cond:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                self._reap_idle()
+                while not self._idle and self._size() >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolError(f"timed out after {timeout:.1f}s waiting for a database connection")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use.add(conn)
+                else:
+                    self._opening += 1
+
+            if conn is None:
+                conn = self._open()
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                wait = time.monotonic() - start
+                self._stats["checkouts"] += 1
+                self._stats["total_wait_seconds"] += wait
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Returns a connection to the pool, resetting any open transaction first."""
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._in_use.discard(conn)
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager: `with pool.connection() as conn:` checks out and always returns a connection."""
+        conn = self.getconn(timeout)
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    # --- Maintenance ---
+    def reap(self):
+        """Closes connections that have sat idle past `idle_timeout` (keeps `minconn` open)."""
+        with self._cond:
+            return self._reap_idle()
+
+    def start_reaper(self):
+        """Starts a daemon thread that reaps idle connections even when no requests arrive."""
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+
+        def _run():
+            while not self._closed:
+                time.sleep(max(self.idle_timeout / 2, 1))
+                self.reap()
+
+        self._reaper = threading.Thread(target=_run, name="pg-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                conn.close()
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool usage, for sizing DB_POOL_MAX."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "size": self._size(),
+                "max_size": self.maxconn,
+                "avg_wait_seconds": (snapshot["total_wait_seconds"] / snapshot["checkouts"]
+                                     if snapshot["checkouts"] else 0.0),
+            })
+            return snapshot
+
+    # --- Internals (callers hold no lock unless noted) ---
+    def _size(self):
+        # Caller holds self._cond
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _reap_idle(self):
+        # Caller holds self._cond. Oldest connections sit on the left of the deque.
+        reaped = 0
+        now = time.monotonic()
+        while self._idle and self._size() > self.minconn:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            conn.close()
+            reaped += 1
+        self._stats["reaped"] += reaped
+        return reaped
+
+    def _open(self):
+        try:
+            conn = psycopg2.connect(**self.conn_kwargs)
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._in_use.add(conn)
+            self._stats["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            system_log(f" Pool health check failed, replacing connection: {e}")
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._in_use.discard(conn)
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**DB_CONFIG)
+                _pool.start_reaper()
+                system_log(f" Database pool created (min={_pool.minconn}, max={_pool.maxconn}).")
+    return _pool
+
+
+def get_connection(timeout=None):
+    """Pooled connection context manager: `with get_connection() as conn: ...`."""
+    return get_pool().connection(timeout)
+
+
+def get_pool_stats():
+    return get_pool().stats()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def create_search_indexes(cur, table="knowledge_base"):
+    """
+    Adds the stored tsvector column and the ANN/GIN indexes used by the hybrid search.
+    Every statement is idempotent, so this is safe to run on every start.
+    """
+    cur.execute(f"""
+        ALTER TABLE {table}
+        ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, '') || ' ' || content)) STORED;
+    """)
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS {table}_embedding_hnsw_idx
+        ON {table} USING hnsw (embedding vector_cosine_ops)
+        WITH (m = {KB_HNSW_M}, ef_construction = {KB_HNSW_EF_CONSTRUCTION});
     """)
-    
-    conn.commit()
-    cur.close()
-    conn.close()
-    system_log(" Database prepared.")
\ No newline at end of file
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_search_tsv_idx ON {table} USING gin (search_tsv);")
+    cur.execute(f"ANALYZE {table};")
+
+
+def setup_database():
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS knowledge_base (
+                kb_id SERIAL PRIMARY KEY,
+                document_type VARCHAR(50),
+                title TEXT,
+                content TEXT NOT NULL,
+                source VARCHAR(100),
+                embedding vector(384)
+            );
+        """)
+        create_search_indexes(cur)
+
+        # Incremental sync bookkeeping: one row per chunk keyed by (source_file, title),
+        # plus the last-synced fingerprint of every source file
+        cur.execute("ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS source_file TEXT;")
+        cur.execute("ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS knowledge_base_source_title_idx
+            ON knowledge_base (source_file, title);
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS kb_source_file (
+                source_file TEXT PRIMARY KEY,
+                mtime DOUBLE PRECISION NOT NULL,
+                size BIGINT NOT NULL,
+                file_hash TEXT NOT NULL,
+                synced_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+
+        conn.commit()
+        cur.close()
+    system_log(" Database prepared.")
@@ -0,0 +1,121 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from config import (get_embed_model, EMBED_MODEL_NAME, EMBED_BACKEND, EMBED_CACHE_SIZE, EMBED_CACHE_TTL,
+                    EMBED_CACHE_REDIS, EMBED_CACHE_REDIS_TTL)
+from utils.memory_manager import redis_get_bytes, redis_set_bytes
+from utils.metrics import span, record_cache
+
+# Two tiers: an in-process LRU (per Streamlit worker) and an optional Redis tier shared by all
+# workers. Redis values are raw float32 bytes (384 dims -> 1536 bytes) rather than JSON lists.
+
+_lock = threading.Lock()
+_local: "OrderedDict[str, tuple]" = OrderedDict()   # normalized text -> (vector, expires_at)
+_stats = {
+    "local_hits": 0,
+    "redis_hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "encode_seconds": 0.0,
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Cache key text: lowercased, whitespace collapsed, trailing punctuation dropped."""
+    return _WHITESPACE.sub(" ", text.strip().lower()).rstrip("?!. ")
+
+
+def _redis_key(normalized: str) -> str:
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    # int8 vectors differ slightly from float ones, so each backend keeps its own entries
+    return f"emb:{EMBED_MODEL_NAME}:{EMBED_BACKEND}:{digest}"
+
+
+def _local_get(normalized: str):
+    # Caller holds _lock
+    entry = _local.get(normalized)
+    if entry is None:
+        return None
+    vector, expires_at = entry
+    if expires_at < time.monotonic():
+        del _local[normalized]
+        return None
+    _local.move_to_end(normalized)
+    return vector
+
+
+def _local_put(normalized: str, vector):
+    # Caller holds _lock
+    _local[normalized] = (vector, time.monotonic() + EMBED_CACHE_TTL)
+    _local.move_to_end(normalized)
+    while len(_local) > EMBED_CACHE_SIZE:
+        _local.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def embed_query(text: str) -> np.ndarray:
+    """
+    Returns the float32 embedding for a query, from the LRU, then Redis, then the model.
+    The returned array is shared between callers and is therefore read-only.
+    """
+    normalized = normalize_query(text)
+
+    with _lock:
+        vector = _local_get(normalized)
+        if vector is not None:
+            _stats["local_hits"] += 1
+    if vector is not None:
+        record_cache("embedding", True)
+        return vector
+
+    if EMBED_CACHE_REDIS:
+        raw = redis_get_bytes(_redis_key(normalized))
+        if raw:
+            vector = np.frombuffer(raw, dtype=np.float32)
+            with _lock:
+                _stats["redis_hits"] += 1
+                _local_put(normalized, vector)
+            record_cache("embedding", True)
+            return vector
+
+    record_cache("embedding", False)
+    start = time.perf_counter()
+    with span("embed"):
+        vector = np.asarray(get_embed_model().encode(normalized), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    vector.setflags(write=False)
+
+    with _lock:
+        _stats["misses"] += 1
+        _stats["encode_seconds"] += elapsed
+        _local_put(normalized, vector)
+
+    if EMBED_CACHE_REDIS:
+        redis_set_bytes(_redis_key(normalized), vector.tobytes(), EMBED_CACHE_REDIS_TTL)
+    return vector
+
+
+def get_embedding_cache_stats() -> dict:
+    """Hit/miss counters plus an estimate of encode time saved (hits x average encode time)."""
+    with _lock:
+        stats = dict(_stats)
+        stats["size"] = len(_local)
+    hits = stats["local_hits"] + stats["redis_hits"]
+    lookups = hits + stats["misses"]
+    avg_encode = stats["encode_seconds"] / stats["misses"] if stats["misses"] else 0.0
+    stats["hit_rate"] = hits / lookups if lookups else 0.0
+    stats["avg_encode_seconds"] = avg_encode
+    stats["encode_seconds_saved"] = hits * avg_encode
+    return stats
+
+
+def clear_embedding_cache():
+    """Drops the in-process tier (Redis entries expire on their own)."""
+    with _lock:
+        _local.clear()
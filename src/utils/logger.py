@@ -1,30 +1,153 @@
-import time
+import atexit
 import datetime
+import json
 import os
+import queue
+import sys
+import threading
+import time
+
+from config import (LOG_DIR, LOG_LEVEL, LOG_ECHO, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_MAX_BYTES,
+                    LOG_BACKUP_COUNT, LOG_MAX_MESSAGE_CHARS, LOG_MAX_RESPONSE_CHARS)
+
+# Request threads only format a line and put it on a queue; a background thread batches the
+# lines per file, appends them, rotates files by size and echoes to stdout. Nothing here
+# raises into the caller: a missing or unwritable logs directory costs log lines, not requests.
+
+AUDIT_LOG = "system_audit.log"
+PERFORMANCE_LOG = "system_performance.jsonl"
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+_queue = queue.SimpleQueue()
+_start_lock = threading.Lock()
+_writer = None
+_flushed = threading.Condition()
+_pending = 0    # Lines queued but not yet written; guarded by _flushed
+_stats = {"written": 0, "dropped": 0, "truncated": 0, "rotations": 0, "write_errors": 0}
+_min_level = LEVELS.get(LOG_LEVEL.upper(), LEVELS["INFO"])
+
+
+def _truncate(text, limit):
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    _stats["truncated"] += 1
+    return f"{text[:limit]}... [+{len(text) - limit} chars]"
+
+
+def _rotate(path):
+    for index in range(LOG_BACKUP_COUNT - 1, 0, -1):
+        if os.path.exists(f"{path}.{index}"):
+            os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+    if LOG_BACKUP_COUNT > 0:
+        os.replace(path, f"{path}.1")
+    else:
+        os.remove(path)
+    _stats["rotations"] += 1
+
+
+def _write_batch(batch):
+    by_file = {}
+    for filename, line, echo in batch:
+        by_file.setdefault(filename, []).append(line)
+        if echo and LOG_ECHO:
+            print(echo)
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        for filename, lines in by_file.items():
+            path = os.path.join(LOG_DIR, filename)
+            if os.path.exists(path) and os.path.getsize(path) >= LOG_MAX_BYTES:
+                _rotate(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        _stats["written"] += len(batch)
+    except OSError as e:
+        _stats["write_errors"] += 1
+        _stats["dropped"] += len(batch)
+        print(f"[logger] Could not write {len(batch)} log lines to {LOG_DIR}: {e}", file=sys.stderr)
+
+
+def _run():
+    global _pending
+    while True:
+        batch = [_queue.get()]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        while len(batch) < LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception as e:
+            print(f"[logger] Log writer error: {e}", file=sys.stderr)
+        with _flushed:
+            _pending -= len(batch)
+            _flushed.notify_all()
 
-def log_transaction(query, intent, latency, response):
+
+def _enqueue(filename, line, echo=None):
+    global _writer, _pending
+    if _writer is None:
+        with _start_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_run, name="log-writer", daemon=True)
+                _writer.start()
+    with _flushed:
+        _pending += 1
+    _queue.put((filename, line, echo))
+
+
+def flush_logs(timeout=5.0):
+    """Blocks until every queued line is written (or timeout). Returns True when drained."""
+    with _flushed:
+        return _flushed.wait_for(lambda: _pending <= 0, timeout)
+
+
+atexit.register(flush_logs)
+
+
+def get_logger_stats():
+    return dict(_stats, queued=_pending)
+
+
+def log_transaction(query, intent, latency, response, metadata=None):
     """
-    Logs the user interaction and system performance to a text file.
+    Logs the user interaction and system performance as one JSON line.
+    `metadata` carries extras such as token usage and time-to-first-token for streamed answers.
     """
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = (
-        f"{'='*50}\n"
-        f"TIMESTAMP : {timestamp}\n"
-        f"USER QUERY: {query}\n"
-        f"INTENT    : {intent}\n"
-        f"LATENCY   : {latency:.2f} seconds\n"
-        f"AI OUTPUT : {response}\n"
-        f"{'='*50}\n\n"
-    )
-    # Save to a local logs folder
-    with open("../logs/system_performance.log", "a", encoding="utf-8") as f:
-        f.write(log_entry)
-
-    print(log_entry)
-
-def system_log(message):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    formatted_msg = f"[{timestamp}] {message}"
-    print(formatted_msg)
-    with open("../logs/system_audit.log", "a", encoding="utf-8") as f:
-        f.write(formatted_msg + "\n")   
\ No newline at end of file
+    try:
+        entry = {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "query": _truncate(query, LOG_MAX_MESSAGE_CHARS),
+            "intent": intent,
+            "latency": round(latency, 3),
+            "response": _truncate(response, LOG_MAX_RESPONSE_CHARS),
+        }
+        if metadata:
+            entry["metadata"] = metadata
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        _enqueue(PERFORMANCE_LOG, line, echo=f"[{entry['timestamp']}] TRANSACTION {intent} {latency:.2f}s: {entry['query']}")
+    except Exception as e:
+        print(f"[logger] log_transaction failed: {e}", file=sys.stderr)
+
+
+def log_enabled(level):
+    """True when messages at `level` are kept; lets callers skip building expensive payloads."""
+    return LEVELS.get(level, LEVELS["INFO"]) >= _min_level
+
+
+def system_log(message, level="INFO"):
+    """Queues an audit line; messages below LOG_LEVEL are dropped before any formatting."""
+    if not log_enabled(level):
+        return
+    try:
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        level_tag = "" if level == "INFO" else f" {level}"
+        formatted_msg = f"[{timestamp}]{level_tag} {_truncate(message, LOG_MAX_MESSAGE_CHARS)}"
+        _enqueue(AUDIT_LOG, formatted_msg, echo=formatted_msg)
+    except Exception as e:
+        print(f"[logger] system_log failed: {e}", file=sys.stderr)
@@ -1,41 +1,97 @@
-import redis
 import json
+import threading
+import time
+
+import redis
+from redis.client import NEVER_DECODE
 from config import REDIS_HOST, REDIS_PORT, REDIS_PASSWORD, CHAT_TTL, MAX_MESSAGE_CHARS, MAX_HISTORY_MESSAGES
+from config import REDIS_BREAKER_THRESHOLD, REDIS_PROBE_INTERVAL
 from utils.logger import system_log
+from utils.metrics import timed
+
+
+pool = redis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    decode_responses=True,
+    max_connections=20,        # Max simultaneous connections
+    socket_connect_timeout=3,  # Fail fast if Redis is unreachable
+    socket_timeout=3,
+    retry_on_timeout=True
+)
+r = redis.Redis(connection_pool=pool)
+
+# Circuit breaker instead of a PING before every operation: operations run directly while the
+# breaker is closed; REDIS_BREAKER_THRESHOLD consecutive failures open it, every call then goes
+# straight to the in-memory fallback, and a background probe closes it once PING succeeds.
+_breaker_lock = threading.Lock()
+_breaker = {"open": False, "failures": 0, "trips": 0, "opened_at": None, "probing": False}
+
+
+def _redis_ready() -> bool:
+    return not _breaker["open"]
+
+
+def _record_success():
+    if _breaker["failures"]:
+        with _breaker_lock:
+            _breaker["failures"] = 0
+
+
+def _record_failure(operation: str, error: Exception):
+    with _breaker_lock:
+        _breaker["failures"] += 1
+        if _breaker["open"] or _breaker["failures"] < REDIS_BREAKER_THRESHOLD:
+            return
+        _breaker["open"] = True
+        _breaker["trips"] += 1
+        _breaker["opened_at"] = time.time()
+        start_probe = not _breaker["probing"]
+        _breaker["probing"] = True
+    system_log(f" Redis {operation} failed: {error}. Circuit open; memory degrades to session-only.", level="WARNING")
+    if start_probe:
+        threading.Thread(target=_probe, name="redis-probe", daemon=True).start()
+
+
+def _probe():
+    """Pings Redis every REDIS_PROBE_INTERVAL seconds until it answers, then closes the breaker."""
+    while True:
+        time.sleep(REDIS_PROBE_INTERVAL)
+        try:
+            r.ping()
+        except Exception:
+            continue
+        with _breaker_lock:
+            _breaker.update(open=False, failures=0, probing=False)
+        system_log(" Redis reachable again; circuit closed.")
+        return
 
 
-try:
-    pool = redis.ConnectionPool(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        password=REDIS_PASSWORD,
-        decode_responses=True,
-        max_connections=20,        # Max simultaneous connections
-        socket_connect_timeout=3,  # Fail fast if Redis is unreachable
-        socket_timeout=3,
-        retry_on_timeout=True
-    )
-    r = redis.Redis(connection_pool=pool)
-    r.ping()  
-    system_log(" Redis connected successfully.")
-    REDIS_AVAILABLE = True
-
-except Exception as e:
-    system_log(f" Redis connection failed: {e}. Memory will degrade to session-only.")
-    r = None
-    REDIS_AVAILABLE = False
+def get_redis_stats() -> dict:
+    with _breaker_lock:
+        stats = dict(_breaker)
+    stats["state"] = "open" if stats.pop("open") else "closed"
+    return stats
 
-_fallback_store: dict = {}
 
-def _is_redis_up() -> bool:
-    """Quick health check before each operation."""
-    if not REDIS_AVAILABLE or r is None:
-        return False
+def connect_redis() -> bool:
+    """
+    Opens the first pooled connection (called from core.warm_up, never at import).
+    Unreachable Redis opens the breaker right away and leaves it to the probe.
+    """
     try:
         r.ping()
-        return True
-    except Exception:
+    except Exception as e:
+        with _breaker_lock:
+            _breaker["failures"] = max(_breaker["failures"], REDIS_BREAKER_THRESHOLD - 1)
+        _record_failure("connect", e)
         return False
+    _record_success()
+    system_log(" Redis connected successfully.")
+    return True
+
+_fallback_store: dict = {}
 
 def _truncate(content: str) -> str:
     """Truncates content that exceeds the max character limit."""
@@ -43,48 +99,63 @@ def _truncate(content: str) -> str:
         return content[:MAX_MESSAGE_CHARS] + "... [truncated]"
     return content
 
-def save_message(session_id: str, role: str, content: str):
-    '''Saves a message to Redis with a TTL. Falls back to in-memory store if Redis is down.'''
-    message = json.dumps({"role": role, "content": _truncate(content)})
-    key = f"chat:{session_id}"
+def _encode(role: str, content: str) -> str:
+    return json.dumps({"role": role, "content": _truncate(content)})
 
-    if _is_redis_up():
+def _append(session_id: str, messages: list, operation: str):
+    """Appends messages, trims and refreshes the TTL in one pipelined round trip."""
+    key = f"chat:{session_id}"
+    if _redis_ready():
         try:
             pipe = r.pipeline()   
-            pipe.rpush(key, message)
+            pipe.rpush(key, *messages)
             pipe.ltrim(key, -MAX_HISTORY_MESSAGES, -1)  
             pipe.expire(key, CHAT_TTL)
             pipe.execute()
+            _record_success()
+            return
         except Exception as e:
-            system_log(f" Redis save_message failed: {e}. Using fallback.")
-            _fallback_save(session_id, message)
-    else:
+            _record_failure(operation, e)
+    for message in messages:
         _fallback_save(session_id, message)
 
+@timed("redis:save_message")
+def save_message(session_id: str, role: str, content: str):
+    '''Saves a message to Redis with a TTL. Falls back to in-memory store if Redis is down.'''
+    _append(session_id, [_encode(role, content)], "save_message")
+
+
+@timed("redis:save_turn")
+def save_turn(session_id: str, user_content: str, assistant_content: str):
+    """Saves a user question and its answer together (one round trip instead of two)."""
+    _append(session_id, [_encode("user", user_content), _encode("assistant", assistant_content)], "save_turn")
 
+
+@timed("redis:get_chat_history")
 def get_chat_history(session_id: str, window_size: int = 8) -> list:
     """Retrieves the most recent messages for a session. Uses Redis if available, otherwise falls back to in-memory store."""
     key = f"chat:{session_id}"
-    if _is_redis_up():
+    if _redis_ready():
         try:
             raw_messages = r.lrange(key, -window_size, -1)
+            _record_success()
             return [json.loads(m) for m in raw_messages]
         except Exception as e:
-            system_log(f" Redis get_chat_history failed: {e}. Using fallback.")
-            return _fallback_get(session_id, window_size)
-    else:
-        return _fallback_get(session_id, window_size)
+            _record_failure("get_chat_history", e)
+    return _fallback_get(session_id, window_size)
 
 
+@timed("redis:clear_history")
 def clear_history(session_id: str):
     """Deletes the session memory from Redis and fallback store."""
     key = f"chat:{session_id}"
 
-    if _is_redis_up():
+    if _redis_ready():
         try:
             r.delete(key)
+            _record_success()
         except Exception as e:
-            system_log(f" Redis clear_history failed: {e}")
+            _record_failure("clear_history", e)
 
     # Always clear fallback too
     _fallback_store.pop(session_id, None)
@@ -92,20 +163,49 @@ def clear_history(session_id: str):
 
 def get_session_stats(session_id: str) -> dict:
     key = f"chat:{session_id}"
-    stats = {"total_messages": 0, "ttl_seconds": 0, "redis_active": _is_redis_up()}
+    stats = {"total_messages": 0, "ttl_seconds": 0, "redis_active": _redis_ready()}
 
-    if _is_redis_up():
+    if _redis_ready():
         try:
-            stats["total_messages"] = r.llen(key)
-            stats["ttl_seconds"] = r.ttl(key)
-        except Exception:
-            pass
-    else:
-        messages = _fallback_store.get(session_id, [])
-        stats["total_messages"] = len(messages)
+            pipe = r.pipeline(transaction=False)
+            pipe.llen(key)
+            pipe.ttl(key)
+            stats["total_messages"], stats["ttl_seconds"] = pipe.execute()
+            _record_success()
+            return stats
+        except Exception as e:
+            _record_failure("get_session_stats", e)
+            stats["redis_active"] = False
 
+    messages = _fallback_store.get(session_id, [])
+    stats["total_messages"] = len(messages)
     return stats
 
+@timed("redis:redis_get_bytes")
+def redis_get_bytes(key: str):
+    """Reads a raw binary value through the shared pool, skipping the pool's utf-8 decoding."""
+    if not _redis_ready():
+        return None
+    try:
+        value = r.execute_command("GET", key, **{NEVER_DECODE: []})
+        _record_success()
+        return value
+    except Exception as e:
+        _record_failure("get_bytes", e)
+        return None
+
+
+@timed("redis:redis_set_bytes")
+def redis_set_bytes(key: str, value: bytes, ttl: int):
+    """Stores a raw binary value with a TTL. Silently skipped when Redis is down."""
+    if not _redis_ready():
+        return
+    try:
+        r.set(key, value, ex=ttl)
+        _record_success()
+    except Exception as e:
+        _record_failure("set_bytes", e)
+
 # Fallback (in-memory) — only used when Redis is down
 
 def _fallback_save(session_id: str, message: str):
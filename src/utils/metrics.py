@@ -0,0 +1,154 @@
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# In-process metrics registry: counters and histograms keyed by name + labels, percentiles from
+# a bounded window of recent observations, and a Prometheus text export. `span(stage)` times a
+# pipeline stage into `stage_seconds{stage=...}` and also onto the current request's trace.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WINDOW = 2048   # Recent observations kept per histogram for p50/p95/p99
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> float
+_histograms = {}   # (name, labels) -> {"count", "sum", "buckets", "window"}
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"count": 0, "sum": 0.0, "bounds": buckets,
+                                       "buckets": [0] * len(buckets), "window": deque(maxlen=WINDOW)}
+        hist["count"] += 1
+        hist["sum"] += value
+        hist["window"].append(value)
+        for i, bound in enumerate(hist["bounds"]):
+            if value <= bound:
+                hist["buckets"][i] += 1
+                break
+
+
+def start_trace():
+    """Starts collecting the spans of one request; returns the trace (a list of (stage, seconds))."""
+    trace = []
+    _trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def span(stage, **labels):
+    """Times a block into stage_seconds{stage=...} and the current request trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        observe("stage_seconds", seconds, stage=stage, **labels)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((stage, round(seconds, 4)))
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache, hit):
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def record_tokens(stage, usage):
+    """Token usage of one LLM call; `usage` has prompt/completion/total_tokens (object or dict)."""
+    get = usage.get if isinstance(usage, dict) else functools.partial(getattr, usage)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        inc("llm_tokens_total", get(kind), stage=stage, kind=kind.split("_")[0])
+    inc("llm_calls_total", stage=stage)
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def get_metrics_summary():
+    """{"counters": {...}, "histograms": {...}} with count/mean/p50/p95/p99 per histogram."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (hist["count"], hist["sum"], sorted(hist["window"])) for key, hist in _histograms.items()}
+
+    def label(key):
+        name, labels = key
+        return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+    summary = {"counters": {label(key): value for key, value in sorted(counters.items())}, "histograms": {}}
+    for key, (count, total, window) in sorted(histograms.items()):
+        summary["histograms"][label(key)] = {
+            "count": count,
+            "mean": round(total / count, 4),
+            "p50": round(_percentile(window, 50), 4),
+            "p95": round(_percentile(window, 95), 4),
+            "p99": round(_percentile(window, 99), 4),
+        }
+    return summary
+
+
+def export_prometheus():
+    """Prometheus text exposition format (counters and cumulative histograms)."""
+    def fmt(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(hist, buckets=list(hist["buckets"]))) for key, hist in _histograms.items())
+
+    lines, typed = [], set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{fmt(labels)} {value}")
+    for (name, labels), hist in histograms:
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(hist["bounds"], hist["buckets"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist['count']}")
+        lines.append(f"{name}_sum{fmt(labels)} {hist['sum']}")
+        lines.append(f"{name}_count{fmt(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
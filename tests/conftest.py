@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+# Set before config is imported by the test modules: keep test runs out of the working tree and off stdout
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="pos-rag-test-logs-"))
+os.environ.setdefault("LOG_ECHO", "false")
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from core import answer_cache
+from core.answer_cache import semantic_cache, skip_answer_cache, invalidate_answer_cache
+
+
+def _fake_embed(question):
+    # Same text -> same unit vector; enough for exact-repeat lookups
+    vector = np.random.default_rng(abs(hash(question)) % 2**32).normal(size=8).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(answer_cache, "embed_query", _fake_embed)
+    invalidate_answer_cache()
+    yield
+    invalidate_answer_cache()
+
+
+def test_answer_is_served_from_cache():
+    calls = []
+
+    @semantic_cache("BOTH")
+    def answer(question, stream=False):
+        calls.append(question)
+        return "Order 118 is delayed by Koombiyo."
+
+    assert answer("Why is order 118 delayed?") == answer("Why is order 118 delayed?")
+    assert len(calls) == 1
+
+
+def test_skipped_answer_is_not_stored():
+    calls = []
+
+    @semantic_cache("BOTH")
+    def answer(question, stream=False):
+        calls.append(question)
+        skip_answer_cache()
+        return "Order 118 is delayed; the reason is unavailable right now."
+
+    answer("Why is order 118 delayed?")
+    answer("Why is order 118 delayed?")
+    assert len(calls) == 2
+    assert answer_cache.get_answer_cache_stats()["BOTH"]["size"] == 0
+
+
+def test_skip_does_not_leak_into_the_next_call():
+    degraded = [True, False, False]
+
+    @semantic_cache("BOTH")
+    def answer(question, stream=False):
+        if degraded.pop(0):
+            skip_answer_cache()
+        return "Order 118 is delayed by Koombiyo."
+
+    answer("Why is order 118 delayed?")
+    answer("Why is order 118 delayed?")
+    answer("Why is order 118 delayed?")
+    assert degraded == [False]   # The third call was a cache hit
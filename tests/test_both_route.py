@@ -0,0 +1,134 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from core import retrieve, answer_cache
+from core.retrieve import ask_both_ai, get_raw_ai, BRANCH_UNAVAILABLE, RAG_NOT_FOUND
+
+QUESTION = "Why is order 118 delayed?"
+DB_ROWS = "[{'courier_name': 'Koombiyo', 'order_status': 'Delayed'}]"
+KB_ANSWER = "Koombiyo deliveries are delayed by the monsoon."
+
+
+def _response(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+
+
+class FakeLLM:
+    """Stands in for core.llm.llm_chat: the refine step and the final BOTH answer."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def __call__(self, stage, **kwargs):
+        self.calls[stage] = kwargs["messages"][-1]["content"]
+        if stage == "refine":
+            return _response("What is the reason for Koombiyo courier service delays?")
+        return _response("final answer")
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(retrieve, "llm_chat", fake)
+    monkeypatch.setattr(retrieve, "get_raw_ai", lambda question: DB_ROWS)
+    monkeypatch.setattr(retrieve, "ask_rag_ai", lambda question: KB_ANSWER)
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(retrieve, "BOTH_PARALLEL", True)
+    return fake
+
+
+def _cache_on(monkeypatch):
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(answer_cache, "embed_query", lambda question: [1.0, 0.0, 0.0])
+    answer_cache.invalidate_answer_cache(["BOTH"])
+
+
+def test_parallel_uses_both_branches(llm):
+    assert ask_both_ai(QUESTION) == "final answer"
+    assert DB_ROWS in llm.calls["both answer"]
+    assert KB_ANSWER in llm.calls["both answer"]
+    assert QUESTION in llm.calls["refine"]
+
+
+def test_sql_branch_raising_degrades_to_partial_answer(llm, monkeypatch):
+    def broken(question):
+        raise RuntimeError("connection pool exhausted")
+    monkeypatch.setattr(retrieve, "get_raw_ai", broken)
+
+    assert ask_both_ai(QUESTION) == "final answer"
+    assert f"Data: {BRANCH_UNAVAILABLE}" in llm.calls["both answer"]
+    assert KB_ANSWER in llm.calls["both answer"]
+
+
+def test_rag_branch_timing_out_degrades_to_partial_answer(llm, monkeypatch):
+    release = threading.Event()
+
+    def slow(question):
+        release.wait(5)
+        return KB_ANSWER
+    monkeypatch.setattr(retrieve, "ask_rag_ai", slow)
+    monkeypatch.setattr(retrieve, "BOTH_RAG_TIMEOUT", 0.2)
+
+    try:
+        assert ask_both_ai(QUESTION) == "final answer"
+    finally:
+        release.set()
+    assert DB_ROWS in llm.calls["both answer"]
+    assert f"Context: {BRANCH_UNAVAILABLE}" in llm.calls["both answer"]
+
+
+def test_both_branches_failing_skips_the_final_answer(llm, monkeypatch):
+    def broken(question):
+        raise RuntimeError("down")
+    monkeypatch.setattr(retrieve, "get_raw_ai", broken)
+    monkeypatch.setattr(retrieve, "ask_rag_ai", broken)
+
+    assert ask_both_ai(QUESTION).startswith("I'm unable to access that right now")
+    assert "both answer" not in llm.calls
+
+
+def test_serial_fallback_refines_with_db_results(llm, monkeypatch):
+    monkeypatch.setattr(retrieve, "BOTH_PARALLEL", False)
+
+    assert ask_both_ai(QUESTION) == "final answer"
+    # Serial mode feeds the SQL rows into the refine prompt
+    assert DB_ROWS in llm.calls["refine"]
+    assert KB_ANSWER in llm.calls["both answer"]
+
+
+def test_partial_answer_is_not_cached(llm, monkeypatch):
+    def broken(question):
+        raise RuntimeError("down")
+    monkeypatch.setattr(retrieve, "get_raw_ai", broken)
+    _cache_on(monkeypatch)
+
+    ask_both_ai(QUESTION)
+    assert answer_cache.get_answer_cache_stats()["BOTH"]["size"] == 0
+
+
+def test_failed_text_to_sql_is_an_unavailable_branch(monkeypatch):
+    monkeypatch.setattr(retrieve, "run_text_to_sql", lambda *args: None)
+    assert get_raw_ai(QUESTION) == BRANCH_UNAVAILABLE
+
+
+@pytest.mark.parametrize("kb_answer", [RAG_NOT_FOUND, " Retrieval Error: connection refused"])
+def test_rag_failure_text_is_an_unavailable_branch(llm, monkeypatch, kb_answer):
+    monkeypatch.setattr(retrieve, "ask_rag_ai", lambda question: kb_answer)
+    _cache_on(monkeypatch)
+
+    assert ask_both_ai(QUESTION) == "final answer"
+    assert f"Context: {BRANCH_UNAVAILABLE}" in llm.calls["both answer"]
+    assert answer_cache.get_answer_cache_stats()["BOTH"]["size"] == 0
+
+
+def test_sql_branch_without_results_is_not_cached(llm, monkeypatch):
+    # The real get_raw_ai, with every text-to-SQL attempt failing
+    monkeypatch.setattr(retrieve, "get_raw_ai", get_raw_ai)
+    monkeypatch.setattr(retrieve, "run_text_to_sql", lambda *args: None)
+    _cache_on(monkeypatch)
+
+    ask_both_ai(QUESTION)
+    assert f"Data: {BRANCH_UNAVAILABLE}" in llm.calls["both answer"]
+    assert answer_cache.get_answer_cache_stats()["BOTH"]["size"] == 0
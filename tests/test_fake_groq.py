@@ -0,0 +1,50 @@
+import os
+import sys
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from fake_groq import FakeGroq, synthesize, MISS_TEXT
+from prompts import routing_prompt, refine_prompt, standalone_Prompt
+from core.retrieve import build_sql_prompt
+
+
+def _user(content, system=None):
+    messages = [{"role": "system", "content": system}] if system else []
+    return messages + [{"role": "user", "content": content}]
+
+
+def test_stages_are_recognized_from_the_real_prompts():
+    assert synthesize(_user(routing_prompt.format(question="Why is order 118 delayed?"))) == ("intent", "BOTH")
+    assert synthesize(_user(routing_prompt.format(question="Xiaomi 14 camera specs"))) == ("intent", "RAG")
+    assert synthesize(_user(refine_prompt.format(question="Why is order 118 delayed?", db_results="[]"))) \
+        == ("refine", "Why is order 118 delayed?")
+    reformulate = _user("RECENT HISTORY:\nuser: hi\n\n        USER QUESTION: What about its warranty?\n\n        STANDALONE QUERY:",
+                        system=standalone_Prompt)
+    assert synthesize(reformulate) == ("reformulate", "What about its warranty?")
+
+
+def test_sql_is_rule_based_on_the_question_and_catalog_hint():
+    stage, sql = synthesize(_user(build_sql_prompt("What is the status of order 118?")))
+    assert stage == "sql" and "o.order_id = 118" in sql
+    hint = "\n                CATALOG MATCHES (fuzzy, may include near-misses): 'Pixel 8' = product_id 7"
+    stage, sql = synthesize(_user(build_sql_prompt("How many Pixel 8 units are left?", product_hint=hint)))
+    assert "FROM product p JOIN stock s" in sql and "p.product_id = 7" in sql
+
+
+def test_unrecorded_calls_are_synthesized_deterministically(tmp_path):
+    messages = _user("Question: Why is order 118 delayed?\nData: [...]", system="You are a POS system assistant.")
+    first = FakeGroq(str(tmp_path / "replay.jsonl"), latency_ms=0).chat.completions.create(model="m", messages=messages)
+    groq = FakeGroq(str(tmp_path / "replay.jsonl"), latency_ms=0)
+    second = groq.chat.completions.create(model="m", messages=messages)
+    assert first.choices[0].message.content == second.choices[0].message.content
+    assert first.usage.completion_tokens == second.usage.completion_tokens
+    assert groq.stats["synthesized"] == 1 and groq.stats["misses"] == 0
+
+
+def test_without_fallback_unrecorded_calls_are_misses(tmp_path):
+    groq = FakeGroq(str(tmp_path / "replay.jsonl"), latency_ms=0, fallback=False)
+    response = groq.chat.completions.create(model="m", messages=_user("anything"))
+    assert response.choices[0].message.content == MISS_TEXT
+    assert groq.stats["misses"] == 1
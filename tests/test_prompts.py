@@ -0,0 +1,31 @@
+import pytest
+
+from prompts import routing_prompt, refine_prompt, rag_system_prompt, fast_path_templates
+
+# Every template that is filled with str.format, with the keys its caller passes
+FORMATTED_TEMPLATES = [
+    ("routing_prompt", routing_prompt, {"question": "Why is order 118 delayed?"}),
+    ("refine_prompt", refine_prompt, {"question": "Why is order 118 delayed?",
+                                      "db_results": "[RealDictRow({'courier_name': 'Koombiyo'})]"}),
+    ("rag_system_prompt", rag_system_prompt, {"context": "[SPEC] iPhone 15: 6.1-inch display"}),
+    ("fast_path:stock", fast_path_templates["stock"], {"name": "iPhone 15", "quantity": 4, "last_updated": "2026-01-10"}),
+    ("fast_path:out_of_stock", fast_path_templates["out_of_stock"], {"name": "iPhone 15", "last_updated": "2026-01-10"}),
+    ("fast_path:no_stock_record", fast_path_templates["no_stock_record"], {"name": "iPhone 15"}),
+    ("fast_path:price", fast_path_templates["price"], {"name": "iPhone 15", "price": 192000.0}),
+    ("fast_path:order_status", fast_path_templates["order_status"], {"order_id": 118, "order_date": "2026-01-05", "status": "Delayed"}),
+    ("fast_path:order_not_found", fast_path_templates["order_not_found"], {"order_id": 999}),
+]
+
+
+@pytest.mark.parametrize("name, template, keys", FORMATTED_TEMPLATES, ids=[t[0] for t in FORMATTED_TEMPLATES])
+def test_template_formats_with_its_keys(name, template, keys):
+    filled = template.format(**keys)
+    for value in keys.values():
+        if isinstance(value, str):
+            assert value in filled
+
+
+def test_refine_prompt_keeps_literal_braces():
+    filled = refine_prompt.format(question="q", db_results="rows")
+    assert "curly braces {}" in filled
+    assert "RealDictRow({'staff_name': 'Cher'" in filled
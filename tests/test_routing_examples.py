@@ -0,0 +1,16 @@
+import os
+import sys
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from eval_router import load_qa_cases, load_tsv_cases, training_overlap, LEAK_SIMILARITY
+
+EVAL_CASES = load_qa_cases(os.path.join(ROOT, "QA.txt")) + load_tsv_cases(os.path.join(ROOT, "bench", "router_cases.tsv"))
+
+
+def test_eval_cases_are_not_training_examples():
+    leaked = [question for _, question in EVAL_CASES if training_overlap(question) >= LEAK_SIMILARITY]
+    assert not leaked
+
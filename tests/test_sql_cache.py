@@ -0,0 +1,55 @@
+import pytest
+
+from core.sql_cache import build_template, extract_pattern, lookup_sql, store_sql, clear_sql_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_sql_cache()
+    yield
+    clear_sql_cache()
+
+
+def _template(question, sql, reserved=()):
+    _, literals = extract_pattern(question)
+    return build_template(sql, literals, reserved)
+
+
+def test_number_becomes_a_parameter():
+    template, slots = _template("What is the status of order 118?", 'SELECT status FROM "order" WHERE order_id = 118')
+    assert template == 'SELECT status FROM "order" WHERE order_id = %s'
+    assert slots == [0]
+
+
+def test_cached_plan_rebinds_new_literals():
+    sql = "SELECT * FROM \"order\" WHERE order_date::date = '2026-01-03' AND order_id = 118"
+    assert store_sql("SQL", "Show order 118 from 2026-01-03", sql)
+    template, params = lookup_sql("SQL", "Show order 121 from 2026-01-05")
+    assert template == 'SELECT * FROM "order" WHERE order_date::date = %s AND order_id = %s'
+    assert params == ["2026-01-05", 121]
+
+
+def test_literal_inside_text_is_not_templated():
+    assert _template("Price of iPhone 15", "SELECT price FROM product WHERE name ILIKE '%iPhone 15%'") is None
+
+
+def test_reserved_product_id_is_not_templated():
+    assert _template("Price of iPhone 15", "SELECT price FROM product WHERE product_id = 15", reserved=[15]) is None
+
+
+def test_number_matching_limit_is_not_templated():
+    # Regression: quantity and LIMIT both became the same placeholder, so "quantity 3" ran with LIMIT 3
+    sql = "SELECT * FROM order_item WHERE quantity = 1 LIMIT 1"
+    assert _template("Which orders have quantity 1", sql) is None
+    assert not store_sql("SQL", "Which orders have quantity 1", sql)
+    assert lookup_sql("SQL", "Which orders have quantity 3") is None
+
+
+def test_number_bound_only_as_limit_is_not_templated():
+    assert _template("Show the top 5 products", "SELECT name FROM product ORDER BY price DESC LIMIT 5") is None
+    assert _template("Show orders after the first 10", 'SELECT * FROM "order" ORDER BY order_id offset 10') is None
+
+
+def test_number_matching_two_filters_is_not_templated():
+    sql = 'SELECT * FROM "order" WHERE order_id = 118 OR customer_id = 118'
+    assert _template("Orders related to 118", sql) is None
@@ -0,0 +1,53 @@
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+
+from core import retrieve
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Counts pooled connections checked out by core.retrieve."""
+    state = SimpleNamespace(held=0, peak=0)
+
+    @contextlib.contextmanager
+    def get_connection():
+        state.held += 1
+        state.peak = max(state.peak, state.held)
+        try:
+            yield SimpleNamespace(commit=lambda: None, rollback=lambda: None)
+        finally:
+            state.held -= 1
+
+    monkeypatch.setattr(retrieve, "get_connection", get_connection)
+    monkeypatch.setattr(retrieve, "SQL_CACHE_ENABLED", False)
+    monkeypatch.setattr(retrieve, "SCHEMA_PRUNING_ENABLED", False)
+    return state
+
+
+def test_no_connection_is_held_for_the_catalog_lookup_or_llm(pool, monkeypatch):
+    def product_hint(question):
+        assert pool.held == 0, "catalog lookup would need a second pooled connection"
+        return "", ()
+
+    attempts = []
+
+    def generate_sql(prompt, attempt):
+        assert pool.held == 0, "a connection was held across the LLM call"
+        attempts.append(attempt)
+        return "SELECT 1"
+
+    def execute_guarded(conn, sql, params=None):
+        assert pool.held == 1
+        if len(attempts) == 1:
+            raise RuntimeError('relation "orders" does not exist')
+        return SimpleNamespace(text="[(1,)]")
+
+    monkeypatch.setattr(retrieve, "_product_hint", product_hint)
+    monkeypatch.setattr(retrieve, "generate_sql", generate_sql)
+    monkeypatch.setattr(retrieve, "execute_guarded", execute_guarded)
+
+    assert retrieve.run_text_to_sql("How many orders are delayed?").text == "[(1,)]"
+    assert attempts == [1, 2]
+    assert pool.peak == 1 and pool.held == 0